@@ -0,0 +1,178 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for host callbacks in the middle of a computation.
+
+`debug_callback_*` benchmarks: the benchmarked function runs a chain of
+matrix multiplications and, after each one, an unordered `jax.debug.callback`
+that sleeps for a fixed time, like a logging callback would. Each benchmark
+runs it with the callbacks executed by the runtime thread
+(`jax_callback_executor_threads=0`) or queued on a pool of 1, 4 or 16 threads.
+
+Each of these benchmarks reports in the `device_idle_ms` counter how much
+longer a call took than the same computation without callbacks; the
+difference between the `threads_0` benchmark and the others is the device
+idle time saved by queueing the callbacks. The time spent waiting for the
+queued callbacks to finish, in `jax.effects_barrier`, is not included.
+
+`pure_callback_*` benchmarks: a callback-heavy pipeline that passes a float32
+payload of 1MB to 1GB through four `jax.pure_callback`s, each adding one to
+it on the host. The callbacks either allocate their results (`alloc`), write
+them into a buffer they reuse across calls (`reuse`), or write them into a
+PyTorch tensor they reuse across calls and return it, to be adopted through
+DLPack (`dlpack`, only run if PyTorch is installed). The `bytes_per_second` counter is the payload size
+times the number of callbacks.
+"""
+
+from functools import partial
+import time
+
+import google_benchmark
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+from jax import config
+from jax._src import config as config_internal
+
+config.parse_flags_with_absl()
+
+try:
+  import torch
+except ImportError:
+  torch = None
+
+_NUM_STEPS = 16
+_SIZE = 256
+_NUM_CALLBACKS = 4
+
+
+def _sleep(ms, x):
+  del x
+  time.sleep(ms / 1000)
+
+
+def _make_fun(sleep_ms):
+  @jax.jit
+  def f(x):
+    for i in range(_NUM_STEPS):
+      x = jnp.tanh(x @ x)
+      if sleep_ms:
+        jax.debug.callback(partial(_sleep, sleep_ms), x[i])
+    return x
+  return f
+
+
+def _time_call(f, x, iterations=5):
+  f(x).block_until_ready()
+  jax.effects_barrier()
+  start_time = time.perf_counter()
+  for _ in range(iterations):
+    f(x).block_until_ready()
+  elapsed = (time.perf_counter() - start_time) / iterations
+  jax.effects_barrier()
+  return elapsed
+
+
+def _bench_callbacks(sleep_ms, num_threads, state):
+  x = jnp.asarray(np.eye(_SIZE, dtype=np.float32))
+  baseline_secs = _time_call(_make_fun(0), x)
+  with config_internal.callback_executor_threads(num_threads):
+    f = _make_fun(sleep_ms)
+    f(x).block_until_ready()
+    jax.effects_barrier()
+    total_secs = 0.0
+    while state:
+      start_time = time.perf_counter()
+      f(x).block_until_ready()
+      total_secs += time.perf_counter() - start_time
+      state.pause_timing()
+      jax.effects_barrier()
+      state.resume_timing()
+  call_secs = total_secs / max(state.iterations, 1)
+  state.counters["device_idle_ms"] = max(call_secs - baseline_secs, 0) * 1000
+
+
+benchmarks = []
+for sleep_ms in (1, 10):
+  for num_threads in (0, 1, 4, 16):
+    benchmarks.append(google_benchmark.register(
+        partial(_bench_callbacks, sleep_ms, num_threads),
+        name=f"debug_callback_sleep_{sleep_ms}ms_threads_{num_threads}"))
+
+
+def _add_one_alloc(x):
+  return x + np.float32(1)
+
+
+def _make_add_one_reuse():
+  buffers = {}
+  def add_one_reuse(x):
+    buf = buffers.get(x.shape)
+    if buf is None:
+      buf = buffers[x.shape] = np.empty_like(x)
+    return np.add(x, np.float32(1), out=buf)
+  return add_one_reuse
+
+
+def _make_add_one_dlpack():
+  # The callback argument is read-only, which PyTorch warns about when it is
+  # wrapped in a tensor, so only the result is a tensor.
+  buffers = {}
+  def add_one_dlpack(x):
+    buf = buffers.get(x.shape)
+    if buf is None:
+      buf = buffers[x.shape] = torch.empty(x.shape, dtype=torch.float32)
+    np.add(x, np.float32(1), out=buf.numpy())
+    return buf
+  return add_one_dlpack
+
+
+_RESULT_MODES = {
+    "alloc": lambda: _add_one_alloc,
+    "reuse": _make_add_one_reuse,
+    "dlpack": _make_add_one_dlpack,
+}
+
+
+def _bench_payload(num_bytes, mode, state):
+  if mode == "dlpack" and torch is None:
+    state.skip_with_error("PyTorch is not installed")
+    return
+  callback = _RESULT_MODES[mode]()
+  x = jnp.zeros((num_bytes // 4,), jnp.float32)
+
+  @jax.jit
+  def f(x):
+    for _ in range(_NUM_CALLBACKS):
+      x = jax.pure_callback(callback, x, x)
+    return x
+
+  f(x).block_until_ready()
+  while state:
+    f(x).block_until_ready()
+  state.counters["bytes_per_second"] = google_benchmark.Counter(
+      num_bytes * _NUM_CALLBACKS * state.iterations,
+      google_benchmark.Counter.kIsRate)
+
+
+for num_bytes, size_name in ((1 << 20, "1MB"), (16 << 20, "16MB"),
+                             (256 << 20, "256MB"), (1 << 30, "1GB")):
+  for mode in _RESULT_MODES:
+    benchmarks.append(google_benchmark.register(
+        partial(_bench_payload, num_bytes, mode),
+        name=f"pure_callback_{size_name}_{mode}"))
+
+
+if __name__ == "__main__":
+  google_benchmark.main()
@@ -0,0 +1,103 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for cold and warm starts with the persistent compilation cache.
+
+Run on CPU with, e.g.:
+
+  JAX_PLATFORMS=cpu python benchmarks/compilation_cache_benchmark.py
+"""
+
+import os
+import tempfile
+
+import google_benchmark
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+from jax import config
+from jax._src import compilation_cache as cc
+from jax._src import xla_bridge
+from jax._src.config import persistent_cache_min_compile_time_secs
+
+config.parse_flags_with_absl()
+
+
+def mlp(params, x):
+  for w, b in params:
+    x = jnp.tanh(x @ w + b)
+  return x
+
+
+def make_mlp_args(depth, width):
+  params = [(np.ones((width, width), np.float32),
+             np.ones((width,), np.float32)) for _ in range(depth)]
+  x = np.ones((8, width), np.float32)
+  return params, x
+
+
+def compile_mlp(params, x):
+  # A fresh jit wrapper each time, so nothing is reused from the in-process
+  # jit caches and every compile goes through the persistent cache.
+  return jax.jit(lambda p, x: mlp(p, x)).lower(params, x).compile()
+
+
+def _reset_cache(cache_dir):
+  if cc.is_initialized():
+    cc.reset_cache()
+  jax.clear_caches()
+  cc.initialize_cache(cache_dir)
+
+
+def _cache_benchmark(state, warm):
+  if not cc.is_cache_supported(xla_bridge.get_backend()):
+    state.skip_with_error("Persistent compilation cache not supported")
+    return
+  params, x = make_mlp_args(state.range(0), 512)
+  with persistent_cache_min_compile_time_secs(0), \
+      tempfile.TemporaryDirectory() as tmpdir:
+    if warm:
+      _reset_cache(tmpdir)
+      compile_mlp(params, x)
+    while state:
+      state.pause_timing()
+      cache_dir = tmpdir if warm else tempfile.mkdtemp(dir=tmpdir)
+      _reset_cache(cache_dir)
+      state.resume_timing()
+      compile_mlp(params, x)
+    state.counters["cache_entries"] = len(
+        [f for f in os.listdir(tmpdir) if not f.startswith("tmp")])
+    cc.reset_cache()
+
+
+@google_benchmark.register
+@google_benchmark.option.arg_names(['depth'])
+@google_benchmark.option.args([16])
+@google_benchmark.option.args([128])
+@google_benchmark.option.unit(google_benchmark.kMillisecond)
+def cpu_mlp_cold_start(state):
+  _cache_benchmark(state, warm=False)
+
+
+@google_benchmark.register
+@google_benchmark.option.arg_names(['depth'])
+@google_benchmark.option.args([16])
+@google_benchmark.option.args([128])
+@google_benchmark.option.unit(google_benchmark.kMillisecond)
+def cpu_mlp_warm_start(state):
+  _cache_benchmark(state, warm=True)
+
+
+if __name__ == "__main__":
+  google_benchmark.main()
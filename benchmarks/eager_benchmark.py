@@ -0,0 +1,251 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Eager dispatch latency of common `jax.numpy` functions on small arrays.
+
+Each function in `_OPS` gets two benchmarks:
+
+  * `eager_<op>`: calling the `jax.numpy` function, without waiting for the
+    result. This is the whole per-call overhead.
+  * `eager_<op>_primitives`: binding the primitives the call stages out, in
+    order, each dispatched on its own through `apply_primitive`. The function
+    is traced with `jax.disable_jit()`, so that the primitives of inner `jit`s
+    are inlined rather than bound as one `pjit` equation. The difference
+    between the two is the cost of the `jax.numpy` wrapper itself.
+
+To gate changes on eager overhead, save results as JSON before and after a
+change, and compare them:
+
+  python benchmarks/eager_benchmark.py --benchmark_out=before.json \
+      --benchmark_out_format=json
+  python benchmarks/eager_benchmark.py compare before.json after.json \
+      --max_regression_us=2
+
+`compare` exits with status 1 if any benchmark got slower by more than the
+given number of microseconds.
+"""
+
+import argparse
+import json
+import sys
+
+import google_benchmark
+import jax
+from jax import lax
+import jax.numpy as jnp
+import numpy as np
+
+from jax import config
+from jax._src import core
+
+config.parse_flags_with_absl()
+
+
+def _vec():
+  return jnp.arange(16, dtype=jnp.float32) / 16
+
+def _mat():
+  return jnp.arange(16, dtype=jnp.float32).reshape(4, 4) / 16
+
+def _idx():
+  return jnp.array([3, 1, 2], dtype=jnp.int32)
+
+def _bool():
+  return _vec() > 0.5
+
+
+# (name, function, argument builder). Arguments are built once per benchmark.
+_OPS = [
+    # Elementwise.
+    ("add", jnp.add, lambda: (_vec(), _vec())),
+    ("add_scalar", jnp.add, lambda: (_vec(), 1.)),
+    ("subtract", jnp.subtract, lambda: (_vec(), _vec())),
+    ("multiply", jnp.multiply, lambda: (_vec(), _vec())),
+    ("divide", jnp.divide, lambda: (_vec(), _vec() + 1)),
+    ("power", jnp.power, lambda: (_vec(), 2.)),
+    ("maximum", jnp.maximum, lambda: (_vec(), 0.5)),
+    ("minimum", jnp.minimum, lambda: (_vec(), 0.5)),
+    ("negative", jnp.negative, lambda: (_vec(),)),
+    ("abs", jnp.abs, lambda: (_vec(),)),
+    ("exp", jnp.exp, lambda: (_vec(),)),
+    ("log", jnp.log, lambda: (_vec() + 1,)),
+    ("log1p", jnp.log1p, lambda: (_vec(),)),
+    ("sqrt", jnp.sqrt, lambda: (_vec(),)),
+    ("square", jnp.square, lambda: (_vec(),)),
+    ("sin", jnp.sin, lambda: (_vec(),)),
+    ("cos", jnp.cos, lambda: (_vec(),)),
+    ("tanh", jnp.tanh, lambda: (_vec(),)),
+    ("floor", jnp.floor, lambda: (_vec(),)),
+    ("round", jnp.round, lambda: (_vec(),)),
+    ("sign", jnp.sign, lambda: (_vec(),)),
+    ("clip", jnp.clip, lambda: (_vec(), 0.2, 0.8)),
+    ("isnan", jnp.isnan, lambda: (_vec(),)),
+    ("isfinite", jnp.isfinite, lambda: (_vec(),)),
+    ("equal", jnp.equal, lambda: (_vec(), 0.5)),
+    ("greater", jnp.greater, lambda: (_vec(), 0.5)),
+    ("logical_and", jnp.logical_and, lambda: (_bool(), _bool())),
+    ("logical_not", jnp.logical_not, lambda: (_bool(),)),
+    ("where", jnp.where, lambda: (_bool(), _vec(), 0.)),
+    ("astype", lambda x: x.astype(jnp.int32), lambda: (_vec(),)),
+    # Reductions.
+    ("sum", jnp.sum, lambda: (_vec(),)),
+    ("sum_axis", lambda x: jnp.sum(x, axis=0), lambda: (_mat(),)),
+    ("mean", jnp.mean, lambda: (_vec(),)),
+    ("var", jnp.var, lambda: (_vec(),)),
+    ("std", jnp.std, lambda: (_vec(),)),
+    ("max", jnp.max, lambda: (_vec(),)),
+    ("min", jnp.min, lambda: (_vec(),)),
+    ("prod", jnp.prod, lambda: (_vec(),)),
+    ("argmax", jnp.argmax, lambda: (_vec(),)),
+    ("argmin", jnp.argmin, lambda: (_vec(),)),
+    ("any", jnp.any, lambda: (_bool(),)),
+    ("all", jnp.all, lambda: (_bool(),)),
+    ("cumsum", jnp.cumsum, lambda: (_vec(),)),
+    ("logsumexp", jax.nn.logsumexp, lambda: (_vec(),)),
+    ("softmax", jax.nn.softmax, lambda: (_vec(),)),
+    ("linalg_norm", jnp.linalg.norm, lambda: (_vec(),)),
+    ("allclose", jnp.allclose, lambda: (_vec(), _vec())),
+    # Creation.
+    ("zeros", lambda: jnp.zeros((4, 4)), lambda: ()),
+    ("ones_like", jnp.ones_like, lambda: (_vec(),)),
+    ("full", lambda: jnp.full((4, 4), 2.), lambda: ()),
+    ("arange", lambda: jnp.arange(16), lambda: ()),
+    ("linspace", lambda: jnp.linspace(0., 1., 16), lambda: ()),
+    ("eye", lambda: jnp.eye(4), lambda: ()),
+    ("array_from_list", lambda: jnp.array([1., 2., 3.]), lambda: ()),
+    ("asarray_numpy", jnp.asarray, lambda: (np.ones(16, np.float32),)),
+    # Shape manipulation.
+    ("reshape", lambda x: x.reshape(4, 4), lambda: (_vec(),)),
+    ("ravel", jnp.ravel, lambda: (_mat(),)),
+    ("transpose", jnp.transpose, lambda: (_mat(),)),
+    ("swapaxes", lambda x: jnp.swapaxes(x, 0, 1), lambda: (_mat(),)),
+    ("expand_dims", lambda x: jnp.expand_dims(x, 0), lambda: (_vec(),)),
+    ("squeeze", jnp.squeeze, lambda: (_vec()[None],)),
+    ("broadcast_to", lambda x: jnp.broadcast_to(x, (4, 16)), lambda: (_vec(),)),
+    ("concatenate", jnp.concatenate, lambda: ([_vec(), _vec()],)),
+    ("stack", jnp.stack, lambda: ([_vec(), _vec()],)),
+    ("split", lambda x: jnp.split(x, 4), lambda: (_vec(),)),
+    ("tile", lambda x: jnp.tile(x, 2), lambda: (_vec(),)),
+    ("repeat", lambda x: jnp.repeat(x, 2), lambda: (_vec(),)),
+    ("flip", jnp.flip, lambda: (_vec(),)),
+    ("roll", lambda x: jnp.roll(x, 1), lambda: (_vec(),)),
+    ("pad", lambda x: jnp.pad(x, 1), lambda: (_vec(),)),
+    ("triu", jnp.triu, lambda: (_mat(),)),
+    # Indexing.
+    ("getitem_int", lambda x: x[3], lambda: (_vec(),)),
+    ("getitem_slice", lambda x: x[2:10], lambda: (_vec(),)),
+    ("getitem_2d", lambda x: x[1, 2:], lambda: (_mat(),)),
+    ("getitem_array", lambda x, i: x[i], lambda: (_vec(), _idx())),
+    ("getitem_bool", lambda x: x[np.arange(16) % 2 == 0], lambda: (_vec(),)),
+    ("getitem_none", lambda x: x[:, None], lambda: (_vec(),)),
+    ("at_set", lambda x: x.at[3].set(0.), lambda: (_vec(),)),
+    ("at_add", lambda x, i: x.at[i].add(1.), lambda: (_vec(), _idx())),
+    ("take", jnp.take, lambda: (_vec(), _idx())),
+    ("take_along_axis", lambda x, i: jnp.take_along_axis(x, i, axis=0),
+     lambda: (_vec(), _idx())),
+    ("argsort", jnp.argsort, lambda: (_vec(),)),
+    ("sort", jnp.sort, lambda: (_vec(),)),
+    ("searchsorted", jnp.searchsorted, lambda: (_vec(), 0.5)),
+    ("one_hot", lambda i: jax.nn.one_hot(i, 4), lambda: (_idx(),)),
+    # Linear algebra.
+    ("dot", jnp.dot, lambda: (_mat(), _mat())),
+    ("matmul", jnp.matmul, lambda: (_mat(), _mat())),
+    ("matmul_operator", lambda a, b: a @ b, lambda: (_mat(), _mat())),
+    ("einsum_matmul", lambda a, b: jnp.einsum("ij,jk->ik", a, b),
+     lambda: (_mat(), _mat())),
+    ("einsum_trace", lambda a: jnp.einsum("ii->", a), lambda: (_mat(),)),
+    ("outer", jnp.outer, lambda: (_vec(), _vec())),
+    ("vdot", jnp.vdot, lambda: (_vec(), _vec())),
+    ("tensordot", lambda a, b: jnp.tensordot(a, b, 1),
+     lambda: (_mat(), _mat())),
+    # Operators and methods on arrays.
+    ("operator_add", lambda x, y: x + y, lambda: (_vec(), _vec())),
+    ("operator_mul_scalar", lambda x: x * 2, lambda: (_vec(),)),
+    ("operator_lt", lambda x: x < 0.5, lambda: (_vec(),)),
+    ("method_sum", lambda x: x.sum(), lambda: (_vec(),)),
+    ("method_T", lambda x: x.T, lambda: (_mat(),)),
+    ("lax_add", lax.add, lambda: (_vec(), _vec())),
+]
+
+
+def _bench_total(fun, make_args, state):
+  args = make_args()
+  fun(*args)
+  while state:
+    fun(*args)
+
+
+def _bench_primitives(fun, make_args, state):
+  args = make_args()
+  with jax.disable_jit():
+    closed_jaxpr = jax.make_jaxpr(fun)(*args)
+  assert not any(eqn.primitive.name == "pjit"
+                 for eqn in closed_jaxpr.jaxpr.eqns), closed_jaxpr
+  arrays = [jnp.asarray(x) for x in jax.tree_util.tree_leaves(args)]
+  if len(arrays) != len(closed_jaxpr.in_avals):
+    state.skip_with_error("arguments do not map one-to-one onto jaxpr inputs")
+    return
+  core.eval_jaxpr(closed_jaxpr.jaxpr, closed_jaxpr.consts, *arrays)
+  while state:
+    core.eval_jaxpr(closed_jaxpr.jaxpr, closed_jaxpr.consts, *arrays)
+
+
+benchmarks = []
+for name, fun, make_args in _OPS:
+  benchmarks += [
+      google_benchmark.register(
+          lambda state, fun=fun, make_args=make_args:
+              _bench_total(fun, make_args, state),
+          name=f"eager_{name}"),
+      google_benchmark.register(
+          lambda state, fun=fun, make_args=make_args:
+              _bench_primitives(fun, make_args, state),
+          name=f"eager_{name}_primitives"),
+  ]
+
+
+_TIME_UNIT_US = {"ns": 1e-3, "us": 1., "ms": 1e3, "s": 1e6}
+
+
+def _load_times_us(path):
+  with open(path) as f:
+    results = json.load(f)["benchmarks"]
+  return {r["name"]: r["real_time"] * _TIME_UNIT_US[r["time_unit"]]
+          for r in results if r.get("run_type", "iteration") == "iteration"}
+
+
+def compare(argv):
+  """Compares two JSON results files; returns 1 if any benchmark regressed."""
+  parser = argparse.ArgumentParser(prog="eager_benchmark.py compare")
+  parser.add_argument("baseline")
+  parser.add_argument("contender")
+  parser.add_argument("--max_regression_us", type=float, default=2.)
+  args = parser.parse_args(argv)
+  baseline = _load_times_us(args.baseline)
+  contender = _load_times_us(args.contender)
+  regressed = False
+  for name in sorted(baseline.keys() & contender.keys()):
+    delta = contender[name] - baseline[name]
+    flag = ""
+    if delta > args.max_regression_us:
+      regressed = True
+      flag = "  REGRESSION"
+    print(f"{name:<40} {baseline[name]:10.2f}us {contender[name]:10.2f}us "
+          f"{delta:+9.2f}us{flag}")
+  return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1 and sys.argv[1] == "compare":
+    sys.exit(compare(sys.argv[2:]))
+  google_benchmark.main()
@@ -0,0 +1,131 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for `jax.experimental.multihost_utils` with simulated processes.
+
+The benchmark starts `--num_processes` JAX processes on this machine, connected
+through `jax.distributed.initialize`, and times each collective in each of
+them. Process 0 prints the median latency of every collective and payload
+size:
+
+  python benchmarks/multihost_benchmark.py --num_processes=8
+
+By default, the processes run on CPU and only the key-value store path, and
+the coordination service barrier of `sync_global_devices`, are measured, since
+CPU devices do not support collectives across processes. With `--device_path`,
+the same collectives are also timed with `jax_multihost_kv_store_max_bytes=0`
+and `sync_global_devices(..., use_device_path=True)`, which requires a backend
+with multi-process collectives, e.g. one GPU per process:
+
+  python benchmarks/multihost_benchmark.py --num_processes=2 \
+      --platform=gpu --device_path
+
+google_benchmark is not used because every process must run the same number
+of iterations of each collective.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+_SIZES = {"8B": 8, "1KB": 1 << 10, "64KB": 64 << 10, "1MB": 1 << 20}
+
+
+def _collectives():
+  from jax.experimental import multihost_utils
+  return {
+      "broadcast_one_to_all":
+          lambda x, device: multihost_utils.broadcast_one_to_all(x),
+      "process_allgather":
+          lambda x, device: multihost_utils.process_allgather(x),
+      # The payload is ignored: a barrier reusing one name on every call.
+      "sync_global_devices":
+          lambda x, device: multihost_utils.sync_global_devices(
+              "benchmark", use_device_path=device),
+  }
+
+
+def _worker(args):
+  import jax
+  from jax import config
+  jax.distributed.initialize(f"localhost:{args.port}", args.num_processes,
+                             args.process_id)
+  paths = {"kv": 1 << 30}
+  if args.device_path:
+    paths["device"] = 0
+  results = []
+  for name, collective in _collectives().items():
+    for size_name, num_bytes in _SIZES.items():
+      x = np.full((num_bytes // 4,), args.process_id, np.float32)
+      for path, max_bytes in paths.items():
+        config.update("jax_multihost_kv_store_max_bytes", max_bytes)
+        device = path == "device"
+        collective(x, device)
+        times = []
+        for _ in range(args.iterations):
+          start_time = time.perf_counter()
+          collective(x, device)
+          times.append(time.perf_counter() - start_time)
+        results.append((name, size_name, path, statistics.median(times)))
+  if args.process_id == 0:
+    print(f"{'collective':<24} {'size':>6} {'path':>7} {'median':>12}")
+    for name, size_name, path, secs in results:
+      print(f"{name:<24} {size_name:>6} {path:>7} {secs * 1e3:10.3f}ms")
+  jax.distributed.shutdown()
+
+
+def _pick_port():
+  with socket.socket() as sock:
+    sock.bind(("localhost", 0))
+    return sock.getsockname()[1]
+
+
+def _launch(args):
+  env = dict(os.environ, JAX_PLATFORMS=args.platform)
+  port = _pick_port()
+  procs = []
+  for i in range(args.num_processes):
+    cmd = [sys.executable, __file__, f"--num_processes={args.num_processes}",
+           f"--iterations={args.iterations}", f"--platform={args.platform}",
+           f"--port={port}", f"--process_id={i}"]
+    if args.device_path:
+      cmd.append("--device_path")
+    if args.platform == "gpu":
+      env = dict(env, CUDA_VISIBLE_DEVICES=str(i))
+    procs.append(subprocess.Popen(cmd, env=env))
+  return max(proc.wait() for proc in procs)
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(prog="multihost_benchmark.py")
+  parser.add_argument("--num_processes", type=int, default=4)
+  parser.add_argument("--iterations", type=int, default=20)
+  parser.add_argument("--platform", default="cpu")
+  parser.add_argument("--device_path", action="store_true")
+  parser.add_argument("--port", type=int)
+  parser.add_argument("--process_id", type=int)
+  args = parser.parse_args(argv)
+  if args.process_id is None:
+    return _launch(args)
+  _worker(args)
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1:]))
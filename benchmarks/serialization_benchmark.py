@@ -0,0 +1,140 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for restoring array checkpoints from the local filesystem.
+
+The `bytes_per_second` counter reports the restore throughput, counting every
+byte `async_deserialize` reads, including reads from the earlier checkpoints
+an incremental checkpoint refers to. The `restore_baseline*` benchmarks admit
+reads in arrival order, as restores did before reads were admitted by
+priority. For example:
+
+  python benchmarks/serialization_benchmark.py \
+      --benchmark_filter=restore --benchmark_counters_tabular=true
+"""
+
+import asyncio
+import tempfile
+
+import google_benchmark
+import jax
+from jax.experimental.array_serialization import serialization
+import numpy as np
+
+from jax import config
+
+config.parse_flags_with_absl()
+
+
+def _write_checkpoint(ckpt_dir, num_arrays, array_mb):
+  sharding = jax.sharding.SingleDeviceSharding(jax.devices()[0])
+  num_elements = array_mb * 2**20 // 4
+  arrays = [jax.device_put(np.full((num_elements // 1024, 1024), i,
+                                   dtype=np.float32), sharding)
+            for i in range(num_arrays)]
+  specs = [serialization.get_tensorstore_spec(f"{ckpt_dir}/array_{i}")
+           for i in range(num_arrays)]
+  serialization.run_serialization(arrays, specs)
+  return [sharding] * num_arrays, specs
+
+
+_bytes_read = 0
+
+
+def _count_bytes_read(event, value):
+  global _bytes_read
+  if event == "/jax/checkpoint/read/array_bytes":
+    _bytes_read += value
+
+
+jax.monitoring.register_scalar_listener(_count_bytes_read)
+
+
+class _FifoLimitInFlightBytes(serialization._LimitInFlightBytes):
+  """Admits reads in arrival order, ignoring their priority."""
+
+  async def wait_for_bytes(self, requested_bytes, priority=()):
+    del priority
+    await super().wait_for_bytes(requested_bytes)
+
+
+def _run_fifo_deserialization(shardings, specs, concurrent_gb):
+  async def _run_deserializer():
+    byte_limiter = _FifoLimitInFlightBytes(concurrent_gb * 10**9)
+    return await asyncio.gather(*[
+        serialization.async_deserialize(s, spec, byte_limiter=byte_limiter)
+        for s, spec in zip(shardings, specs)])
+  return asyncio.run(_run_deserializer())
+
+
+def _restore_benchmark(state, concurrent_gb, fifo=False):
+  global _bytes_read
+  num_arrays, array_mb = state.range(0), state.range(1)
+  with tempfile.TemporaryDirectory() as ckpt_dir:
+    shardings, specs = _write_checkpoint(ckpt_dir, num_arrays, array_mb)
+    _bytes_read = 0
+    while state:
+      if fifo:
+        arrays = _run_fifo_deserialization(shardings, specs, concurrent_gb)
+      else:
+        arrays = serialization.run_deserialization(
+            shardings, specs, concurrent_gb=concurrent_gb)
+      jax.block_until_ready(arrays)
+  state.counters["bytes_per_second"] = google_benchmark.Counter(
+      _bytes_read, google_benchmark.Counter.kIsRate)
+
+
+@google_benchmark.register
+@google_benchmark.option.arg_names(["num_arrays", "array_mb"])
+@google_benchmark.option.args([64, 16])
+@google_benchmark.option.args([8, 256])
+@google_benchmark.option.unit(google_benchmark.kMillisecond)
+@google_benchmark.option.use_real_time()
+def restore(state):
+  _restore_benchmark(state, concurrent_gb=32)
+
+
+@google_benchmark.register
+@google_benchmark.option.arg_names(["num_arrays", "array_mb"])
+@google_benchmark.option.args([64, 16])
+@google_benchmark.option.args([8, 256])
+@google_benchmark.option.unit(google_benchmark.kMillisecond)
+@google_benchmark.option.use_real_time()
+def restore_limited_in_flight_bytes(state):
+  # Restricts the number of in-flight bytes to ~1GB, so reads are streamed in
+  # priority order rather than all issued at once.
+  _restore_benchmark(state, concurrent_gb=1)
+
+
+@google_benchmark.register
+@google_benchmark.option.arg_names(["num_arrays", "array_mb"])
+@google_benchmark.option.args([64, 16])
+@google_benchmark.option.args([8, 256])
+@google_benchmark.option.unit(google_benchmark.kMillisecond)
+@google_benchmark.option.use_real_time()
+def restore_baseline(state):
+  _restore_benchmark(state, concurrent_gb=32, fifo=True)
+
+
+@google_benchmark.register
+@google_benchmark.option.arg_names(["num_arrays", "array_mb"])
+@google_benchmark.option.args([64, 16])
+@google_benchmark.option.args([8, 256])
+@google_benchmark.option.unit(google_benchmark.kMillisecond)
+@google_benchmark.option.use_real_time()
+def restore_baseline_limited_in_flight_bytes(state):
+  _restore_benchmark(state, concurrent_gb=1, fifo=True)
+
+
+if __name__ == "__main__":
+  google_benchmark.main()
@@ -0,0 +1,182 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for how tracing, lowering and compiling scale with program size.
+
+Each synthetic program is built at several sizes, and each phase is measured
+on its own:
+
+  * `trace`: tracing the Python function to a jaxpr (`jax.make_jaxpr`).
+  * `dce`: dead code elimination of the traced jaxpr (`pe.dce_jaxpr`).
+  * `lower`: lowering the jaxpr to StableHLO (`mlir.lower_jaxpr_to_module`).
+  * `compile`: compiling the module with XLA, bypassing all caches.
+
+Benchmarks are named `<program>_<phase>_<size>`, and report the size of the
+jaxpr in the `eqns` counter. To track results across commits, save them as
+JSON and compare two runs with google_benchmark's `compare.py`:
+
+  python benchmarks/tracing_benchmark.py --benchmark_filter=_trace_ \
+      --benchmark_out=tracing.json --benchmark_out_format=json
+"""
+
+from functools import partial
+
+import google_benchmark
+import jax
+from jax import lax
+import jax.numpy as jnp
+import numpy as np
+
+from jax import config
+from jax._src import dispatch
+from jax._src import sharding_impls
+from jax._src import source_info_util
+from jax._src import xla_bridge as xb
+from jax._src.interpreters import mlir
+from jax._src.interpreters import partial_eval as pe
+
+config.parse_flags_with_absl()
+
+
+# Each program builder takes a size and returns a function and its arguments.
+# Functions define their inner closures when called, so that tracing them
+# again is not short-circuited by caches keyed on function identity. Programs
+# are built once per benchmark, outside of the timed region.
+
+def deep_mlp(depth):
+  def f(params, x):
+    for w, b in params:
+      x = jnp.tanh(x @ w + b)
+    return x
+  params = [(np.ones((128, 128), np.float32), np.ones((128,), np.float32))
+            for _ in range(depth)]
+  return f, (params, np.ones((8, 128), np.float32))
+
+
+def unrolled_scan(length):
+  def f(x):
+    def body(carry, _):
+      return jnp.sin(carry) * 2. + 1., None
+    return lax.scan(body, x, None, length=length, unroll=length)[0]
+  return f, (np.ones((128,), np.float32),)
+
+
+def wide_pytree(num_leaves):
+  def f(tree):
+    return jax.tree_util.tree_map(lambda x: x * 2. + 1., tree)
+  tree = {f"leaf_{i}": np.float32(i) for i in range(num_leaves)}
+  return f, (tree,)
+
+
+def nested_transforms(depth):
+  # Level k maps an array of rank k + 1 to a scalar, by summing the per-row
+  # gradients of level k - 1 under remat.
+  def f(x):
+    def level(g, y):
+      return jnp.sum(jax.vmap(jax.grad(jax.checkpoint(g)))(y))
+    g = lambda y: jnp.sum(jnp.sin(y) ** 2)
+    for _ in range(depth):
+      g = partial(level, g)
+    return g(x)
+  return f, (np.ones((2,) * depth + (16,), np.float32),)
+
+
+def switch_fanout(num_branches):
+  def f(i, x):
+    branches = [partial(lambda k, x: jnp.cos(x * k) + k, float(k))
+                for k in range(num_branches)]
+    return lax.switch(i, branches, x)
+  return f, (np.int32(0), np.ones((128,), np.float32))
+
+
+_PROGRAMS = {
+    "deep_mlp": (deep_mlp, [16, 128, 1024]),
+    "unrolled_scan": (unrolled_scan, [16, 128, 1024]),
+    "wide_pytree": (wide_pytree, [100, 1000, 10000]),
+    "nested_transforms": (nested_transforms, [1, 2, 4]),
+    "switch_fanout": (switch_fanout, [4, 32, 256]),
+}
+
+
+def _trace(fun, args):
+  return jax.make_jaxpr(fun)(*args)
+
+
+def _lower(closed_jaxpr):
+  backend = xb.get_backend()
+  axis_context = sharding_impls.ReplicaAxisContext(
+      sharding_impls.AxisEnv(nreps=1, names=(), sizes=()))
+  return mlir.lower_jaxpr_to_module(
+      "tracing_benchmark", closed_jaxpr, [], backend, backend.platform,
+      axis_context, source_info_util.new_name_stack(),
+      [False] * len(closed_jaxpr.in_avals)).module
+
+
+def _set_counters(state, closed_jaxpr):
+  state.counters["eqns"] = len(closed_jaxpr.jaxpr.eqns)
+
+
+def _bench_trace(program, size, state):
+  fun, args = program(size)
+  while state:
+    closed_jaxpr = _trace(fun, args)
+  _set_counters(state, closed_jaxpr)
+
+
+def _bench_dce(program, size, state):
+  fun, args = program(size)
+  while state:
+    # dce_jaxpr is cached on the jaxpr, so every iteration needs a new one.
+    state.pause_timing()
+    closed_jaxpr = _trace(fun, args)
+    used_outputs = [True] * len(closed_jaxpr.jaxpr.outvars)
+    state.resume_timing()
+    pe.dce_jaxpr(closed_jaxpr.jaxpr, used_outputs)
+  _set_counters(state, closed_jaxpr)
+
+
+def _bench_lower(program, size, state):
+  closed_jaxpr = _trace(*program(size))
+  while state:
+    _lower(closed_jaxpr)
+  _set_counters(state, closed_jaxpr)
+
+
+def _bench_compile(program, size, state):
+  closed_jaxpr = _trace(*program(size))
+  module = _lower(closed_jaxpr)
+  backend = xb.get_backend()
+  options = xb.get_compile_options(num_replicas=1, num_partitions=1)
+  while state:
+    dispatch.backend_compile(backend, module, options, host_callbacks=[])
+  _set_counters(state, closed_jaxpr)
+
+
+_PHASES = {
+    "trace": _bench_trace,
+    "dce": _bench_dce,
+    "lower": _bench_lower,
+    "compile": _bench_compile,
+}
+
+benchmarks = []
+for program_name, (program, sizes) in _PROGRAMS.items():
+  for phase_name, bench in _PHASES.items():
+    for size in sizes:
+      benchmarks.append(google_benchmark.register(
+          partial(bench, program, size),
+          name=f"{program_name}_{phase_name}_{size}"))
+
+
+if __name__ == "__main__":
+  google_benchmark.main()
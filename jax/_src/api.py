@@ -41,6 +41,7 @@ from jax._src.tree_util import (
     tree_map, tree_flatten, tree_unflatten, tree_structure, tree_transpose,
     tree_leaves, Partial, PyTreeDef, all_leaves, keystr, broadcast_prefix,
     prefix_errors, generate_key_paths)
+from jax._src import callback_executor
 from jax._src import core
 from jax._src import dispatch
 from jax._src import effects
@@ -2870,8 +2871,14 @@ def named_scope(
     yield
 
 def effects_barrier():
-  """Waits until existing functions have completed any side-effects."""
+  """Waits until existing functions have completed any side-effects.
+
+  This includes host callbacks queued on the callback thread pool (see
+  ``jax_callback_executor_threads``); the first exception raised by one of them
+  is re-raised here.
+  """
   dispatch.runtime_tokens.block_until_ready()
+  callback_executor.wait_for_pending_callbacks()
 
 def block_until_ready(x):
   """
@@ -2929,3 +2936,6 @@ def clear_caches():
 
   # Clear particular util.cache instances.
   dispatch.xla_primitive_callable.cache_clear()
+
+  # Clear executables shared between identical lowerings.
+  dispatch.clear_shared_executables()
@@ -15,20 +15,24 @@
 from __future__ import annotations
 
 import functools
-from typing import Any, Callable, Sequence
+from typing import Any, Callable, Optional, Sequence
 
 import numpy as np
 
+from jax._src import callback_executor
 from jax._src import core
 from jax._src import dispatch
 from jax._src import dtypes
 from jax._src import effects
+from jax._src import linear_util as lu
 from jax._src import sharding_impls
 from jax._src import tree_util
 from jax._src import util
 from jax._src.interpreters import ad
 from jax._src.interpreters import batching
 from jax._src.interpreters import mlir
+from jax._src.lax import lax
+from jax._src.lax import slicing
 from jax._src.lib import xla_client as xc
 from jax._src.lax.control_flow.loops import map as lax_map
 
@@ -40,8 +44,8 @@ map, unsafe_map = util.safe_map, map
 
 
 def pure_callback_impl(*args, result_avals, callback: Callable[..., Any],
-                       vectorized: bool):
-  del vectorized, result_avals
+                       vectorized: bool, chunk_size: Optional[int]):
+  del vectorized, chunk_size, result_avals
   return callback(*args)
 pure_callback_p.def_impl(functools.partial(dispatch.apply_primitive,
                                            pure_callback_p))
@@ -49,8 +53,9 @@ pure_callback_p.def_impl(functools.partial(dispatch.apply_primitive,
 
 @pure_callback_p.def_abstract_eval
 def pure_callback_abstract_eval(*avals, callback: Callable[..., Any],
-                                result_avals, vectorized: bool):
-  del avals, callback, vectorized
+                                result_avals, vectorized: bool,
+                                chunk_size: Optional[int]):
+  del avals, callback, vectorized, chunk_size
   return result_avals
 
 
@@ -74,18 +79,23 @@ ad.primitive_transposes[pure_callback_p] = pure_callback_transpose_rule
 
 
 def pure_callback_batching_rule(args, dims, *, callback, vectorized: bool,
+                                chunk_size: Optional[int],
                                 result_avals: Sequence[core.ShapedArray]):
   axis_size = next(a.shape[0] for a, d in zip(args, dims)
                    if d is not batching.not_mapped)
   new_args = [arg if dim is batching.not_mapped else
               batching.moveaxis(arg, dim, 0) for arg, dim in zip(args, dims)]
-  if vectorized:
+  if chunk_size is not None:
+    outvals = _chunked_batching(new_args, dims, axis_size, callback=callback,
+                                vectorized=vectorized, chunk_size=chunk_size,
+                                result_avals=result_avals)
+  elif vectorized:
     result_avals = tuple(
         core.unmapped_aval(axis_size, core.no_axis_name, 0, aval)  # type: ignore
         for aval in result_avals)
     outvals = pure_callback_p.bind(
         *new_args, callback=callback, vectorized=vectorized,
-        result_avals=result_avals)
+        chunk_size=chunk_size, result_avals=result_avals)
   else:
     is_batched = [d is not batching.not_mapped for d in dims]
     unbatched_args, batched_args = util.partition_list(is_batched, new_args)
@@ -93,11 +103,85 @@ def pure_callback_batching_rule(args, dims, *, callback, vectorized: bool,
       merged_args = util.merge_lists(is_batched, unbatched_args, batched_args)
       return pure_callback_p.bind(
           *merged_args, callback=callback, result_avals=result_avals,
-          vectorized=vectorized)
+          vectorized=vectorized, chunk_size=chunk_size)
     outvals = lax_map(_batch_fun, batched_args)
   return tuple(outvals), (0,) * len(outvals)
 
 
+def _chunked_batching(args, dims, axis_size: int, *, callback,
+                      vectorized: bool, chunk_size: int,
+                      result_avals: Sequence[core.ShapedArray]):
+  """Maps `callback` over the batch axis in chunks of `chunk_size` rows.
+
+  Each chunk is one host round trip. On the host, the chunk is passed to
+  `callback` directly if it is vectorized, or else split into rows that run on
+  a thread pool.
+  """
+  is_batched = [d is not batching.not_mapped for d in dims]
+  unbatched_args, batched_args = util.partition_list(is_batched, args)
+  chunk_callback = _ChunkCallback(callback, tuple(is_batched), vectorized)
+
+  def call_chunk(batched_chunk):
+    n = batched_chunk[0].shape[0]
+    merged_args = util.merge_lists(is_batched, unbatched_args, batched_chunk)
+    chunk_avals = tuple(
+        core.unmapped_aval(n, core.no_axis_name, 0, aval)  # type: ignore
+        for aval in result_avals)
+    # Binding with the same chunk size chunks any enclosing vmap too.
+    return pure_callback_p.bind(
+        *merged_args, callback=chunk_callback, result_avals=chunk_avals,
+        vectorized=False, chunk_size=chunk_size)
+
+  num_chunks, remainder = divmod(axis_size, chunk_size)
+  outs = []
+  if num_chunks:
+    chunks = [lax.reshape(
+                  slicing.slice_in_dim(x, 0, num_chunks * chunk_size),
+                  (num_chunks, chunk_size, *x.shape[1:]))
+              for x in batched_args]
+    outs.append([
+        lax.reshape(out, (num_chunks * chunk_size, *out.shape[2:]))
+        for out in lax_map(call_chunk, chunks)])
+  if remainder:
+    outs.append(call_chunk([
+        slicing.slice_in_dim(x, num_chunks * chunk_size, axis_size)
+        for x in batched_args]))
+  if not outs:
+    return [lax.full((0, *aval.shape), 0, aval.dtype) for aval in result_avals]
+  if len(outs) == 1:
+    return outs[0]
+  return [lax.concatenate(list(pair), 0) for pair in zip(*outs)]
+
+
+class _ChunkCallback:
+  """Runs a batched callback on the host over a chunk of its batch."""
+
+  def __init__(self, callback: Callable[..., Any], is_batched: tuple[bool, ...],
+               vectorized: bool):
+    self.callback = callback
+    self.is_batched = is_batched
+    self.vectorized = vectorized
+    self.__name__ = lu.fun_name(callback)
+
+  def __call__(self, *args):
+    if self.vectorized:
+      return self.callback(*args)
+    n = next(np.shape(x)[0] for x, b in zip(args, self.is_batched) if b)
+    def row(i):
+      return self.callback(*(x[i] if b else x
+                             for x, b in zip(args, self.is_batched)))
+    # Rows are written into the outputs as they complete, rather than stacked
+    # at the end, so that at most one copy of each row's results is alive.
+    outs = None
+    for i, row_outs in enumerate(callback_executor.map_rows(row, n)):
+      row_outs = [np.asarray(o) for o in row_outs]
+      if outs is None:
+        outs = [np.empty((n, *o.shape), o.dtype) for o in row_outs]
+      for out, o in zip(outs, row_outs):
+        out[i] = o
+    return outs
+
+
 batching.primitive_batchers[pure_callback_p] = pure_callback_batching_rule
 
 
@@ -140,7 +224,7 @@ def pure_callback_lowering(ctx, *args, callback, **params):
 
   result, _, keepalive = mlir.emit_python_callback(
       ctx, _callback, None, list(args), ctx.avals_in, ctx.avals_out, False,
-      sharding=sharding)
+      sharding=sharding, name=lu.fun_name(callback))
   ctx.module_context.add_keepalive(keepalive)
   return result
 
@@ -153,7 +237,8 @@ def _check_shape_dtype(shape_dtype):
         "Cannot return 64-bit values when `jax_enable_x64` is disabled")
 
 def pure_callback(callback: Callable[..., Any], result_shape_dtypes: Any,
-                  *args: Any, vectorized: bool = False, **kwargs: Any):
+                  *args: Any, vectorized: bool = False,
+                  chunk_size: Optional[int] = None, **kwargs: Any):
   """Calls a pure Python callback.
 
   For more explanation, see `External Callbacks`_.
@@ -167,6 +252,8 @@ def pure_callback(callback: Callable[..., Any], result_shape_dtypes: Any,
     *args: arguments to be passed to the callback function
     vectorized: boolean specifying whether the callback function can operate in a
       vectorized manner.
+    chunk_size: optional integer; if set, batches under ``vmap`` are sent to
+      the host in chunks of at most this many elements.
     **kwargs: keyword arguments to be passed to the callback function
 
   Returns:
@@ -180,10 +267,15 @@ def pure_callback(callback: Callable[..., Any], result_shape_dtypes: Any,
 
   .. _External Callbacks: https://jax.readthedocs.io/en/latest/notebooks/external_callbacks.html
   """
+  @functools.wraps(callback)
   def _flat_callback(*flat_args):
     args, kwargs = tree_util.tree_unflatten(in_tree, flat_args)
     return tree_util.tree_leaves(callback(*args, **kwargs))
 
+  if chunk_size is not None and (
+      not isinstance(chunk_size, int) or chunk_size < 1):
+    raise ValueError(
+        f"pure_callback chunk_size must be a positive integer, got {chunk_size}")
   flat_args, in_tree = tree_util.tree_flatten((args, kwargs))
   tree_util.tree_map(_check_shape_dtype, result_shape_dtypes)
   result_avals = tree_util.tree_map(
@@ -191,13 +283,15 @@ def pure_callback(callback: Callable[..., Any], result_shape_dtypes: Any,
   flat_result_avals, out_tree = tree_util.tree_flatten(result_avals)
   out_flat = pure_callback_p.bind(
       *flat_args, callback=_flat_callback,
-      result_avals=tuple(flat_result_avals), vectorized=vectorized)
+      result_avals=tuple(flat_result_avals), vectorized=vectorized,
+      chunk_size=chunk_size)
   return tree_util.tree_unflatten(out_tree, out_flat)
 
 
 
 def pure_callback_api(callback: Callable[..., Any], result_shape_dtypes: Any,
-                      *args: Any, vectorized: bool = False, **kwargs: Any):
+                      *args: Any, vectorized: bool = False,
+                      chunk_size: Optional[int] = None, **kwargs: Any):
   """Applies a functionally pure Python callable. Works under :func:`jit`/:func:`~pmap`/etc.
 
   ``pure_callback`` enables calling a Python function in JIT-ed JAX functions.
@@ -225,6 +319,21 @@ def pure_callback_api(callback: Callable[..., Any], result_shape_dtypes: Any,
   to set ``vectorized=True`` because the ``np.matmul`` function handles
   arbitrary leading batch dimensions.
 
+  Mapping a callback sequentially makes one round trip to the host per batch
+  element. If ``chunk_size`` is set, the batch is instead sent to the host in
+  chunks of at most ``chunk_size`` elements, one round trip per chunk. A
+  vectorized callback is called once per chunk; otherwise, the elements of a
+  chunk are passed to ``callback`` one at a time, concurrently on a thread
+  pool, so the callback must be thread-safe.
+
+  The arguments are passed to ``callback`` as read-only NumPy arrays. Its
+  results may be NumPy arrays or CPU tensors of other libraries, which are
+  adopted through DLPack or the buffer protocol without an intermediate copy.
+  The results are copied into the output buffers of the computation before
+  ``callback`` returns control to the runtime, so a callback that is not run
+  concurrently by ``chunk_size`` may write its results into preallocated
+  arrays that it reuses across calls, e.g. with ``np.add(x, y, out=buf)``.
+
   Args:
     callback: A Python callable. The callable will be passed PyTrees of NumPy
       arrays as arguments, and should return a PyTree of NumPy arrays that
@@ -241,6 +350,10 @@ def pure_callback_api(callback: Callable[..., Any], result_shape_dtypes: Any,
       dimensions instead of executing ``callback`` on each mapped input
       individually. The callback should also return outputs batched across the
       leading axis. By default, ``vectorized`` is ``False``.
+    chunk_size: An optional positive integer. If set, when the callback is
+      mapped via `jax.vmap`, the batch is transferred to the host in chunks of
+      at most ``chunk_size`` elements rather than one element at a time. By
+      default, ``chunk_size`` is ``None``.
     **kwargs: The keyword arguments to the callback. Must be PyTrees of JAX
       types.
 
@@ -248,7 +361,7 @@ def pure_callback_api(callback: Callable[..., Any], result_shape_dtypes: Any,
     The value of ``callback(*args, **kwargs)``.
   """
   return pure_callback(callback, result_shape_dtypes, *args,
-                       vectorized=vectorized, **kwargs)
+                       vectorized=vectorized, chunk_size=chunk_size, **kwargs)
 
 
 # IO Callback
@@ -301,7 +414,7 @@ def io_callback_batching_rule(args, dims, callback, result_avals, ordered):
   if ordered:
     raise ValueError("Cannot `vmap` ordered IO callback.")
   return pure_callback_batching_rule(args, dims, callback=callback,
-      vectorized=False, result_avals=result_avals)
+      vectorized=False, chunk_size=None, result_avals=result_avals)
 batching.primitive_batchers[io_callback_p] = io_callback_batching_rule
 
 def io_callback_lowering(ctx, *args, callback, ordered, **params):
@@ -327,12 +440,12 @@ def io_callback_lowering(ctx, *args, callback, ordered, **params):
     token = ctx.tokens_in.get(_OrderedIOEffect)[0]
     result, token, keepalive = mlir.emit_python_callback(
         ctx, _callback, token, list(args), ctx.avals_in, ctx.avals_out, True,
-        sharding=sharding)
+        sharding=sharding, name=lu.fun_name(callback))
     ctx.set_tokens_out(mlir.TokenSet({_OrderedIOEffect: (token,)}))
   else:
     result, token, keepalive = mlir.emit_python_callback(
         ctx, _callback, None, list(args), ctx.avals_in, ctx.avals_out, True,
-        sharding=sharding)
+        sharding=sharding, name=lu.fun_name(callback), allow_async=True)
   ctx.module_context.add_keepalive(keepalive)
   return result
 mlir.register_lowering(io_callback_p, io_callback_lowering)
@@ -364,6 +477,7 @@ def io_callback(callback: Callable[..., Any], result_shape_dtypes: Any,
 
   .. _External Callbacks: https://jax.readthedocs.io/en/latest/notebooks/external_callbacks.html
   """
+  @functools.wraps(callback)
   def _flat_callback(*flat_args):
     args, kwargs = tree_util.tree_unflatten(in_tree, flat_args)
     return tree_util.tree_leaves(callback(*args, **kwargs))
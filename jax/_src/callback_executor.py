@@ -0,0 +1,276 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Executes host callbacks on a shared, bounded thread pool.
+
+Python callbacks are invoked by whichever runtime thread reaches them. A
+callback that has no results and no ordering token, e.g. an unordered
+``jax.debug.callback`` or an unordered ``io_callback`` that returns nothing,
+need not hold up that thread: if ``jax_callback_executor_threads`` is positive
+when it is lowered, it is queued on a thread pool and the computation
+continues. Callbacks that
+return results, or that are ordered by a token, always run on the runtime
+thread, so ``OrderedIOEffect`` ordering is preserved.
+
+Every callback's latency is recorded, per callback, in a histogram returned by
+:func:`get_stats`, and as a ``jax._src.monitoring`` duration event.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import copy
+import dataclasses
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+
+from jax._src import monitoring
+from jax._src.config import config
+
+CALLBACK_LATENCY_EVENT = "/jax/callbacks/latency_secs"
+CALLBACK_QUEUE_DEPTH_SCALAR = "/jax/callbacks/queue_depth"
+
+# Upper bounds of the latency histogram buckets. The last bucket counts the
+# callbacks slower than LATENCY_BUCKET_BOUNDS_SECS[-1].
+LATENCY_BUCKET_BOUNDS_SECS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0)
+
+
+@dataclasses.dataclass
+class LatencyHistogram:
+  """The latencies of the calls to one callback.
+
+  Attributes:
+    count: number of calls.
+    total_secs: total time spent in the callback.
+    max_secs: the latency of the slowest call.
+    bucket_counts: ``bucket_counts[i]`` is the number of calls that took at
+      most ``LATENCY_BUCKET_BOUNDS_SECS[i]`` and longer than the previous
+      bound; the last entry counts the calls slower than every bound.
+  """
+  count: int = 0
+  total_secs: float = 0.0
+  max_secs: float = 0.0
+  bucket_counts: list[int] = dataclasses.field(
+      default_factory=lambda: [0] * (len(LATENCY_BUCKET_BOUNDS_SECS) + 1))
+
+  def add(self, secs: float) -> None:
+    self.count += 1
+    self.total_secs += secs
+    self.max_secs = max(self.max_secs, secs)
+    for i, bound in enumerate(LATENCY_BUCKET_BOUNDS_SECS):
+      if secs <= bound:
+        self.bucket_counts[i] += 1
+        break
+    else:
+      self.bucket_counts[-1] += 1
+
+
+@dataclasses.dataclass
+class CallbackStats:
+  """Host callback statistics for this process.
+
+  Attributes:
+    latency_by_callback: latency histogram per callback name.
+    num_queued: number of callbacks run on the callback thread pool instead of
+      the runtime thread that invoked them.
+    max_queue_depth: the largest number of queued callbacks that were pending
+      at once.
+  """
+  latency_by_callback: dict[str, LatencyHistogram] = dataclasses.field(
+      default_factory=dict)
+  num_queued: int = 0
+  max_queue_depth: int = 0
+
+
+_stats = CallbackStats()
+_stats_lock = threading.Lock()
+
+
+def get_stats() -> CallbackStats:
+  """Returns a snapshot of the host callback statistics."""
+  with _stats_lock:
+    return copy.deepcopy(_stats)
+
+
+def reset_stats() -> None:
+  """Resets the host callback statistics."""
+  global _stats
+  with _stats_lock:
+    _stats = CallbackStats()
+
+
+def _record_latency(name: str, secs: float) -> None:
+  with _stats_lock:
+    histogram = _stats.latency_by_callback.get(name)
+    if histogram is None:
+      histogram = _stats.latency_by_callback[name] = LatencyHistogram()
+    histogram.add(secs)
+  monitoring.record_event_duration_secs(CALLBACK_LATENCY_EVENT, secs)
+
+
+def _timed_call(name: str, callback: Callable[..., Any], args) -> Any:
+  start_time = time.time()
+  try:
+    return callback(*args)
+  finally:
+    _record_latency(name, time.time() - start_time)
+
+
+_pool_thread = threading.local()
+
+
+def in_pool_thread() -> bool:
+  """Whether the current thread is running a task of the callback pool."""
+  return getattr(_pool_thread, "active", False)
+
+
+def _in_pool_thread(f: Callable[..., Any]) -> Callable[..., Any]:
+  def wrapped(*args):
+    _pool_thread.active = True
+    try:
+      return f(*args)
+    finally:
+      _pool_thread.active = False
+  return wrapped
+
+
+class _CallbackExecutor:
+  """Runs queued callbacks on bounded thread pools.
+
+  Callbacks lowered with different ``jax_callback_executor_threads`` run on
+  different pools, one per thread count, which are created on first use and
+  never shut down, so that callbacks lowered with one setting never wait for
+  those lowered with another. At most `max_pending` callbacks are queued or
+  running at any time across all pools; a runtime thread that queues a
+  callback beyond that waits for one to finish, so that a slow callback
+  applies backpressure instead of growing the queue without bound.
+  """
+
+  def __init__(self, max_pending: int):
+    self._pools: dict[Optional[int], concurrent.futures.ThreadPoolExecutor] = {}
+    self._slots = threading.BoundedSemaphore(max_pending)
+    self._lock = threading.Lock()
+    self._pending: set[concurrent.futures.Future] = set()
+    self._errors: list[Exception] = []
+
+  def pool(self, num_threads: Optional[int]
+           ) -> concurrent.futures.ThreadPoolExecutor:
+    """Returns the pool of `num_threads` threads, or of the default size."""
+    with self._lock:
+      pool = self._pools.get(num_threads)
+      if pool is None:
+        pool = self._pools[num_threads] = concurrent.futures.ThreadPoolExecutor(
+            max_workers=num_threads, thread_name_prefix="jax_callback")
+      return pool
+
+  def submit(self, num_threads: int, name: str, callback: Callable[..., Any],
+             args) -> None:
+    # The runtime may reuse the memory of the arguments once the callback
+    # returns, so a queued callback gets arguments that own their memory.
+    args = tuple(x if not isinstance(x, np.ndarray) or x.flags.owndata
+                 else x.copy() for x in args)
+    pool = self.pool(num_threads)
+    self._slots.acquire()
+    with self._lock:
+      future = pool.submit(_in_pool_thread(self._run), name, callback, args)
+      self._pending.add(future)
+      depth = len(self._pending)
+    with _stats_lock:
+      _stats.num_queued += 1
+      _stats.max_queue_depth = max(_stats.max_queue_depth, depth)
+    monitoring.record_scalar(CALLBACK_QUEUE_DEPTH_SCALAR, depth)
+    future.add_done_callback(self._done)
+
+  def _run(self, name: str, callback: Callable[..., Any], args) -> None:
+    try:
+      _timed_call(name, callback, args)
+    except Exception as ex:
+      with self._lock:
+        self._errors.append(ex)
+
+  def _done(self, future: concurrent.futures.Future) -> None:
+    with self._lock:
+      self._pending.discard(future)
+      depth = len(self._pending)
+    self._slots.release()
+    monitoring.record_scalar(CALLBACK_QUEUE_DEPTH_SCALAR, depth)
+
+  def wait(self) -> None:
+    with self._lock:
+      pending = list(self._pending)
+    concurrent.futures.wait(pending)
+    with self._lock:
+      errors, self._errors = self._errors, []
+    if errors:
+      raise errors[0]
+
+
+_executor: Optional[_CallbackExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> _CallbackExecutor:
+  global _executor
+  with _executor_lock:
+    if _executor is None:
+      _executor = _CallbackExecutor(config.jax_callback_executor_max_pending)
+    return _executor
+
+
+def map_rows(f: Callable[[int], Any], n: int) -> Iterator[Any]:
+  """Yields ``f(i)`` for ``i in range(n)``, computed on the callback pool.
+
+  Calls made from a thread of the pool run ``f`` inline, since waiting on the
+  pool from one of its own threads could deadlock.
+  """
+  if in_pool_thread():
+    return (f(i) for i in range(n))
+  return _get_executor().pool(None).map(_in_pool_thread(f), range(n))
+
+
+def wrap_callback(name: str, callback: Callable[..., Any], *,
+                  can_queue: bool) -> Callable[..., Any]:
+  """Wraps a host callback being lowered to time it and, if possible, queue it.
+
+  Whether to queue the callback is decided by the value of
+  ``jax_callback_executor_threads`` when it is lowered, since runtime threads
+  do not see the thread-local configuration of the thread that called the
+  computation.
+
+  Args:
+    name: the name the callback's latency is recorded under.
+    callback: the callback, returning a sequence of results.
+    can_queue: whether the runtime may continue without waiting for the
+      callback, i.e. it has no results and is not ordered by a token.
+  """
+  num_threads = config.jax_callback_executor_threads if can_queue else 0
+  def wrapped(*args):
+    if num_threads > 0:
+      _get_executor().submit(num_threads, name, callback, args)
+      return ()
+    return _timed_call(name, callback, args)
+  return wrapped
+
+
+def wait_for_pending_callbacks() -> None:
+  """Blocks until all queued callbacks have finished.
+
+  Re-raises the first exception raised by a queued callback since the last
+  call.
+  """
+  if _executor is not None:
+    _executor.wait()
@@ -12,13 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
+import collections
+import concurrent.futures
+import copy
+import dataclasses
 import hashlib
 import io
 import logging
 import os
 import re
+import struct
 import sys
-from typing import Any, Optional
+import threading
+import time
+from typing import Any, Callable, Optional
+import warnings
+import weakref
 import zlib
 
 import numpy as np
@@ -30,9 +40,10 @@ except ImportError:
   zstandard = None
 
 from jax._src.config import config
+from jax._src import monitoring
 from jax._src import path as pathlib
 from jax._src.compilation_cache_interface import CacheInterface
-from jax._src.gfile_cache import GFileCache
+from jax._src.gfile_cache import GFileCache, MmapFileCache
 from jax._src.lib import xla_client
 from jax._src.lib import version_str as jaxlib_version_str
 from jax._src.lib.mlir import ir
@@ -51,6 +62,119 @@ logger = logging.getLogger(__name__)
 
 _cache: Optional[CacheInterface] = None
 
+# Optional host-local tier in front of `_cache`, e.g. on local SSD or /dev/shm,
+# holding the same compressed entries. It is read through mmap so that workers
+# on the same host share the page cache.
+_local_cache: Optional[MmapFileCache] = None
+
+# Optional in-process tier holding deserialized executables and the time they
+# took to compile, keyed by (cache_key, backend), in least recently used order.
+_memory_cache: collections.OrderedDict[
+    tuple[str, Any], tuple[xla_client.LoadedExecutable, float]] = (
+        collections.OrderedDict())
+_memory_cache_lock = threading.Lock()
+
+# Events recorded through jax._src.monitoring for each cache tier.
+MEMORY_CACHE_HIT_EVENT = "/jax/compilation_cache/memory_cache_hits"
+MEMORY_CACHE_MISS_EVENT = "/jax/compilation_cache/memory_cache_misses"
+LOCAL_CACHE_HIT_EVENT = "/jax/compilation_cache/local_cache_hits"
+LOCAL_CACHE_MISS_EVENT = "/jax/compilation_cache/local_cache_misses"
+PERSISTENT_CACHE_HIT_EVENT = "/jax/compilation_cache/persistent_cache_hits"
+PERSISTENT_CACHE_MISS_EVENT = "/jax/compilation_cache/persistent_cache_misses"
+ASYNC_WRITE_DROPPED_EVENT = "/jax/compilation_cache/async_writes_dropped"
+ASYNC_WRITE_QUEUE_DEPTH_SCALAR = (
+    "/jax/compilation_cache/async_write_queue_depth")
+
+# Events recorded through jax._src.monitoring for the cache as a whole.
+CACHE_HIT_EVENT = "/jax/compilation_cache/cache_hits"
+CACHE_MISS_EVENT = "/jax/compilation_cache/cache_misses"
+WRITE_SKIPPED_MIN_COMPILE_TIME_EVENT = (
+    "/jax/compilation_cache/writes_skipped_min_compile_time")
+WRITE_SKIPPED_HOST_CALLBACKS_EVENT = (
+    "/jax/compilation_cache/writes_skipped_host_callbacks")
+DESERIALIZE_DURATION_EVENT = "/jax/compilation_cache/deserialize_duration_secs"
+COMPILE_TIME_SAVED_EVENT = "/jax/compilation_cache/compile_time_saved_secs"
+BYTES_READ_SCALAR = "/jax/compilation_cache/bytes_read"
+BYTES_WRITTEN_SCALAR = "/jax/compilation_cache/bytes_written"
+
+# Each entry is the compressed executable prefixed with the time it took to
+# compile, in milliseconds, so that hits can report the compile time saved.
+_ENTRY_HEADER = struct.Struct(">I")
+
+
+@dataclasses.dataclass
+class CacheStats:
+  """Persistent compilation cache statistics for this process.
+
+  Attributes:
+    hits: number of executables loaded from the cache, from any tier.
+    misses: number of lookups that found no entry.
+    bytes_read: compressed bytes read from the host-local or persistent tiers.
+    bytes_written: compressed bytes written to the persistent tier.
+    deserialize_time_secs: total time spent decompressing and deserializing.
+    compile_time_saved_secs: total original compile time of the executables
+      loaded from the cache.
+    writes_skipped_min_compile_time: number of executables not written because
+      they compiled faster than `jax_persistent_cache_min_compile_time_secs`.
+    writes_skipped_host_callbacks: number of executables not written because
+      they use host callbacks.
+    hits_by_module: hits per module name.
+    misses_by_module: misses per module name.
+  """
+  hits: int = 0
+  misses: int = 0
+  bytes_read: int = 0
+  bytes_written: int = 0
+  deserialize_time_secs: float = 0.0
+  compile_time_saved_secs: float = 0.0
+  writes_skipped_min_compile_time: int = 0
+  writes_skipped_host_callbacks: int = 0
+  hits_by_module: collections.Counter = dataclasses.field(
+      default_factory=collections.Counter)
+  misses_by_module: collections.Counter = dataclasses.field(
+      default_factory=collections.Counter)
+
+
+_stats = CacheStats()
+_stats_lock = threading.Lock()
+
+
+def get_stats() -> CacheStats:
+  """Returns a snapshot of the compilation cache statistics."""
+  with _stats_lock:
+    return copy.deepcopy(_stats)
+
+
+def reset_stats() -> None:
+  """Resets the compilation cache statistics to zero."""
+  global _stats
+  with _stats_lock:
+    _stats = CacheStats()
+
+
+def record_skipped_write(reason: str) -> None:
+  """Records that an executable was not written to the cache.
+
+  Args:
+    reason: one of "min_compile_time" or "host_callbacks".
+  """
+  with _stats_lock:
+    if reason == "min_compile_time":
+      _stats.writes_skipped_min_compile_time += 1
+      event = WRITE_SKIPPED_MIN_COMPILE_TIME_EVENT
+    elif reason == "host_callbacks":
+      _stats.writes_skipped_host_callbacks += 1
+      event = WRITE_SKIPPED_HOST_CALLBACKS_EVENT
+    else:
+      raise ValueError(f"Unknown reason for skipping a cache write: {reason}")
+  monitoring.record_event(event)
+
+
+def module_name_from_key(cache_key: str) -> str:
+  """Returns the module name part of a key returned by get_cache_key()."""
+  module_name, sep, _ = cache_key.rpartition("-")
+  return module_name if sep else cache_key
+
 
 def initialize_cache(path):
   """Creates a global cache object.
@@ -70,8 +194,101 @@ def initialize_cache(path):
   assert (
       _cache is None
   ), f"The cache path has already been initialized to {_cache._path}"
-  _cache = GFileCache(path)
+  _cache = GFileCache(path, max_size=config.jax_compilation_cache_max_size)
   logger.warning("Initialized persistent compilation cache at %s", path)
+  _initialize_local_cache()
+
+
+def _initialize_local_cache():
+  global _local_cache
+  local_dir = config.jax_compilation_cache_local_dir
+  if not local_dir or _local_cache is not None:
+    return
+  if pathlib.Path(local_dir) == _cache._path:
+    logger.warning("Not using %s as a host-local compilation cache because it "
+                   "is the persistent compilation cache directory", local_dir)
+    return
+  _local_cache = MmapFileCache(
+      local_dir, max_size=config.jax_compilation_cache_local_max_size)
+  logger.info("Initialized host-local compilation cache at %s", local_dir)
+
+
+def _memory_cache_get(key: tuple[str, Any]):
+  with _memory_cache_lock:
+    entry = _memory_cache.get(key)
+    if entry is not None:
+      _memory_cache.move_to_end(key)
+    return entry
+
+
+def _memory_cache_put(key: tuple[str, Any],
+                      executable: xla_client.LoadedExecutable,
+                      compile_time_secs: float):
+  max_entries = config.jax_compilation_cache_memory_max_entries
+  if max_entries <= 0:
+    return
+  with _memory_cache_lock:
+    _memory_cache[key] = (executable, compile_time_secs)
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > max_entries:
+      _memory_cache.popitem(last=False)
+
+
+def _get_serialized(cache_key: str):
+  """Returns the compressed entry for `cache_key` from the slowest tiers."""
+  if _local_cache is not None:
+    serialized_executable = _local_cache.get(cache_key)
+    if serialized_executable:
+      monitoring.record_event(LOCAL_CACHE_HIT_EVENT)
+      return serialized_executable
+    monitoring.record_event(LOCAL_CACHE_MISS_EVENT)
+
+  serialized_executable = _cache.get(cache_key)
+  if not serialized_executable:
+    monitoring.record_event(PERSISTENT_CACHE_MISS_EVENT)
+    return None
+  monitoring.record_event(PERSISTENT_CACHE_HIT_EVENT)
+  if _local_cache is not None:
+    _local_cache.put(cache_key, serialized_executable)
+  return serialized_executable
+
+
+# Maps (platform, platform_version) to whether the backend can serialize
+# executables.
+_serialization_support: dict[tuple[str, str], bool] = {}
+_serialization_support_lock = threading.Lock()
+
+_SERIALIZATION_PROBE_MODULE = """
+module @jax_serialization_probe {
+  func.func public @main() -> () {
+    return
+  }
+}
+"""
+
+
+def is_cache_supported(backend) -> bool:
+  """Returns whether executables compiled by `backend` can be cached.
+
+  Support is detected once per platform by compiling a trivial computation and
+  trying to serialize it, rather than from a fixed list of platforms.
+  """
+  key = (backend.platform, backend.platform_version)
+  with _serialization_support_lock:
+    supported = _serialization_support.get(key)
+    if supported is None:
+      try:
+        options = xla_client.CompileOptions()
+        executable = backend.compile(_SERIALIZATION_PROBE_MODULE, options)
+        backend.serialize_executable(executable)
+        supported = True
+      except Exception as ex:
+        logger.info(
+            "Persistent compilation cache disabled for platform %s because "
+            "its executables can't be serialized: %s", backend.platform, ex)
+        supported = False
+      _serialization_support[key] = supported
+  return supported
 
 
 def get_executable(
@@ -81,9 +298,22 @@ def get_executable(
   assert (
       _cache is not None
   ), "initialize_cache must be called before you can call get_executable()"
-  serialized_executable = _cache.get(cache_key)
-  if not serialized_executable:
+  module_name = module_name_from_key(cache_key)
+  memory_key = (cache_key, backend)
+  memory_entry = _memory_cache_get(memory_key)
+  if memory_entry is not None:
+    monitoring.record_event(MEMORY_CACHE_HIT_EVENT)
+    xla_executable, compile_time_secs = memory_entry
+    _record_hit(module_name, 0, 0.0, compile_time_secs)
+    return xla_executable
+  monitoring.record_event(MEMORY_CACHE_MISS_EVENT)
+
+  serialized_entry = _get_serialized(cache_key)
+  if not serialized_entry:
+    _record_miss(module_name)
     return None
+  start_time = time.monotonic()
+  serialized_executable, compile_time_secs = _split_entry(serialized_entry)
   if zstandard:
     decompressor = zstandard.ZstdDecompressor()
     serialized_executable = decompressor.decompress(serialized_executable)
@@ -92,16 +322,68 @@ def get_executable(
   xla_executable_deserialized = backend.deserialize_executable(
       serialized_executable, compile_options
   )
+  deserialize_time_secs = time.monotonic() - start_time
+  _memory_cache_put(memory_key, xla_executable_deserialized, compile_time_secs)
+  _record_hit(module_name, len(serialized_entry), deserialize_time_secs,
+              compile_time_secs)
   return xla_executable_deserialized
 
 
+def _record_hit(module_name: str, bytes_read: int,
+                deserialize_time_secs: float, compile_time_secs: float):
+  with _stats_lock:
+    _stats.hits += 1
+    _stats.hits_by_module[module_name] += 1
+    _stats.bytes_read += bytes_read
+    _stats.deserialize_time_secs += deserialize_time_secs
+    _stats.compile_time_saved_secs += compile_time_secs
+  monitoring.record_event(CACHE_HIT_EVENT)
+  if bytes_read:
+    monitoring.record_scalar(BYTES_READ_SCALAR, bytes_read)
+    monitoring.record_event_duration_secs(DESERIALIZE_DURATION_EVENT,
+                                          deserialize_time_secs)
+  monitoring.record_event_duration_secs(COMPILE_TIME_SAVED_EVENT,
+                                        compile_time_secs)
+
+
+def _record_miss(module_name: str):
+  with _stats_lock:
+    _stats.misses += 1
+    _stats.misses_by_module[module_name] += 1
+  monitoring.record_event(CACHE_MISS_EVENT)
+
+
+def _combine_entry(compressed_executable: bytes,
+                   compile_time_secs: float) -> bytes:
+  compile_time_ms = min(int(compile_time_secs * 1000), 2**32 - 1)
+  return _ENTRY_HEADER.pack(compile_time_ms) + compressed_executable
+
+
+def _split_entry(entry) -> tuple[memoryview, float]:
+  """Returns the compressed executable and compile time stored in `entry`."""
+  compile_time_ms, = _ENTRY_HEADER.unpack_from(entry)
+  return memoryview(entry)[_ENTRY_HEADER.size:], compile_time_ms / 1000
+
+
+def read_entry_compile_time(entry_header: bytes) -> float:
+  """Returns the compile time in seconds stored in the header of an entry."""
+  compile_time_ms, = _ENTRY_HEADER.unpack_from(entry_header)
+  return compile_time_ms / 1000
+
+
 def put_executable(
     cache_key: str,
     module_name: str,
     executable: xla_client.LoadedExecutable,
     backend,
+    compile_time_secs: float = 0.0,
 ) -> None:
-  """Adds 'executable' to the cache, possibly evicting older entries."""
+  """Adds 'executable' to the cache, possibly evicting older entries.
+
+  Older entries are only evicted if `jax_compilation_cache_max_size` was set
+  when the cache was initialized. `compile_time_secs` is stored with the entry
+  and reported as compile time saved when it is loaded.
+  """
   assert (
       _cache is not None
   ), "initialize_cache must be called before you can call put_executable()"
@@ -116,7 +398,134 @@ def put_executable(
     serialized_executable = compressor.compress(serialized_executable)
   else:
     serialized_executable = zlib.compress(serialized_executable)
-  _cache.put(cache_key, serialized_executable)
+  serialized_entry = _combine_entry(serialized_executable, compile_time_secs)
+  _cache.put(cache_key, serialized_entry)
+  if _local_cache is not None:
+    _local_cache.put(cache_key, serialized_entry)
+  _memory_cache_put((cache_key, backend), executable, compile_time_secs)
+  with _stats_lock:
+    _stats.bytes_written += len(serialized_entry)
+  monitoring.record_scalar(BYTES_WRITTEN_SCALAR, len(serialized_entry))
+
+
+class _BackgroundWriter:
+  """Runs persistent cache writes on bounded thread pools.
+
+  At most `max_pending` writes are queued or running at any time; writes
+  submitted beyond that are dropped, so a slow cache never holds up
+  compilation. Both limits are passed with each write, so that changes to the
+  config options take effect for the next write; writes run on one thread
+  pool per thread count.
+  """
+
+  def __init__(self):
+    self._executors: dict[int, concurrent.futures.ThreadPoolExecutor] = {}
+    self._lock = threading.Lock()
+    self._pending: set[concurrent.futures.Future] = set()
+    self._errors: list[Exception] = []
+
+  def submit(self, fn: Callable[[], None], module_name: str,
+             raise_errors: bool, num_threads: int, max_pending: int) -> bool:
+    with self._lock:
+      if len(self._pending) >= max_pending:
+        logger.info(
+            "Not writing persistent cache entry for '%s' because %d writes "
+            "are already pending", module_name, len(self._pending))
+        monitoring.record_event(ASYNC_WRITE_DROPPED_EVENT)
+        return False
+      executor = self._executors.get(num_threads)
+      if executor is None:
+        executor = self._executors[num_threads] = (
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=num_threads,
+                thread_name_prefix="jax_compilation_cache_writer"))
+      future = executor.submit(self._run, fn, module_name, raise_errors)
+      self._pending.add(future)
+      monitoring.record_scalar(ASYNC_WRITE_QUEUE_DEPTH_SCALAR,
+                               len(self._pending))
+    future.add_done_callback(self._done)
+    return True
+
+  def _run(self, fn: Callable[[], None], module_name: str,
+           raise_errors: bool) -> None:
+    try:
+      fn()
+    except Exception as ex:
+      if raise_errors:
+        with self._lock:
+          self._errors.append(ex)
+      else:
+        warnings.warn(
+            f"Error writing persistent compilation cache entry for "
+            f"'{module_name}': {type(ex).__name__}: {ex}")
+
+  def _done(self, future: concurrent.futures.Future) -> None:
+    with self._lock:
+      self._pending.discard(future)
+      monitoring.record_scalar(ASYNC_WRITE_QUEUE_DEPTH_SCALAR,
+                               len(self._pending))
+
+  def num_pending(self) -> int:
+    with self._lock:
+      return len(self._pending)
+
+  def flush(self) -> None:
+    with self._lock:
+      pending = list(self._pending)
+    concurrent.futures.wait(pending)
+    with self._lock:
+      errors, self._errors = self._errors, []
+    if errors:
+      raise errors[0]
+
+
+_writer: Optional[_BackgroundWriter] = None
+_writer_lock = threading.Lock()
+_flush_registered_at_exit = False
+
+
+def _get_writer() -> _BackgroundWriter:
+  global _writer, _flush_registered_at_exit
+  with _writer_lock:
+    if _writer is None:
+      _writer = _BackgroundWriter()
+    if not _flush_registered_at_exit:
+      atexit.register(flush_pending_writes)
+      _flush_registered_at_exit = True
+    return _writer
+
+
+def put_executable_async(
+    cache_key: str,
+    module_name: str,
+    executable: xla_client.LoadedExecutable,
+    backend,
+    compile_time_secs: float = 0.0,
+) -> bool:
+  """Like put_executable, but serializes and writes on a background thread.
+
+  Errors raised by the write are reported as warnings, or re-raised by the next
+  call to flush_pending_writes() if `jax_raise_persistent_cache_errors` is set.
+
+  Returns:
+    Whether the write was queued. Writes are dropped if
+    `jax_persistent_cache_async_max_pending_writes` writes are already pending.
+  """
+  assert (
+      _cache is not None
+  ), "initialize_cache must be called before you can call put_executable()"
+  return _get_writer().submit(
+      lambda: put_executable(cache_key, module_name, executable, backend,
+                             compile_time_secs),
+      module_name, config.jax_raise_persistent_cache_errors,
+      config.jax_persistent_cache_async_write_threads,
+      config.jax_persistent_cache_async_max_pending_writes)
+
+
+def flush_pending_writes() -> None:
+  """Blocks until all background writes to the cache have finished."""
+  if _writer is not None:
+    _writer.flush()
 
 
 def _log_cache_key_hash(hash_obj, last_serialized: str, hashfn):
@@ -142,14 +551,35 @@ def get_cache_key(module: ir.Module, devices: np.ndarray, compile_options,
   """Creates a hashed string to use as a key to the compilation cache.
 
   get_cache_key takes in the MLIR module and compile_options of a program
-  and hashes all the components into a unique hash. The hash is returned as a
-  hex-encoded string that is 256 characters long.
+  and hashes all the components into a unique hash. The key is the module name
+  followed by the hash as a hex-encoded string that is 64 characters long, so
+  that cache entries can be attributed to the functions they came from.
 
   Typical return value example:
-   '14ac577cdb2ef6d986078b4054cc9893a9a14a16dbb0d8f37b89167c1f1aacdf'
+   'jit_f-14ac577cdb2ef6d986078b4054cc9893a9a14a16dbb0d8f37b89167c1f1aacdf'
   """
+  digest = _cache_key_digest(module, devices, compile_options, backend,
+                             include_name=True)
+  return f"{_module_name_for_key(module)}-{digest}"
+
+
+def get_sharing_key(module: ir.Module, devices: np.ndarray, compile_options,
+                    backend) -> str:
+  """Like get_cache_key, but ignores the name of the module.
+
+  Modules lowered from differently named functions with the same body, device
+  assignment and compile options get the same key, so that they can share one
+  executable in process.
+  """
+  return _cache_key_digest(module, devices, compile_options, backend,
+                           include_name=False)
+
+
+def _cache_key_digest(module: ir.Module, devices: np.ndarray, compile_options,
+                      backend, include_name: bool) -> str:
   entries = [
-    ("computation", lambda hash_obj: _hash_computation(hash_obj, module)),
+    ("computation",
+     lambda hash_obj: _hash_computation(hash_obj, module, include_name)),
     ("devices", lambda hash_obj: _hash_devices(hash_obj, devices)),
     ("compile_options",
      lambda hash_obj: _hash_compile_options(hash_obj, compile_options)),
@@ -168,6 +598,13 @@ def get_cache_key(module: ir.Module, devices: np.ndarray, compile_options,
   return hash_obj.digest().hex()
 
 
+def _module_name_for_key(module: ir.Module) -> str:
+  sym_name = module.operation.attributes["sym_name"]
+  module_name = ir.StringAttr(sym_name).value
+  # Keep keys usable as file names.
+  return re.sub(r"[^\w.]", "_", module_name)[:100]
+
+
 def _serialize_ir(m: ir.Module) -> bytes:
   output = io.BytesIO()
   m.operation.write_bytecode(file=output)
@@ -187,12 +624,44 @@ def _canonicalize_ir(m_original: ir.Module) -> bytes:
     bytecode = _serialize_ir(m_original)
     return re.sub(b" at 0x[a-f0-9]+>", b" at 0x...>", bytecode)
 
-def _hash_computation(hash_obj, module):
-  if config.jax_compilation_cache_include_metadata_in_key:
-    canonical_ir = _serialize_ir(module)
-  else:
-    canonical_ir = _canonicalize_ir(module)
-  hash_obj.update(canonical_ir)
+# Digests of serialized modules, keyed weakly by module and then by whether
+# metadata and the module name were included. Lowered modules are not mutated after lowering, so
+# repeated cache lookups for the same lowering (e.g. recompiling with the same
+# Lowered object, or reading and then writing the cache) reuse the digest
+# instead of cloning, canonicalizing and serializing the module again.
+_computation_digests: weakref.WeakKeyDictionary[
+    ir.Module, dict[tuple[bool, bool], bytes]] = weakref.WeakKeyDictionary()
+_computation_digests_lock = threading.Lock()
+
+
+def _computation_digest(module: ir.Module, include_metadata: bool,
+                        include_name: bool = True) -> bytes:
+  with _computation_digests_lock:
+    try:
+      digests = _computation_digests.setdefault(module, {})
+    except TypeError:
+      # Not weak-referenceable; don't memoize.
+      digests = {}
+    digest = digests.get((include_metadata, include_name))
+  if digest is None:
+    m = module
+    if not include_name:
+      with module.context:
+        m = module.operation.clone()
+        m.attributes["sym_name"] = ir.StringAttr.get("module")
+    if include_metadata:
+      canonical_ir = _serialize_ir(m)
+    else:
+      canonical_ir = _canonicalize_ir(m)
+    digest = hashlib.sha256(canonical_ir).digest()
+    with _computation_digests_lock:
+      digests[(include_metadata, include_name)] = digest
+  return digest
+
+def _hash_computation(hash_obj, module, include_name: bool = True):
+  hash_obj.update(_computation_digest(
+      module, config.jax_compilation_cache_include_metadata_in_key,
+      include_name))
 
 def _hash_devices(hash_obj, devices: np.ndarray) -> None:
   for device in devices.flat:
@@ -369,7 +838,11 @@ def is_initialized():
 
 
 def reset_cache():
-  global _cache
+  global _cache, _local_cache
   assert is_initialized()
+  flush_pending_writes()
   logger.info("Resetting cache at %s.", _cache._path)
   _cache = None
+  _local_cache = None
+  with _memory_cache_lock:
+    _memory_cache.clear()
@@ -0,0 +1,233 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-function breakdown of the time spent tracing, lowering and compiling.
+
+The phases are timed by ``dispatch.log_elapsed_time`` and
+``dispatch.record_elapsed_time``, which also report them as
+``jax._src.monitoring`` duration events. While a :func:`profile_compiles`
+context is active, they are also collected per function, together with the
+size of each compiled module and its compilation cache outcome.
+"""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import dataclasses
+import re
+import threading
+from typing import Iterator
+
+TRACE = "trace"
+SIMPLIFY = "simplify"
+LOWER = "lower"
+CACHE_KEY = "cache_key"
+CACHE_READ = "cache_read"
+XLA_COMPILE = "xla_compile"
+# The whole compilation step, including CACHE_KEY, CACHE_READ and XLA_COMPILE.
+COMPILE = "compile"
+
+_PHASES = (TRACE, SIMPLIFY, LOWER, CACHE_KEY, CACHE_READ, XLA_COMPILE, COMPILE)
+
+
+@dataclasses.dataclass(frozen=True)
+class PhaseRecord:
+  """A phase of the compilation of a function.
+
+  Attributes:
+    fun_name: the name the phase was reported under, e.g. ``f`` when tracing
+      and ``jit(f)`` when lowering and compiling.
+    phase: one of ``trace``, ``simplify``, ``lower``, ``cache_key``,
+      ``cache_read``, ``xla_compile`` and ``compile``. ``compile`` covers the
+      whole compilation step, including the cache lookups.
+    duration_secs: the time the phase took.
+  """
+  fun_name: str
+  phase: str
+  duration_secs: float
+
+
+@dataclasses.dataclass(frozen=True)
+class ModuleRecord:
+  """A module passed to the compiler.
+
+  Attributes:
+    fun_name: the name of the function the module was lowered from.
+    num_ops: the number of MLIR operations in the module.
+    num_bytes: the size of the module's serialized bytecode.
+    cache: the compilation cache outcome: ``shared`` if an identical
+      executable was reused from the in-process table enabled by
+      ``jax_shared_executables_max_entries``, otherwise the persistent
+      compilation cache outcome: ``hit``, ``miss``, or ``disabled`` if the
+      persistent cache was not used.
+  """
+  fun_name: str
+  num_ops: int
+  num_bytes: int
+  cache: str
+
+
+@dataclasses.dataclass
+class FunctionProfile:
+  """The phases of all compilations of a function, summed."""
+  name: str
+  durations_secs: dict[str, float] = dataclasses.field(
+      default_factory=lambda: dict.fromkeys(_PHASES, 0.))
+  num_compiles: int = 0
+  module_ops: int = 0
+  module_bytes: int = 0
+  cache_outcomes: collections.Counter = dataclasses.field(
+      default_factory=collections.Counter)
+
+  @property
+  def total_secs(self) -> float:
+    d = self.durations_secs
+    return d[TRACE] + d[SIMPLIFY] + d[LOWER] + d[COMPILE]
+
+
+class CompileProfile:
+  """The compilation phases recorded by a :func:`profile_compiles` context."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.phases: list[PhaseRecord] = []
+    self.modules: list[ModuleRecord] = []
+
+  def functions(self) -> list[FunctionProfile]:
+    """Returns a profile per function, slowest first.
+
+    Records are grouped by function name, with transformation wrappers like
+    ``jit(...)`` stripped, so that tracing ``f`` and compiling ``jit(f)`` are
+    attributed to the same function.
+    """
+    profiles: dict[str, FunctionProfile] = {}
+    def profile(fun_name: str) -> FunctionProfile:
+      name = _base_name(fun_name)
+      if name not in profiles:
+        profiles[name] = FunctionProfile(name)
+      return profiles[name]
+
+    with self._lock:
+      for p in self.phases:
+        profile(p.fun_name).durations_secs[p.phase] += p.duration_secs
+      for m in self.modules:
+        f = profile(m.fun_name)
+        f.num_compiles += 1
+        f.module_ops += m.num_ops
+        f.module_bytes += m.num_bytes
+        f.cache_outcomes[m.cache] += 1
+    return sorted(profiles.values(), key=lambda f: f.total_secs, reverse=True)
+
+  def table(self) -> str:
+    """Returns a table of `functions()`, with durations in milliseconds."""
+    header = ("function", *_PHASES, "total", "compiles", "ops", "bytes",
+              "cache")
+    rows = [header]
+    for f in self.functions():
+      cache = ",".join(f"{k}:{v}" for k, v in sorted(f.cache_outcomes.items()))
+      rows.append((f.name,
+                   *(f"{f.durations_secs[p] * 1e3:.1f}" for p in _PHASES),
+                   f"{f.total_secs * 1e3:.1f}", str(f.num_compiles),
+                   str(f.module_ops), str(f.module_bytes), cache or "-"))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(c.ljust(w) if i == 0 else c.rjust(w)
+                  for i, (c, w) in enumerate(zip(row, widths)))
+        for row in rows)
+
+  def _add_phase(self, record: PhaseRecord) -> None:
+    with self._lock:
+      self.phases.append(record)
+
+  def _add_module(self, record: ModuleRecord) -> None:
+    with self._lock:
+      self.modules.append(record)
+
+
+_active_profiles: list[CompileProfile] = []
+_active_profiles_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def profile_compiles() -> Iterator[CompileProfile]:
+  """Collects the compilation phases of every function compiled in the context.
+
+  Compilations on any thread are recorded, e.g. those started by
+  ``jit(f).precompile``. For example::
+
+    with profile_compiles() as profile:
+      model.init(...)
+    print(profile.table())
+  """
+  profile = CompileProfile()
+  with _active_profiles_lock:
+    _active_profiles.append(profile)
+  try:
+    yield profile
+  finally:
+    with _active_profiles_lock:
+      _active_profiles.remove(profile)
+
+
+def is_active() -> bool:
+  return bool(_active_profiles)
+
+
+def record_phase(fun_name: str, phase: str, duration_secs: float) -> None:
+  if not _active_profiles:
+    return
+  record = PhaseRecord(fun_name, phase, duration_secs)
+  with _active_profiles_lock:
+    profiles = list(_active_profiles)
+  for profile in profiles:
+    profile._add_phase(record)
+
+
+def record_module(fun_name: str, num_ops: int, num_bytes: int,
+                  cache: str) -> None:
+  if not _active_profiles:
+    return
+  record = ModuleRecord(fun_name, num_ops, num_bytes, cache)
+  with _active_profiles_lock:
+    profiles = list(_active_profiles)
+  for profile in profiles:
+    profile._add_module(record)
+
+
+_WRAPPED_NAME = re.compile(r"\w+\((.*)\)")
+
+
+def _base_name(fun_name: str) -> str:
+  m = _WRAPPED_NAME.fullmatch(fun_name)
+  return m.group(1) if m else fun_name
+
+
+_thread_local = threading.local()
+
+
+@contextlib.contextmanager
+def function_scope(fun_name: str) -> Iterator[None]:
+  """Attributes records made without a function name to `fun_name`."""
+  stack = _thread_local.__dict__.setdefault("names", [])
+  stack.append(fun_name)
+  try:
+    yield
+  finally:
+    stack.pop()
+
+
+def current_function(default: str) -> str:
+  stack = getattr(_thread_local, "names", None)
+  return stack[-1] if stack else default
@@ -718,6 +718,21 @@ check_tracer_leaks = config.define_bool_state(
           'to disable any debuggers while leak checking is enabled.'))
 checking_leaks = functools.partial(check_tracer_leaks, True)
 
+tracing_cache_max_entries = config.define_int_state(
+    name='jax_tracing_cache_max_entries',
+    default=0,
+    help=('The maximum number of entries kept by each tracing cache (e.g. the '
+          'cache of jaxprs traced by jit), across all functions. The least '
+          'recently used entries are evicted first. 0 means unbounded.'))
+
+tracing_cache_max_entries_per_function = config.define_int_state(
+    name='jax_tracing_cache_max_entries_per_function',
+    default=0,
+    help=('The maximum number of entries kept by each tracing cache for a '
+          'single function, e.g. for the distinct shapes a jitted function is '
+          'traced with. The least recently used entries are evicted first. 0 '
+          'means unbounded.'))
+
 debug_nans = config.define_bool_state(
     name='jax_debug_nans',
     default=False,
@@ -887,6 +902,102 @@ persistent_cache_min_compile_time_secs = config.define_float_state(
           'persistent compilation cache. This threshold can be raised to '
           'decrease the number of entries written to the cache.'))
 
+compilation_cache_max_size = config.define_int_state(
+    name='jax_compilation_cache_max_size',
+    default=-1,
+    help=('The maximum size in bytes of the persistent compilation cache '
+          'directory. When a write takes the cache above this size, the least '
+          'recently used entries are evicted. -1 means no size limit. Only '
+          'supported for caches on the local filesystem.'))
+
+compilation_cache_memory_max_entries = config.define_int_state(
+    name='jax_compilation_cache_memory_max_entries',
+    default=0,
+    help=('The number of deserialized executables kept in memory in front of '
+          'the persistent compilation cache, so that loading the same entry '
+          'again in this process skips reading and deserializing it. 0 '
+          'disables the in-memory tier.'))
+
+compilation_cache_local_dir = config.define_string_state(
+    name='jax_compilation_cache_local_dir',
+    default='',
+    help=('Optional host-local directory, e.g. on local SSD or /dev/shm, '
+          'used as a tier between the in-memory tier and the persistent '
+          'compilation cache. Entries read from the persistent cache are '
+          'copied here and read back through mmap, so processes on the same '
+          'host can share them.'))
+
+compilation_cache_local_max_size = config.define_int_state(
+    name='jax_compilation_cache_local_max_size',
+    default=-1,
+    help=('The maximum size in bytes of the host-local compilation cache '
+          'directory set by jax_compilation_cache_local_dir. -1 means no '
+          'size limit.'))
+
+persistent_cache_async_write_threads = config.define_int_state(
+    name='jax_persistent_cache_async_write_threads',
+    default=0,
+    help=('Number of background threads used to serialize and write entries '
+          'to the persistent compilation cache, so that the first call to a '
+          'function does not wait for the write. 0 means entries are written '
+          'synchronously after compilation.'))
+
+persistent_cache_async_max_pending_writes = config.define_int_state(
+    name='jax_persistent_cache_async_max_pending_writes',
+    default=64,
+    help=('The maximum number of background persistent compilation cache '
+          'writes that may be pending at once. Further writes are dropped '
+          'until the queue drains. Only used if '
+          'jax_persistent_cache_async_write_threads is positive.'))
+
+async_compile_threads = config.define_int_state(
+    name='jax_async_compile_threads',
+    default=4,
+    help=('The number of threads used by `Lowered.compile_async` and '
+          '`jit(...).precompile` to compile in the background. Read when the '
+          'first background compilation starts.'))
+
+shared_executables_max_entries = config.define_int_state(
+    name='jax_shared_executables_max_entries',
+    default=0,
+    help=('The number of compiled executables kept in an in-process table, '
+          'so that identical computations reached from different Python '
+          'functions, e.g. closures re-created on each request, share one '
+          'executable and argument handler instead of being compiled again. '
+          'The table is keyed by the canonicalized lowered module with its '
+          'name ignored, together with the device assignment and the compile '
+          'options, which include the input and output shardings, and the '
+          'backend, jaxlib version and XLA flags. Executables that use host '
+          'callbacks are not shared. 0 disables sharing.'))
+
+multihost_kv_store_max_bytes = config.define_int_state(
+    name='jax_multihost_kv_store_max_bytes',
+    default=1 << 20,
+    help=('Pytrees of at most this many bytes are broadcast and gathered by '
+          '`jax.experimental.multihost_utils` through the key-value store of '
+          'the distributed runtime client, without compiling or running a '
+          'device computation. Larger pytrees use device collectives. Must '
+          'be the same on all processes. 0 always uses device collectives.'))
+
+callback_executor_threads = config.define_int_state(
+    name='jax_callback_executor_threads',
+    default=0,
+    help=('The number of threads that run host callbacks without results and '
+          'without an ordering token, e.g. unordered `jax.debug.callback`s, '
+          'so that the runtime thread that invoked them does not wait for '
+          'them. Callbacks with results or ordered callbacks always run on '
+          'the runtime thread. 0 runs every callback on the runtime thread. '
+          'Read when a callback is lowered; callbacks lowered with different '
+          'values run on different pools.'))
+
+callback_executor_max_pending = config.define_int_state(
+    name='jax_callback_executor_max_pending',
+    default=256,
+    help=('The maximum number of queued host callbacks that may be pending at '
+          'once. A runtime thread that queues a callback beyond that waits '
+          'for one to finish. Only used if jax_callback_executor_threads is '
+          'positive. Read when the first callback is queued.'))
+
 compilation_cache_include_metadata_in_key = config.define_bool_state(
     name='jax_compilation_cache_include_metadata_in_key',
     default=False,
@@ -153,12 +153,13 @@ def debug_callback_lowering(ctx, *args, effect, callback, **params):
   if effects.ordered_effects.contains(effect):
     token = ctx.tokens_in.get(effect)[0]
     result, token, keepalive = mlir.emit_python_callback(
-        ctx, _callback, token, list(args), ctx.avals_in, ctx.avals_out, True)
+        ctx, _callback, token, list(args), ctx.avals_in, ctx.avals_out, True,
+        name=lu.fun_name(callback))
     ctx.set_tokens_out(mlir.TokenSet({effect: (token,)}))
   else:
     result, token, keepalive = mlir.emit_python_callback(
         ctx, _callback, None, list(args), ctx.avals_in, ctx.avals_out, True,
-        sharding=sharding)
+        sharding=sharding, name=lu.fun_name(callback), allow_async=True)
   ctx.module_context.add_keepalive(keepalive)
   return result
 mlir.register_lowering(debug_callback_p, debug_callback_lowering,
@@ -237,6 +238,7 @@ def debug_callback(callback: Callable[..., Any], *args: Any,
   """
   flat_args, in_tree = tree_util.tree_flatten((args, kwargs))
   effect = ordered_debug_effect if ordered else debug_effect
+  @functools.wraps(callback)
   def _flat_callback(*flat_args):
     args, kwargs = tree_util.tree_unflatten(in_tree, flat_args)
     callback(*args, **kwargs)
@@ -16,6 +16,7 @@
 from __future__ import annotations
 
 import atexit
+import collections
 import contextlib
 import dataclasses
 from functools import partial
@@ -32,6 +33,7 @@ import warnings
 import numpy as np
 
 from jax._src import compilation_cache
+from jax._src import compile_profiler
 from jax._src import core
 from jax._src import dtypes
 from jax._src import linear_util as lu
@@ -52,7 +54,8 @@ from jax._src.interpreters import xla
 from jax._src.interpreters import pxla
 from jax._src.lib.mlir import ir
 from jax._src.lib import xla_client as xc
-from jax._src.monitoring import record_event_duration_secs
+from jax._src.monitoring import (
+    record_event, record_event_duration_secs, record_scalar)
 from jax._src.partition_spec import PartitionSpec
 from jax._src.sharding import Sharding
 from jax._src.sharding_impls import (
@@ -63,6 +66,24 @@ from jax._src.sharding_impls import (
 JAXPR_TRACE_EVENT = "/jax/core/compile/jaxpr_trace_duration"
 JAXPR_TO_MLIR_MODULE_EVENT = "/jax/core/compile/jaxpr_to_mlir_module_duration"
 BACKEND_COMPILE_EVENT = "/jax/core/compile/backend_compile_duration"
+JAXPR_SIMPLIFY_EVENT = "/jax/core/compile/jaxpr_simplify_duration"
+CACHE_KEY_EVENT = "/jax/core/compile/cache_key_duration"
+CACHE_READ_EVENT = "/jax/core/compile/cache_read_duration"
+XLA_COMPILE_EVENT = "/jax/core/compile/xla_compile_duration"
+MODULE_NUM_OPS_EVENT = "/jax/core/compile/module_num_ops"
+MODULE_NUM_BYTES_EVENT = "/jax/core/compile/module_num_bytes"
+SHARED_EXECUTABLE_HIT_EVENT = "/jax/core/compile/shared_executable_hits"
+SHARED_EXECUTABLE_MISS_EVENT = "/jax/core/compile/shared_executable_misses"
+
+_EVENT_PHASES = {
+    JAXPR_TRACE_EVENT: compile_profiler.TRACE,
+    JAXPR_SIMPLIFY_EVENT: compile_profiler.SIMPLIFY,
+    JAXPR_TO_MLIR_MODULE_EVENT: compile_profiler.LOWER,
+    CACHE_KEY_EVENT: compile_profiler.CACHE_KEY,
+    CACHE_READ_EVENT: compile_profiler.CACHE_READ,
+    XLA_COMPILE_EVENT: compile_profiler.XLA_COMPILE,
+    BACKEND_COMPILE_EVENT: compile_profiler.COMPILE,
+}
 
 FLAGS = flags.FLAGS
 
@@ -266,13 +287,37 @@ def log_elapsed_time(fmt: str, fun_name: str, event: Optional[str] = None):
   else:
     log_priority = logging.WARNING if config.jax_log_compiles else logging.DEBUG
     start_time = time.time()
-    yield
+    with compile_profiler.function_scope(fun_name):
+      yield
     elapsed_time = time.time() - start_time
     if logger.isEnabledFor(log_priority):
       logger.log(logging.WARNING, fmt.format(
           fun_name=fun_name, elapsed_time=elapsed_time))
     if event is not None:
       record_event_duration_secs(event, elapsed_time)
+      if event in _EVENT_PHASES:
+        compile_profiler.record_phase(fun_name, _EVENT_PHASES[event],
+                                      elapsed_time)
+
+
+@contextlib.contextmanager
+def record_elapsed_time(event: str, fun_name: Optional[str] = None):
+  """Like `log_elapsed_time`, for steps too fine-grained to log.
+
+  Records under `fun_name`, or else the name of the innermost enclosing
+  `log_elapsed_time`.
+  """
+  if _on_exit:
+    yield
+    return
+  start_time = time.time()
+  yield
+  elapsed_time = time.time() - start_time
+  record_event_duration_secs(event, elapsed_time)
+  if event in _EVENT_PHASES:
+    compile_profiler.record_phase(
+        fun_name or compile_profiler.current_function("<unknown>"),
+        _EVENT_PHASES[event], elapsed_time)
 
 
 def should_tuple_args(num_args: int, platform: str):
@@ -484,37 +529,132 @@ def compile_or_get_cached(backend, computation: ir.Module, devices: np.ndarray,
   if FLAGS.jax_dump_ir_to:
     _dump_ir_to_file(module_name, mlir.module_to_string(computation))
 
-  # Persistent compilation cache only implemented on TPU and GPU.
-  # TODO(skye): add warning when initializing cache on unsupported default platform
-  supported_platforms = ["tpu", "gpu"]
-  # (b/233850967) CPU caching can be enabled if XLA Runtime is enabled.
-  if "--xla_cpu_use_xla_runtime=true" in os.environ.get("XLA_FLAGS", ""):
-    supported_platforms.append("cpu")
   use_compilation_cache = (compilation_cache.is_initialized() and
-                           backend.platform in supported_platforms)
+                           compilation_cache.is_cache_supported(backend))
+  # Executables that call back into Python are bound to the callbacks of the
+  # function they were lowered from, so they can't be shared.
+  share_executable = (config.jax_shared_executables_max_entries > 0 and
+                      not host_callbacks)
+
+  cache_key = None
+  if use_compilation_cache:
+    with record_elapsed_time(CACHE_KEY_EVENT):
+      cache_key = compilation_cache.get_cache_key(
+          computation, devices, compile_options, backend)
+
+  if share_executable:
+    # Unlike the persistent cache key, the sharing key ignores the module
+    # name, so that identical functions with different names share too.
+    with record_elapsed_time(CACHE_KEY_EVENT):
+      sharing_key = compilation_cache.get_sharing_key(
+          computation, devices, compile_options, backend)
+    executable = _get_shared_executable(sharing_key, backend)
+    if executable is not None:
+      logger.debug("Sharing an identical executable for '%s'", module_name)
+      _record_module(module_name, computation, "shared")
+      return executable
+    executable = _compile_or_get_cached(
+        backend, computation, compile_options, host_callbacks, module_name,
+        use_compilation_cache, cache_key)
+    _put_shared_executable(sharing_key, backend, executable)
+    return executable
+
+  return _compile_or_get_cached(
+      backend, computation, compile_options, host_callbacks, module_name,
+      use_compilation_cache, cache_key)
 
+
+def _compile_or_get_cached(backend, computation: ir.Module, compile_options,
+                           host_callbacks, module_name: str,
+                           use_compilation_cache: bool,
+                           cache_key: Optional[str]):
   if not use_compilation_cache:
-    return backend_compile(backend, computation, compile_options,
-                           host_callbacks)
+    _record_module(module_name, computation, "disabled")
+    with record_elapsed_time(XLA_COMPILE_EVENT):
+      return backend_compile(backend, computation, compile_options,
+                             host_callbacks)
 
-  cache_key = compilation_cache.get_cache_key(
-      computation, devices, compile_options, backend)
+  assert cache_key is not None
 
-  cached_executable = _cache_read(module_name, cache_key, compile_options,
-                                  backend)
+  with record_elapsed_time(CACHE_READ_EVENT):
+    cached_executable = _cache_read(module_name, cache_key, compile_options,
+                                    backend)
   if cached_executable is not None:
     logger.info("Persistent compilation cache hit for '%s'", module_name)
+    _record_module(module_name, computation, "hit")
     return cached_executable
   else:
+    _record_module(module_name, computation, "miss")
     start_time = time.monotonic()
-    executable = backend_compile(backend, computation,
-                                compile_options, host_callbacks)
+    with record_elapsed_time(XLA_COMPILE_EVENT):
+      executable = backend_compile(backend, computation,
+                                  compile_options, host_callbacks)
     compile_time = time.monotonic() - start_time
     _cache_write(cache_key, compile_time, module_name, backend, executable,
                  host_callbacks)
     return executable
 
 
+# Executables shared between identical lowerings, keyed by sharing key and
+# backend, in least recently used order.
+_shared_executables: collections.OrderedDict[
+    tuple[str, Any], xc.LoadedExecutable] = collections.OrderedDict()
+_shared_executables_lock = threading.Lock()
+
+
+def _get_shared_executable(sharing_key: str,
+                           backend) -> Optional[xc.LoadedExecutable]:
+  with _shared_executables_lock:
+    executable = _shared_executables.get((sharing_key, backend))
+    if executable is not None:
+      _shared_executables.move_to_end((sharing_key, backend))
+  record_event(SHARED_EXECUTABLE_HIT_EVENT if executable is not None
+               else SHARED_EXECUTABLE_MISS_EVENT)
+  return executable
+
+
+def _put_shared_executable(sharing_key: str, backend,
+                           executable: xc.LoadedExecutable) -> None:
+  max_entries = config.jax_shared_executables_max_entries
+  with _shared_executables_lock:
+    _shared_executables[(sharing_key, backend)] = executable
+    _shared_executables.move_to_end((sharing_key, backend))
+    while len(_shared_executables) > max_entries:
+      _shared_executables.popitem(last=False)
+
+
+def clear_shared_executables() -> None:
+  with _shared_executables_lock:
+    _shared_executables.clear()
+  pxla.shared_inputs_handler.cache_clear()
+
+
+def _record_module(module_name: str, module: ir.Module, cache: str) -> None:
+  """Reports the size of a module being compiled to the compile profiler.
+
+  Sizing a module serializes it, so this is skipped unless a profile is active.
+  """
+  if not compile_profiler.is_active():
+    return
+  num_ops = 0
+  def count_ops(op):
+    nonlocal num_ops
+    num_ops += 1
+    for region in op.regions:
+      for block in region.blocks:
+        for child in block.operations:
+          count_ops(child)
+  with module.context:
+    for op in module.body.operations:
+      count_ops(op)
+    num_bytes = len(mlir.module_to_bytecode(module))
+  record_scalar(MODULE_NUM_OPS_EVENT, num_ops)
+  record_scalar(MODULE_NUM_BYTES_EVENT, num_bytes)
+  compile_profiler.record_module(
+      compile_profiler.current_function(module_name), num_ops, num_bytes,
+      cache)
+
+
 def _cache_read(
     module_name: str, cache_key: str, compile_options, backend
 ) -> Optional[xc.LoadedExecutable]:
@@ -540,6 +680,7 @@ def _cache_write(cache_key: str,
     logger.info(
         "Not writing persistent cache entry for '%s' because it uses host "
         "callbacks (e.g. from jax.debug.print or breakpoint)", module_name)
+    compilation_cache.record_skipped_write("host_callbacks")
     return
 
   min_compile_time = config.jax_persistent_cache_min_compile_time_secs
@@ -549,6 +690,7 @@ def _cache_write(cache_key: str,
           "Not writing persistent cache entry for '%s' because it took < %.2f "
           "seconds to compile (%.2fs)", module_name, min_compile_time,
           compile_time_secs)
+      compilation_cache.record_skipped_write("min_compile_time")
       return
     else:
       logger.info(
@@ -556,9 +698,14 @@ def _cache_write(cache_key: str,
           "persistent cache entry", module_name, min_compile_time,
           compile_time_secs)
 
+  if config.jax_persistent_cache_async_write_threads > 0:
+    compilation_cache.put_executable_async(cache_key, module_name, executable,
+                                           backend, compile_time_secs)
+    return
+
   try:
     compilation_cache.put_executable(cache_key, module_name, executable,
-                                     backend)
+                                     backend, compile_time_secs)
   except Exception as ex:
     if config.jax_raise_persistent_cache_errors:
       raise
@@ -12,6 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import annotations
+
+import math
+import operator
+from typing import Callable, NamedTuple, Sequence
 import warnings
 
 import numpy as np
@@ -20,7 +25,9 @@ from jax import lax
 import jax.numpy as jnp
 
 from jax._src import dtypes
-from jax._src.tree_util import tree_flatten, tree_unflatten
+from jax._src.tree_util import (PyTreeDef, register_pytree_node, tree_flatten,
+                                tree_unflatten)
+from jax._src.typing import Array
 from jax._src.util import safe_zip, unzip2, HashablePartial
 
 zip = safe_zip
@@ -87,3 +94,140 @@ def _unravel_list(indices, shapes, from_dtypes, to_dtype, arr):
     warnings.simplefilter("ignore")  # ignore complex-to-real cast warning
     return [lax.convert_element_type(chunk.reshape(shape), dtype)
             for chunk, shape, dtype in zip(chunks, shapes, from_dtypes)]
+
+
+class _LeafLayout(NamedTuple):
+  buffer: int  # The index of the buffer holding the leaf.
+  offset: int
+  shape: tuple[int, ...]
+
+
+class _PackedLayout(NamedTuple):
+  treedef: PyTreeDef
+  dtypes: tuple[np.dtype, ...]  # The dtype of each buffer.
+  leaves: tuple[_LeafLayout, ...]
+
+
+class PackedTree:
+  """A pytree of arrays packed into one contiguous 1D buffer per dtype.
+
+  Unlike :func:`ravel_pytree`, which promotes all leaves to a common dtype,
+  leaves are grouped by dtype, and each group is packed into its own buffer.
+  A ``PackedTree`` is a pytree whose children are its buffers, so it can be
+  passed to and returned from transformed functions, and
+  :func:`jax.tree_util.tree_map` applies a function to each whole buffer
+  rather than to each leaf. Only elementwise functions should be mapped this
+  way. Arithmetic operators are likewise applied to the buffers:
+
+  >>> params = {"w": jnp.ones((2, 3)), "b": jnp.zeros(3)}
+  >>> packed = PackedTree.pack(params)
+  >>> packed.buffers[0].shape
+  (9,)
+  >>> updated = packed - 0.1 * packed
+  >>> updated.unpack()["w"]
+  Array([[0.9, 0.9, 0.9],
+         [0.9, 0.9, 0.9]], dtype=float32)
+
+  Keeping optimizer state packed across steps replaces the per-leaf ops of
+  ravelling and unravelling with a few ops per buffer. :meth:`unpack` slices
+  the leaves back out of the buffers; under :func:`jax.jit`, XLA fuses these
+  slices into their consumers rather than copying the leaves.
+  """
+  __slots__ = ("buffers", "_layout")
+
+  buffers: tuple[Array, ...]
+
+  def __init__(self, buffers: Sequence[Array], layout: _PackedLayout):
+    self.buffers = tuple(buffers)
+    self._layout = layout
+
+  @classmethod
+  def pack(cls, pytree) -> PackedTree:
+    """Packs the leaves of `pytree` into one buffer per dtype."""
+    leaves, treedef = tree_flatten(pytree)
+    buffer_dtypes: list[np.dtype] = []
+    groups: list[list[Array]] = []
+    sizes: list[int] = []
+    layout = []
+    for leaf in leaves:
+      dtype = dtypes.dtype(leaf, canonicalize=True)
+      if dtype not in buffer_dtypes:
+        buffer_dtypes.append(dtype)
+        groups.append([])
+        sizes.append(0)
+      i = buffer_dtypes.index(dtype)
+      shape = tuple(np.shape(leaf))
+      layout.append(_LeafLayout(i, sizes[i], shape))
+      groups[i].append(jnp.ravel(leaf))
+      sizes[i] += math.prod(shape)
+    buffers = [group[0] if len(group) == 1 else jnp.concatenate(group)
+               for group in groups]
+    return cls(buffers, _PackedLayout(treedef, tuple(buffer_dtypes),
+                                      tuple(layout)))
+
+  def unpack(self):
+    """Returns the pytree of leaves, sliced out of the buffers."""
+    leaves = []
+    for buffer, offset, shape in self._layout.leaves:
+      buf = self.buffers[buffer]
+      size = math.prod(shape)
+      if size != buf.shape[0]:
+        buf = lax.slice(buf, (offset,), (offset + size,))
+      leaves.append(buf.reshape(shape))
+    return tree_unflatten(self._layout.treedef, leaves)
+
+  @property
+  def treedef(self) -> PyTreeDef:
+    return self._layout.treedef
+
+  @property
+  def dtypes(self) -> tuple[np.dtype, ...]:
+    return self._layout.dtypes
+
+  def map(self, f: Callable[..., Array], *rest: PackedTree) -> PackedTree:
+    """Applies the elementwise function `f` to the buffers of each dtype."""
+    for other in rest:
+      if not isinstance(other, PackedTree) or other._layout != self._layout:
+        raise ValueError(
+            "PackedTree.map requires PackedTrees packed from pytrees with the "
+            "same structure, shapes and dtypes.")
+    buffers = [f(*bufs) for bufs in zip(self.buffers,
+                                        *(other.buffers for other in rest))]
+    return PackedTree(buffers, self._layout)
+
+  def vdot(self, other: PackedTree) -> Array:
+    """Returns the dot product of the leaves of two ``PackedTree`` s."""
+    if not isinstance(other, PackedTree) or other._layout != self._layout:
+      raise ValueError(
+          "PackedTree.vdot requires PackedTrees packed from pytrees with the "
+          "same structure, shapes and dtypes.")
+    products = [jnp.vdot(x, y) for x, y in zip(self.buffers, other.buffers)]
+    return sum(products[1:], products[0]) if products else jnp.zeros(())
+
+  def _binary_op(self, op, other, reverse=False):
+    if isinstance(other, PackedTree):
+      return self.map(lambda x, y: op(y, x) if reverse else op(x, y), other)
+    return self.map(lambda x: op(other, x) if reverse else op(x, other))
+
+  def __add__(self, other): return self._binary_op(operator.add, other)
+  def __radd__(self, other): return self._binary_op(operator.add, other, True)
+  def __sub__(self, other): return self._binary_op(operator.sub, other)
+  def __rsub__(self, other): return self._binary_op(operator.sub, other, True)
+  def __mul__(self, other): return self._binary_op(operator.mul, other)
+  def __rmul__(self, other): return self._binary_op(operator.mul, other, True)
+  def __truediv__(self, other): return self._binary_op(operator.truediv, other)
+  def __rtruediv__(self, other):
+    return self._binary_op(operator.truediv, other, True)
+  def __neg__(self): return self.map(operator.neg)
+
+  def __repr__(self):
+    sizes = ", ".join(f"{dtype}[{b.shape[0]}]"
+                      for dtype, b in zip(self.dtypes, self.buffers))
+    return f"PackedTree({sizes}, num_leaves={len(self._layout.leaves)})"
+
+
+register_pytree_node(
+    PackedTree,
+    lambda p: (p.buffers, p._layout),
+    lambda layout, buffers: PackedTree(buffers, layout),
+)
@@ -12,44 +12,209 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import heapq
+import logging
+import mmap
 import os
+import threading
+import time
+import uuid
 
 from jax._src import path as pathlib
 from jax._src.compilation_cache_interface import CacheInterface
 
+logger = logging.getLogger(__name__)
+
+_TEMP_PREFIX = "_temp_"
+
+
+def _is_local_path(path) -> bool:
+  return str(path).startswith('file://') or '://' not in str(path)
+
+
 class GFileCache(CacheInterface):
 
-  def __init__(self, path: str):
-    """Sets up a cache at 'path'. Cached values may already be present."""
+  def __init__(self, path: str, max_size: int = -1):
+    """Sets up a cache at 'path'. Cached values may already be present.
+
+    If `max_size` is non-negative, the total size in bytes of the cache entries
+    is kept at or below `max_size` by evicting the least recently used entries
+    after each `put`. Recency is tracked through the modification time of each
+    entry, which is bumped on every `get`, so that processes sharing the same
+    directory see each other's accesses. Each `put` rescans the directory
+    before evicting, so that the limit applies to the entries written by all
+    processes sharing it. Eviction is only supported for caches on the local
+    filesystem.
+    """
     self._path = pathlib.Path(path)
     self._path.mkdir(parents=True, exist_ok=True)
+    self._max_size = max_size
+    if max_size >= 0 and not _is_local_path(self._path):
+      raise ValueError(
+          f"Cache eviction is only supported on the local filesystem, got "
+          f"max_size={max_size} for cache path {path}")
+
+    # Index of the entries used for eviction, rebuilt from the directory before
+    # each eviction. `_entries` maps each key to its (last access time, size in
+    # bytes); `_heap` orders keys by access time and may contain stale records,
+    # which are skipped when popped.
+    self._lock = threading.Lock()
+    self._entries: dict[str, tuple[float, int]] = {}
+    self._heap: list[tuple[float, str]] = []
+    self._total_size = 0
+    if self._eviction_enabled:
+      self._rescan()
+      self._evict()
+
+  @property
+  def _eviction_enabled(self) -> bool:
+    return self._max_size >= 0
 
   def get(self, key: str):
     """Returns None if 'key' isn't present."""
     if not key:
       raise ValueError("key cannot be empty")
     path_to_key = self._path / key
-    if path_to_key.exists():
-      return path_to_key.read_bytes()
-    else:
+    if not path_to_key.exists():
+      return None
+    try:
+      value = path_to_key.read_bytes()
+    except FileNotFoundError:
+      # The entry was evicted by another process after the existence check.
       return None
+    if self._eviction_enabled:
+      self._touch(key, len(value))
+    return value
 
   def put(self, key: str, value: bytes):
     """Adds new cache entry."""
     if not key:
       raise ValueError("key cannot be empty")
     path_to_new_file = self._path / key
+    # Temporary files have a unique suffix so that concurrent writers of the
+    # same key, possibly in different processes, never share a temporary file.
+    tmp_name = f"{_TEMP_PREFIX}{key}_{uuid.uuid4().hex}"
     if str(path_to_new_file).startswith('gs://'):
       # Writes to gcs are atomic.
       path_to_new_file.write_bytes(value)
-    elif str(path_to_new_file).startswith('file://') or '://' not in str(path_to_new_file):
-      tmp_path = self._path / f"_temp_{key}"
+    elif _is_local_path(path_to_new_file):
+      tmp_path = self._path / tmp_name
       with open(str(tmp_path), "wb") as f:
         f.write(value)
         f.flush()
         os.fsync(f.fileno())
       os.replace(tmp_path, path_to_new_file)
     else:
-      tmp_path = self._path / f"_temp_{key}"
+      tmp_path = self._path / tmp_name
       tmp_path.write_bytes(value)
       tmp_path.replace(str(path_to_new_file))
+    if self._eviction_enabled:
+      self._touch(key, len(value))
+      self._rescan()
+      self._evict()
+
+  def _rescan(self):
+    """Rebuilds the index from the directory, with other processes' puts."""
+    entries = {}
+    with os.scandir(str(self._path)) as it:
+      for entry in it:
+        if entry.name.startswith(_TEMP_PREFIX) or not entry.is_file():
+          continue
+        try:
+          st = entry.stat()
+        except FileNotFoundError:
+          continue
+        entries[entry.name] = (st.st_mtime, st.st_size)
+    heap = [(t, k) for k, (t, _) in entries.items()]
+    heapq.heapify(heap)
+    with self._lock:
+      self._entries = entries
+      self._heap = heap
+      self._total_size = sum(size for _, size in entries.values())
+
+  def _record(self, key: str, access_time: float, size: int):
+    with self._lock:
+      old = self._entries.get(key)
+      if old is not None:
+        self._total_size -= old[1]
+      self._entries[key] = (access_time, size)
+      self._total_size += size
+      heapq.heappush(self._heap, (access_time, key))
+      if len(self._heap) > 2 * len(self._entries) + 16:
+        self._heap = [(t, k) for k, (t, _) in self._entries.items()]
+        heapq.heapify(self._heap)
+
+  def _forget(self, key: str):
+    # Must be called with self._lock held.
+    _, size = self._entries.pop(key)
+    self._total_size -= size
+
+  def _touch(self, key: str, size: int):
+    now = time.time()
+    try:
+      os.utime(str(self._path / key), times=(now, now))
+    except FileNotFoundError:
+      return
+    self._record(key, now, size)
+
+  def _evict(self):
+    while True:
+      with self._lock:
+        if self._total_size <= self._max_size or not self._heap:
+          return
+        access_time, key = heapq.heappop(self._heap)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != access_time:
+          continue  # Stale heap record.
+        path_to_key = str(self._path / key)
+        try:
+          st = os.stat(path_to_key)
+        except FileNotFoundError:
+          # Already evicted by another process.
+          self._forget(key)
+          continue
+        if st.st_mtime > access_time:
+          # Another process used or rewrote this entry since we last saw it.
+          self._forget(key)
+          self._entries[key] = (st.st_mtime, st.st_size)
+          self._total_size += st.st_size
+          heapq.heappush(self._heap, (st.st_mtime, key))
+          continue
+        self._forget(key)
+      logger.debug("Evicting persistent compilation cache entry %s", key)
+      try:
+        os.remove(path_to_key)
+      except FileNotFoundError:
+        pass
+
+
+class MmapFileCache(GFileCache):
+  """A GFileCache on the local filesystem whose values are read through mmap.
+
+  `get` returns a read-only `mmap.mmap` rather than `bytes`, so reading an
+  entry does not copy it into the Python heap and processes on the same host
+  reading the same entry share the page cache.
+  """
+
+  def __init__(self, path: str, max_size: int = -1):
+    if not _is_local_path(path):
+      raise ValueError(f"MmapFileCache requires a local path, got {path}")
+    super().__init__(path, max_size=max_size)
+
+  def get(self, key: str):
+    """Returns None if 'key' isn't present."""
+    if not key:
+      raise ValueError("key cannot be empty")
+    try:
+      with open(str(self._path / key), "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+          # Empty files can't be mapped.
+          value = b""
+        else:
+          value = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+      return None
+    if self._eviction_enabled:
+      self._touch(key, size)
+    return value
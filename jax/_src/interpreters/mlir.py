@@ -31,6 +31,7 @@ import warnings
 import numpy as np
 
 from jax._src import ad_util
+from jax._src import callback_executor
 from jax._src import core
 from jax._src import dtypes
 from jax._src import effects as effects_lib
@@ -1886,6 +1887,24 @@ def _aval_to_default_layouts(aval):
   # Row major order is default for `NumPy`.
   return [list(range(aval.ndim - 1, -1, -1)) for aval in avals]
 
+_DLPACK_CPU_DEVICE_TYPE = 1
+_np_from_dlpack = getattr(np, "from_dlpack", getattr(np, "_from_dlpack", None))
+
+def _callback_result_to_numpy(x):
+  """Returns a host callback result as a NumPy array, without copying it.
+
+  NumPy arrays are returned as they are. CPU tensors of other libraries are
+  adopted through DLPack if they support it, and otherwise through the buffer
+  protocol or ``__array__``, which only copy if the object is not already in
+  host memory.
+  """
+  if isinstance(x, np.ndarray):
+    return x
+  if (_np_from_dlpack is not None and hasattr(x, "__dlpack_device__") and
+      x.__dlpack_device__()[0] == _DLPACK_CPU_DEVICE_TYPE):
+    return _np_from_dlpack(x)
+  return np.asarray(x)
+
 def emit_python_callback(
     ctx: LoweringRuleContext, callback, token: Optional[Any],
     operands: Sequence[ir.Value], operand_avals: list[core.ShapedArray],
@@ -1893,8 +1912,15 @@ def emit_python_callback(
     has_side_effect: bool, *, sharding: Optional[xc.OpSharding] = None,
     operand_layouts: Optional[Sequence[Optional[Sequence[int]]]] = None,
     result_layouts: Optional[Sequence[Optional[Sequence[int]]]] = None,
+    name: Optional[str] = None, allow_async: bool = False,
     ) -> tuple[list[ir.Value], Any, Any]:
-  """Emits MLIR that calls back to a provided Python function."""
+  """Emits MLIR that calls back to a provided Python function.
+
+  The callback's latency is recorded under `name`. If `allow_async` is set and
+  the callback has no results and no token, it may run on the host callback
+  thread pool without the computation waiting for it; see
+  `jax._src.callback_executor`.
+  """
   platform = ctx.module_context.platform
   if platform not in {"cpu", "cuda", "rocm", "tpu"}:
     raise ValueError(
@@ -1913,10 +1939,14 @@ def emit_python_callback(
     result_layouts = util.concatenate(map(_aval_to_default_layouts, result_avals))
   result_mlir_layouts = map(_layout_to_mlir_layout, result_layouts)
 
+  callback = callback_executor.wrap_callback(
+      lu.fun_name(callback) if name is None else name, callback,
+      can_queue=allow_async and token is None and not result_avals)
+
   # First we apply checks to ensure output shapes and dtypes match the expected
   # ones.
   def _wrapped_callback(*args):
-    out_vals = callback(*args)
+    out_vals = tuple(_callback_result_to_numpy(x) for x in callback(*args))
     if len(out_vals) != len(result_avals):
       raise RuntimeError(
           "Mismatched number of outputs from callback. "
@@ -1186,6 +1186,21 @@ class InputsHandler:
             f"input_indices={self.input_indices})")
 
 
+@lru_cache(maxsize=4096)
+def shared_inputs_handler(
+    local_devices: tuple[xc.Device, ...], avals: tuple[ShapedArray, ...],
+    shardings: tuple[sharding_impls.XLACompatibleSharding, ...],
+    da_object: Union[_DeviceAssignment, tuple[xc.Device, ...]],
+) -> InputsHandler:
+  """Returns an InputsHandler shared by executables with the same inputs.
+
+  Used when `jax_shared_executables_max_entries` is set, so that functions
+  sharing an executable also share the handler and its shard indices.
+  """
+  return InputsHandler(local_devices, shardings,
+                       _get_input_indices(avals, shardings, da_object))
+
+
 class ResultsHandler:
   # `out_avals` is the `GlobalDeviceArray` global avals when using pjit or xmap
   # with `config.parallel_functions_output_gda=True`. It is the local one
@@ -1831,18 +1846,20 @@ def _trace_to_jaxpr_and_dce(fun_or_jaxpr, global_in_avals, api_name, fun_name,
     global_out_avals = fun_or_jaxpr.out_avals
     consts = fun_or_jaxpr.consts
 
-  if (keep_unused or auto_spmd_lowering or
-      any(hasattr(a, "shape") and not core.is_constant_shape(a.shape)
-          for a in global_in_avals)):
-    kept_var_idx = set(range(len(global_in_avals)))
-  else:
-    jaxpr, kept_const_idx, kept_var_idx = dispatch._prune_unused_inputs(jaxpr)
-    consts = [c for i, c in enumerate(consts) if i in kept_const_idx]
-    global_in_avals = tuple(a for i, a in enumerate(global_in_avals) if i in kept_var_idx)
-    donated_invars = tuple(x for i, x in enumerate(donated_invars) if i in kept_var_idx)
-    del kept_const_idx
+  with dispatch.record_elapsed_time(dispatch.JAXPR_SIMPLIFY_EVENT,
+                                    fun_name=str(name_stack)):
+    if (keep_unused or auto_spmd_lowering or
+        any(hasattr(a, "shape") and not core.is_constant_shape(a.shape)
+            for a in global_in_avals)):
+      kept_var_idx = set(range(len(global_in_avals)))
+    else:
+      jaxpr, kept_const_idx, kept_var_idx = dispatch._prune_unused_inputs(jaxpr)
+      consts = [c for i, c in enumerate(consts) if i in kept_const_idx]
+      global_in_avals = tuple(a for i, a in enumerate(global_in_avals) if i in kept_var_idx)
+      donated_invars = tuple(x for i, x in enumerate(donated_invars) if i in kept_var_idx)
+      del kept_const_idx
 
-  jaxpr = dispatch.apply_outfeed_rewriter(jaxpr)
+    jaxpr = dispatch.apply_outfeed_rewriter(jaxpr)
   closed_jaxpr = core.ClosedJaxpr(jaxpr, consts)
   return (closed_jaxpr, global_in_avals, tuple(global_out_avals), donated_invars,
           kept_var_idx, name_stack)
@@ -2589,10 +2606,18 @@ class UnloadedMeshExecutable:
   jaxpr_debug_info: Optional[core.JaxprDebugInfo]
 
   def build_unsafe_call(self):
-    input_indices = _get_input_indices(self.input_avals, self.input_shardings,
-                                       self.device_assignment)
-    handle_args = InputsHandler(self.xla_executable.local_devices(),
-                                self.input_shardings, input_indices)
+    if config.jax_shared_executables_max_entries > 0:
+      da = self.device_assignment
+      handle_args = shared_inputs_handler(
+          tuple(self.xla_executable.local_devices()), tuple(self.input_avals),
+          tuple(self.input_shardings),
+          da if isinstance(da, _DeviceAssignment) else tuple(da))
+    else:
+      input_indices = _get_input_indices(self.input_avals,
+                                         self.input_shardings,
+                                         self.device_assignment)
+      handle_args = InputsHandler(self.xla_executable.local_devices(),
+                                  self.input_shardings, input_indices)
     handle_outs = global_avals_to_results_handler(
         self.output_avals, self.output_shardings, self.committed,
         self.are_out_shardings_from_xla)  # type: ignore  # arg-type
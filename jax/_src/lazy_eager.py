@@ -0,0 +1,300 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Lazy eager execution, which fuses consecutive eager ops into one executable.
+
+Outside of ``jit``, each primitive is compiled and dispatched on its own by
+``dispatch.apply_primitive``. For long chains of small ops that per-op
+dispatch overhead dominates. Under :func:`lazy_eager`, primitive applications
+are instead recorded, and the pending ops are compiled and run as a single
+computation once a value is observed: converted to NumPy, used in Python
+control flow, waited on with ``block_until_ready``, or returned. Compiled
+fragments are cached by the sequence of ops they contain, so loops that record
+the same ops again reuse them.
+"""
+
+from __future__ import annotations
+
+from functools import partial
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from jax._src import api
+from jax._src import core
+from jax._src import traceback_util
+from jax._src import util
+from jax._src.tree_util import tree_flatten, tree_unflatten
+from jax._src.util import safe_map, safe_zip
+
+map, unsafe_map = safe_map, map
+zip, unsafe_zip = safe_zip, zip
+
+traceback_util.register_exclusion(__file__)
+
+
+def lazy_eager(fun: Callable, *, max_pending_ops: int = 1024) -> Callable:
+  """Runs ``fun`` eagerly, fusing consecutive ops into cached executables.
+
+  Args:
+    fun: a function of arrays, run eagerly as if called directly.
+    max_pending_ops: the maximum number of ops recorded before they are run,
+      which bounds the size of each fused computation.
+
+  Returns:
+    A function with the same signature and results as ``fun``.
+
+  For example::
+
+    @lazy_eager
+    def preprocess(x):
+      x = (x - x.mean()) / x.std()  # Recorded, not run yet.
+      if x.max() > 10:  # Runs the four recorded ops as one computation.
+        x = jnp.clip(x, -10, 10)
+      return x * 2  # Runs the remaining ops.
+
+  Values whose contents are needed by Python, e.g. shapes passed to
+  ``jnp.zeros`` or indices passed to ``range``, must be observed explicitly,
+  for example with ``int(x)``. Ops with side effects run in program order,
+  after all ops recorded before them.
+  """
+  if max_pending_ops < 1:
+    raise ValueError(f"max_pending_ops must be positive, got {max_pending_ops}")
+
+  @util.wraps(fun)
+  def lazy_fun(*args, **kwargs):
+    pending = _PendingOps(max_pending_ops)
+    with core.new_base_main(LazyTrace, pending=pending):
+      out = fun(*args, **kwargs)
+      out_flat, out_tree = tree_flatten(out)
+      pending.flush()
+      out_flat = [x._value() if isinstance(x, LazyTracer) else x
+                  for x in out_flat]
+    return tree_unflatten(out_tree, out_flat)
+
+  return lazy_fun
+
+
+class _Node:
+  """A value produced by a recorded op, or an input to the recorded ops.
+
+  `val` is None until the op producing the value has run. `num_tracers` counts
+  the live tracers referring to the node; values without tracers can no longer
+  be observed, so they are not returned from fused computations.
+  """
+  __slots__ = ["aval", "val", "num_tracers"]
+
+  def __init__(self, aval: core.AbstractValue, val: Any = None):
+    self.aval = aval
+    self.val = val
+    self.num_tracers = 0
+
+
+class _PendingEqn:
+  __slots__ = ["primitive", "params", "inputs", "outputs"]
+
+  def __init__(self, primitive, params, inputs, outputs):
+    self.primitive = primitive
+    self.params = params
+    self.inputs: list[_Node] = inputs
+    self.outputs: list[_Node] = outputs
+
+
+class _PendingOps:
+  """The ops recorded by a `lazy_eager` call that have not run yet."""
+
+  def __init__(self, max_pending_ops: int):
+    self.max_pending_ops = max_pending_ops
+    self.eqns: list[_PendingEqn] = []
+
+  def record(self, eqn: _PendingEqn) -> None:
+    self.eqns.append(eqn)
+    if len(self.eqns) >= self.max_pending_ops:
+      self.flush()
+
+  def flush(self) -> None:
+    """Runs every pending op as a single computation."""
+    eqns, self.eqns = self.eqns, []
+    if not eqns:
+      return
+    producers: dict[int, tuple[int, int]] = {}
+    input_ids: dict[int, int] = {}
+    input_vals = []
+    signature = []
+    for i, eqn in enumerate(eqns):
+      in_refs = []
+      for node in eqn.inputs:
+        if id(node) in producers:
+          in_refs.append(producers[id(node)])
+        else:
+          assert node.val is not None
+          if id(node) not in input_ids:
+            input_ids[id(node)] = len(input_vals)
+            input_vals.append(node.val)
+          in_refs.append((-1, input_ids[id(node)]))
+      for j, node in enumerate(eqn.outputs):
+        producers[id(node)] = (i, j)
+      signature.append((eqn.primitive, tuple(sorted(eqn.params.items())),
+                        tuple(in_refs)))
+    out_nodes = [node for eqn in eqns for node in eqn.outputs
+                 if node.num_tracers]
+    out_refs = tuple(producers[id(node)] for node in out_nodes)
+    try:
+      fused = _fused_callable(tuple(signature), out_refs)
+    except TypeError:
+      # Some params are unhashable, so the computation cannot be cached.
+      fused = _fused_callable.__wrapped__(tuple(signature), out_refs)
+    with core.eval_context():
+      out_vals = fused(*input_vals)
+    for node, val in zip(out_nodes, out_vals):
+      node.val = val
+
+
+@util.cache(max_size=4096)
+def _fused_callable(signature, out_refs) -> Callable:
+  return api.jit(partial(_run_signature, signature, out_refs))
+
+
+def _run_signature(signature, out_refs, *args):
+  results = []
+  for primitive, params, in_refs in signature:
+    ins = [args[j] if i < 0 else results[i][j] for i, j in in_refs]
+    out = primitive.bind(*ins, **dict(params))
+    results.append(out if primitive.multiple_results else [out])
+  return [results[i][j] for i, j in out_refs]
+
+
+class LazyTracer(core.Tracer):
+  __slots__ = ["_node"]
+
+  def __init__(self, trace: LazyTrace, node: _Node):
+    self._trace = trace
+    self._node = node
+    node.num_tracers += 1
+
+  def __del__(self):
+    self._node.num_tracers -= 1
+
+  @property
+  def aval(self):
+    return self._node.aval
+
+  def full_lower(self):
+    if self._node.val is not None:
+      return core.full_lower(self._node.val)
+    return self
+
+  def _value(self):
+    if self._node.val is None:
+      self._trace.main.payload["pending"].flush()
+    assert self._node.val is not None
+    return self._node.val
+
+  # Observing a value runs the pending ops.
+  def __array__(self, *args, **kw):
+    return np.asarray(self._value(), *args, **kw)
+
+  def __bool__(self): return bool(self._value())
+  def __int__(self): return int(self._value())
+  def __float__(self): return float(self._value())
+  def __complex__(self): return complex(self._value())
+  def __index__(self): return self._value().__index__()
+  def __hex__(self): return hex(self._value())
+  def __oct__(self): return oct(self._value())
+
+  def __repr__(self):
+    return repr(self._value())
+
+  def tolist(self):
+    return self._value().tolist()
+
+  def tobytes(self, order="C"):
+    return self._value().tobytes(order)
+
+  def block_until_ready(self):
+    return self._value().block_until_ready()
+
+  @property
+  def sharding(self):
+    return self._value().sharding
+
+
+class LazyTrace(core.Trace):
+
+  def __init__(self, main: core.MainTrace, sublevel: core.Sublevel,
+               pending: Optional[_PendingOps] = None) -> None:
+    super().__init__(main, sublevel)
+    del pending  # Read from `main.payload`.
+
+  @property
+  def pending(self) -> _PendingOps:
+    return self.main.payload["pending"]
+
+  def pure(self, val) -> LazyTracer:
+    return LazyTracer(self, _Node(core.raise_to_shaped(core.get_aval(val)),
+                                  val))
+
+  def lift(self, tracer) -> LazyTracer:
+    return self.pure(tracer)
+
+  def sublift(self, tracer: LazyTracer) -> LazyTracer:
+    return LazyTracer(self, tracer._node)
+
+  def process_primitive(self, primitive, tracers, params):
+    try:
+      out_avals, effects = primitive.abstract_eval(
+          *[t.aval for t in tracers], **params)
+    except NotImplementedError:
+      effects = None
+    if effects is None or effects:
+      # Ops with effects, or without an abstract evaluation rule, run now.
+      with core.eval_context():
+        out = primitive.bind(*[t._value() for t in tracers], **params)
+      if primitive.multiple_results:
+        return map(self.pure, out)
+      return self.pure(out)
+    if not primitive.multiple_results:
+      out_avals = [out_avals]
+    outputs = [_Node(core.raise_to_shaped(a)) for a in out_avals]
+    out_tracers = [LazyTracer(self, node) for node in outputs]
+    self.pending.record(_PendingEqn(
+        primitive, params, [t._node for t in tracers], outputs))
+    return out_tracers if primitive.multiple_results else out_tracers[0]
+
+  def process_call(self, call_primitive, f, tracers, params):
+    del call_primitive, params  # Unused.
+    with core.new_sublevel():
+      return f.call_wrapped(*tracers)
+
+  def process_map(self, map_primitive, f, tracers, params):
+    with core.eval_context():
+      out = map_primitive.bind(f, *[t._value() for t in tracers], **params)
+    return map(self.pure, out)
+
+  def process_custom_transpose(self, primitive, call, tracers, **_):
+    del primitive, _  # Unused.
+    with core.new_sublevel():
+      return call.call_wrapped(*tracers)
+
+  def process_custom_jvp_call(self, primitive, fun, jvp, tracers, *,
+                              symbolic_zeros):
+    del primitive, jvp, symbolic_zeros  # Unused.
+    with core.new_sublevel():
+      return fun.call_wrapped(*tracers)
+
+  def process_custom_vjp_call(self, primitive, fun, fwd, bwd, tracers,
+                              out_trees, symbolic_zeros):
+    del primitive, fwd, bwd, out_trees, symbolic_zeros  # Unused.
+    with core.new_sublevel():
+      return fun.call_wrapped(*tracers)
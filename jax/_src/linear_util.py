@@ -63,8 +63,10 @@ data must be immutable, because it will be stored in function memoization tables
 """
 from __future__ import annotations
 
+from collections import OrderedDict
 from functools import partial
 import operator
+import threading
 from typing import Any, Callable, Optional, NamedTuple
 import weakref
 
@@ -327,9 +329,20 @@ def cache(call: Callable):
      A memoized version of ``call``.
   """
   fun_caches: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+  # Every entry of every function, least recently used first, keyed by
+  # (weakref to fun.f, key).
+  lru: OrderedDict = OrderedDict()
+  counts = _CacheCounts()
+  # Guards the bookkeeping above, which is shared by every thread that traces.
+  # Reentrant because the weakref callbacks of dying functions take it, and
+  # may run during garbage collection on a thread already holding it.
+  lock = threading.RLock()
 
   def memoized_fun(fun: WrappedFun, *args):
-    cache = fun_caches.setdefault(fun.f, {})
+    with lock:
+      fun_cache = fun_caches.get(fun.f)
+      if fun_cache is None:
+        fun_cache = fun_caches[fun.f] = _FunctionCache(fun.f, lru, lock)
     if config.jax_check_tracer_leaks:
       key = (_copy_main_traces(fun.transforms), fun.params, fun.in_type, args,
              config.x64_enabled, config.jax_default_device,
@@ -337,33 +350,144 @@ def cache(call: Callable):
     else:
       key = (fun.transforms, fun.params, fun.in_type, args, config.x64_enabled,
              config.jax_default_device, config._trace_context())
-    result = cache.get(key, None)
+    with lock:
+      result = fun_cache.entries.get(key, None)
+      if result is not None:
+        fun_cache.entries.move_to_end(key)
+        lru.move_to_end((fun_cache.ref, key))
+        fun_cache.hits += 1
+        counts.hits += 1
     if result is not None:
       ans, stores = result
       fun.populate_stores(stores)
     else:
       ans = call(fun, *args)
-      cache[key] = (ans, fun.stores)
+      with lock:
+        fun_cache.misses += 1
+        counts.misses += 1
+        fun_cache.entries[key] = (ans, fun.stores)
+        lru[(fun_cache.ref, key)] = None
+        _evict(fun_cache)
 
     return ans
 
-  def _evict_function(f):
-    fun_caches.pop(f, None)
+  def _evict(fun_cache):
+    # Called with `lock` held.
+    max_per_function = config.jax_tracing_cache_max_entries_per_function
+    while 0 < max_per_function < len(fun_cache.entries):
+      key, _ = fun_cache.entries.popitem(last=False)
+      lru.pop((fun_cache.ref, key), None)
+      counts.evictions += 1
+    max_entries = config.jax_tracing_cache_max_entries
+    while 0 < max_entries < len(lru):
+      (ref, key), _ = lru.popitem(last=False)
+      f = ref()
+      if f is not None and f in fun_caches:
+        fun_caches[f].entries.pop(key, None)
+      counts.evictions += 1
 
-  memoized_fun.cache_clear = fun_caches.clear  # type: ignore
+  def _evict_function(f):
+    with lock:
+      fun_cache = fun_caches.pop(f, None)
+      if fun_cache is not None:
+        fun_cache.clear()
+
+  def _cache_clear():
+    with lock:
+      fun_caches.clear()
+      lru.clear()
+
+  def _cache_info():
+    with lock:
+      return CacheInfo(counts.hits, counts.misses, len(lru), counts.evictions)
+
+  def _cache_consumers():
+    name = fun_name(call)
+    with lock:
+      return [CacheConsumer(name, fun_cache.name, len(fun_cache.entries),
+                            fun_cache.hits, fun_cache.misses)
+              for fun_cache in list(fun_caches.values())]
+
+  memoized_fun.cache_clear = _cache_clear  # type: ignore
+  memoized_fun.cache_info = _cache_info  # type: ignore
+  memoized_fun.cache_consumers = _cache_consumers  # type: ignore
   memoized_fun.evict_function = _evict_function  # type: ignore
 
   cache_clearing_funs.add(memoized_fun.cache_clear)
+  memoized_funs.add(memoized_fun)
 
   return memoized_fun
 
+
+class CacheInfo(NamedTuple):
+  """Hit, miss and size counters of a tracing cache."""
+  hits: int
+  misses: int
+  currsize: int
+  evictions: int
+
+
+class CacheConsumer(NamedTuple):
+  """The entries a tracing cache holds for a single function."""
+  cache: str
+  function: str
+  entries: int
+  hits: int
+  misses: int
+
+
+class _CacheCounts:
+  __slots__ = ("hits", "misses", "evictions")
+
+  def __init__(self):
+    self.hits = self.misses = self.evictions = 0
+
+
+class _FunctionCache:
+  """The entries of a tracing cache for one function, least recent first."""
+  __slots__ = ("name", "entries", "ref", "hits", "misses", "_lru")
+
+  def __init__(self, f, lru: OrderedDict, lock):
+    self.name = fun_name(f)
+    self.entries: OrderedDict = OrderedDict()
+    self.hits = self.misses = 0
+    self._lru = lru
+    entries = self.entries
+    # Drops the function's entries from the shared LRU order once it dies.
+    # The callback must not refer to `self`, which dies along with `f`.
+    def remove(ref):
+      with lock:
+        for key in list(entries):
+          lru.pop((ref, key), None)
+    self.ref = weakref.ref(f, remove)
+
+  def clear(self):
+    # Called with the cache's lock held.
+    for key in list(self.entries):
+      self._lru.pop((self.ref, key), None)
+    self.entries.clear()
+
+
 cache_clearing_funs = weakref.WeakSet()  # type: ignore
+memoized_funs = weakref.WeakSet()  # type: ignore
 
 def clear_all_caches():
   global cache_clearing_funs
   for clear in cache_clearing_funs:
     clear()
 
+def largest_cache_consumers(n: Optional[int] = 10) -> list[CacheConsumer]:
+  """Returns the `n` functions with the most entries across tracing caches.
+
+  This is meant for diagnosing memory growth from tracing, e.g. a jitted
+  function that is retraced for every distinct batch size. Pass `n=None` to
+  return every function.
+  """
+  consumers = [c for memoized_fun in list(memoized_funs)
+               for c in memoized_fun.cache_consumers()]
+  consumers.sort(key=lambda c: c.entries, reverse=True)
+  return consumers if n is None else consumers[:n]
+
 @partial(partial, tree_map)
 def _copy_main_traces(x):
   if isinstance(x, core.MainTrace):
@@ -24,6 +24,7 @@ from typing import Callable
 
 _event_listeners: list[Callable[[str], None]] = []
 _event_duration_secs_listeners: list[Callable[[str, float], None]] = []
+_scalar_listeners: list[Callable[[str, float], None]] = []
 
 def record_event(event: str) -> None:
   """Record an event."""
@@ -35,6 +36,11 @@ def record_event_duration_secs(event: str, duration: float) -> None:
   for callback in _event_duration_secs_listeners:
     callback(event, duration)
 
+def record_scalar(event: str, value: float) -> None:
+  """Record a scalar value, e.g. the current size of a queue."""
+  for callback in _scalar_listeners:
+    callback(event, value)
+
 def register_event_listener(callback: Callable[[str], None]) -> None:
   """Register a callback to be invoked during record_event()."""
   _event_listeners.append(callback)
@@ -44,8 +50,14 @@ def register_event_duration_secs_listener(
   """Register a callback to be invoked during record_event_duration_secs()."""
   _event_duration_secs_listeners.append(callback)
 
+def register_scalar_listener(
+    callback : Callable[[str, float], None]) -> None:
+  """Register a callback to be invoked during record_scalar()."""
+  _scalar_listeners.append(callback)
+
 def _clear_event_listeners():
   """Clear event listeners."""
-  global _event_listeners, _event_duration_secs_listeners
+  global _event_listeners, _event_duration_secs_listeners, _scalar_listeners
   _event_listeners = []
   _event_duration_secs_listeners = []
+  _scalar_listeners = []
@@ -347,10 +347,7 @@ def post_infer_params(fun, infer_params_fn, static_argnums, static_argnames,
   else:
     wrapped = _python_pjit(fun, infer_params_fn)
 
-  @api_boundary
-  def lower(*args, **kwargs):
-    _experimental_lowering_platform = kwargs.pop(
-        '_experimental_lowering_platform', None)
+  def _lower(args, kwargs, always_lower, lowering_platform):
     (args_flat, flat_global_in_avals, params, in_tree, out_tree,
      donate_argnums) = infer_params_fn(*args, **kwargs)
     resource_env = params['resource_env']
@@ -361,8 +358,8 @@ def post_infer_params(fun, infer_params_fn, static_argnums, static_argnames,
       lowering = _pjit_lower(
           params['jaxpr'], in_shardings, params['out_shardings'],
           params['resource_env'], params['donated_invars'], params['name'],
-          params['keep_unused'], params['inline'], always_lower=True,
-          lowering_platform=_experimental_lowering_platform)
+          params['keep_unused'], params['inline'], always_lower=always_lower,
+          lowering_platform=lowering_platform)
     except pxla.DeviceAssignmentMismatchError as e:
       fails, = e.args
       api_name = 'jit' if params['resource_env'] is None else 'pjit'
@@ -381,7 +378,22 @@ def post_infer_params(fun, infer_params_fn, static_argnums, static_argnames,
         lowering, args_kwargs_in_tree, flat_global_in_avals, donate_argnums,
         out_tree)
 
+  @api_boundary
+  def lower(*args, **kwargs):
+    _experimental_lowering_platform = kwargs.pop(
+        '_experimental_lowering_platform', None)
+    return _lower(args, kwargs, always_lower=True,
+                  lowering_platform=_experimental_lowering_platform)
+
+  @api_boundary
+  def precompile(*args, **kwargs):
+    # Lower as calls do, so that the compiled executable is the one later
+    # calls with the same argument types and shardings look up.
+    return _lower(args, kwargs, always_lower=False,
+                  lowering_platform=None).compile_async()
+
   wrapped.lower = lower
+  wrapped.precompile = precompile
   return wrapped
 
 
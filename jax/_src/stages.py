@@ -30,6 +30,8 @@ executable protocols described above.
 """
 from __future__ import annotations
 
+import concurrent.futures
+import threading
 import warnings
 
 from dataclasses import dataclass
@@ -42,6 +44,7 @@ from jax._src import source_info_util
 from jax._src import traceback_util
 from jax._src import tree_util
 from jax._src import util
+from jax._src.config import config
 from jax._src.interpreters import mlir
 from jax._src.lib.mlir import ir
 from jax._src.lib import xla_client as xc
@@ -606,6 +609,17 @@ class Lowered(Stage):
         no_kwargs=self._no_kwargs,
     )
 
+  def compile_async(
+      self, compiler_options: Optional[CompilerOptions] = None
+  ) -> concurrent.futures.Future[Compiled]:
+    """Compile in a background thread, returning a future ``Compiled``.
+
+    Compilations run on a shared pool of ``jax_async_compile_threads``
+    threads. XLA releases the GIL while compiling, so the calling thread can
+    keep dispatching other computations in the meantime.
+    """
+    return _get_compile_executor().submit(self.compile, compiler_options)
+
   def as_text(self, dialect: Optional[str] = None) -> str:
     """A human-readable text representation of this lowering.
 
@@ -654,6 +668,20 @@ class Lowered(Stage):
       return None
 
 
+_compile_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_compile_executor_lock = threading.Lock()
+
+
+def _get_compile_executor() -> concurrent.futures.ThreadPoolExecutor:
+  global _compile_executor
+  with _compile_executor_lock:
+    if _compile_executor is None:
+      _compile_executor = concurrent.futures.ThreadPoolExecutor(
+          max_workers=config.jax_async_compile_threads,
+          thread_name_prefix="jax_async_compile")
+    return _compile_executor
+
+
 class Wrapped(Protocol):
   """A function ready to be specialized, lowered, and compiled.
 
@@ -391,6 +391,89 @@ register_pytree_node(
 )
 
 
+class FlatTree:
+  """A pytree stored as its flat list of leaves and its treedef.
+
+  Flattening a large pytree walks every container in it, and sorts the keys of
+  every dict. A ``FlatTree`` is a pytree node whose children are the leaves of
+  the tree it was built from, so flattening it, e.g. when it is passed to a
+  ``jit``-compiled function, only copies its leaves: its structure is frozen in
+  the stored treedef.
+
+  >>> params = {"w": 1., "layers": [{"b": 1.}, {"b": 2.}]}
+  >>> flat = FlatTree.from_tree(params)
+  >>> flat = flat.map(lambda x, y: x + y, flat)
+  >>> flat.to_tree()["layers"][1]["b"]
+  4.0
+
+  ``FlatTree`` s compare treedefs rather than rebuilding containers, so
+  :meth:`map` over several of them is a loop over their leaves. A ``FlatTree``
+  is immutable; use :meth:`replace_leaves` or :meth:`map` to update it.
+  """
+  __slots__ = ("leaves", "treedef")
+
+  leaves: tuple[Leaf, ...]
+  treedef: PyTreeDef
+
+  def __init__(self, leaves: Iterable[Leaf], treedef: PyTreeDef):
+    leaves = tuple(leaves)
+    if len(leaves) != treedef.num_leaves:
+      raise ValueError(
+          f"FlatTree got {len(leaves)} leaves for a treedef with "
+          f"{treedef.num_leaves} leaves: {treedef}")
+    object.__setattr__(self, "leaves", leaves)
+    object.__setattr__(self, "treedef", treedef)
+
+  def __setattr__(self, name, value):
+    raise AttributeError("FlatTree is immutable.")
+
+  @classmethod
+  def from_tree(cls, tree: Any,
+                is_leaf: Optional[Callable[[Any], bool]] = None) -> FlatTree:
+    """Flattens `tree` once, freezing its structure."""
+    leaves, treedef = tree_flatten(tree, is_leaf)
+    return cls(leaves, treedef)
+
+  def to_tree(self) -> Any:
+    """Rebuilds the pytree this ``FlatTree`` was built from."""
+    return self.treedef.unflatten(self.leaves)
+
+  def replace_leaves(self, leaves: Iterable[Leaf]) -> FlatTree:
+    return FlatTree(leaves, self.treedef)
+
+  def map(self, f: Callable[..., Any], *rest: FlatTree) -> FlatTree:
+    """Like :func:`tree_map`, over ``FlatTree`` s with the same structure."""
+    for other in rest:
+      if not isinstance(other, FlatTree):
+        raise TypeError(
+            f"FlatTree.map expects FlatTree arguments, got {type(other)}.")
+      if other.treedef != self.treedef:
+        raise ValueError(
+            "FlatTree.map requires FlatTrees with the same structure, got "
+            f"{self.treedef} and {other.treedef}.")
+    if not rest:
+      return FlatTree([f(x) for x in self.leaves], self.treedef)
+    return FlatTree(
+        [f(*xs) for xs in zip(self.leaves, *(r.leaves for r in rest))],
+        self.treedef)
+
+  def __len__(self) -> int:
+    return len(self.leaves)
+
+  def __reduce__(self):
+    return FlatTree, (self.leaves, self.treedef)
+
+  def __repr__(self):
+    return f"FlatTree({self.treedef}, num_leaves={len(self.leaves)})"
+
+
+register_pytree_node(
+    FlatTree,
+    lambda t: (t.leaves, t.treedef),
+    lambda treedef, leaves: FlatTree(leaves, treedef),
+)
+
+
 def broadcast_prefix(prefix_tree: Any, full_tree: Any,
                      is_leaf: Optional[Callable[[Any], bool]] = None
                      ) -> list[Any]:
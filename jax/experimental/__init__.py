@@ -22,3 +22,9 @@ from jax.experimental.x64_context import (
 from jax._src.callback import (
   io_callback as io_callback
 )
+from jax._src.callback_executor import (
+  CallbackStats as CallbackStats,
+  LatencyHistogram as LatencyHistogram,
+  get_stats as get_callback_stats,
+  reset_stats as reset_callback_stats,
+)
@@ -15,9 +15,13 @@
 
 import abc
 import asyncio
+import copy
+import hashlib
+import heapq
 import itertools
+import json
 import logging
-from functools import partial
+import math
 import os
 import re
 import time
@@ -38,6 +42,10 @@ import tensorstore as ts
 TS_CONTEXT = ts.Context({'file_io_concurrency': {'limit': 128}})
 _REMOVED_VALUE = 'Value removed'
 _CHECKPOINT_SUCCESS = 'checkpoint_write_success'
+# Sidecar files recording the content hash of each shard written by a process,
+# and where the data of shards that were not rewritten can be found. See
+# `async_serialize`.
+_INCREMENTAL_KEY_FORMAT = 'jax_incremental.{}.json'
 _module_unique_count = itertools.count()
 _DEFAULT_DRIVER = 'file'
 
@@ -116,21 +124,43 @@ def get_tensorstore_spec(ckpt_path: str, ocdbt: bool = False):
 
 # Lifted from T5X.
 class _LimitInFlightBytes:
-  """Limits in-flight bytes when reading/writing checkpoints per process."""
+  """Limits in-flight bytes when reading/writing checkpoints per process.
+
+  Waiters are admitted in order of `priority`, and then in order of arrival, so
+  that reads can be streamed in a chosen order (e.g. array by array, in storage
+  order within each array) instead of in whatever order the event loop happens
+  to resume them.
+  """
 
   def __init__(self, num_bytes):
     self._max_bytes = num_bytes
     self._available_bytes = num_bytes
     self._cv = asyncio.Condition(lock=asyncio.Lock())
+    self._waiters: list[tuple[Any, int]] = []
+    self._arrival = itertools.count()
 
-  async def wait_for_bytes(self, requested_bytes):
+  async def wait_for_bytes(self, requested_bytes, priority=()):
     if requested_bytes >= self._max_bytes:
       raise ValueError('Requested more bytes than we reserved space for: '
                        f'{requested_bytes} > {self._max_bytes}')
     async with self._cv:
-      await self._cv.wait_for(lambda: self._available_bytes > requested_bytes)
+      waiter = (priority, next(self._arrival))
+      heapq.heappush(self._waiters, waiter)
+      try:
+        await self._cv.wait_for(
+            lambda: (self._waiters[0] == waiter and
+                     self._available_bytes > requested_bytes))
+      except BaseException:
+        # Don't block the waiters queued behind a cancelled one.
+        self._waiters.remove(waiter)
+        heapq.heapify(self._waiters)
+        self._cv.notify_all()
+        raise
+      heapq.heappop(self._waiters)
       self._available_bytes -= requested_bytes
       assert self._available_bytes >= 0
+      # The next waiter may also fit in the remaining bytes.
+      self._cv.notify_all()
 
   async def release_bytes(self, requested_bytes):
     async with self._cv:
@@ -139,9 +169,75 @@ class _LimitInFlightBytes:
       self._cv.notify_all()
 
 
+def _find_kvstore(spec: dict[str, Any]) -> Optional[dict[str, Any]]:
+  if 'kvstore' in spec:
+    return spec['kvstore']
+  if isinstance(spec.get('base'), dict):
+    return _find_kvstore(spec['base'])
+  return None
+
+
+def _incremental_kvstore(tensorstore_spec) -> Optional[dict[str, Any]]:
+  """Returns a kvstore spec for the sidecar files of `tensorstore_spec`."""
+  if isinstance(tensorstore_spec, ts.Spec):
+    tensorstore_spec = tensorstore_spec.to_json()
+  kvstore = _find_kvstore(tensorstore_spec)
+  if kvstore is None:
+    return None
+  kvstore = copy.deepcopy(kvstore)
+  kvstore['path'] = kvstore.get('path', '').rstrip('/') + '/'
+  return kvstore
+
+
+def _source_spec(tensorstore_spec) -> dict[str, Any]:
+  if isinstance(tensorstore_spec, ts.Spec):
+    tensorstore_spec = tensorstore_spec.to_json()
+  spec = copy.deepcopy(tensorstore_spec)
+  spec.pop('metadata', None)
+  return spec
+
+
+def _shard_region(index: array.Index,
+                  shape: Sequence[int]) -> tuple[tuple[int, int], ...]:
+  return tuple(s.indices(d)[:2] for s, d in zip(index, shape))
+
+
+def _shard_hash(data, global_shape, dtype) -> str:
+  h = hashlib.blake2b(digest_size=16)
+  h.update(repr((tuple(global_shape), str(dtype))).encode('utf-8'))
+  h.update(np.ascontiguousarray(np.asarray(data)).tobytes())
+  return h.hexdigest()
+
+
+async def _read_incremental_records(tensorstore_spec, context=TS_CONTEXT):
+  """Returns the sidecar records of every process that wrote a checkpoint."""
+  kvstore = _incremental_kvstore(tensorstore_spec)
+  if kvstore is None:
+    return []
+  kv = await ts.KvStore.open(kvstore, context=context)
+  records = []
+  for process_index in itertools.count():
+    result = await kv.read(_INCREMENTAL_KEY_FORMAT.format(process_index))
+    if result.state != 'value':
+      break
+    records.extend(json.loads(result.value)['shards'])
+  return records
+
+
 async def async_serialize(
-    arr_inp, tensorstore_spec, commit_future=None, context=TS_CONTEXT
+    arr_inp, tensorstore_spec, commit_future=None, context=TS_CONTEXT,
+    incremental: bool = False, previous_tensorstore_spec=None,
 ):
+  """Writes an array to TensorStore.
+
+  If `incremental` is True, the content hash of every shard is recorded next
+  to the array. If a `previous_tensorstore_spec` written in incremental mode is
+  also given, shards whose hash is unchanged since that checkpoint are not
+  written again: the new checkpoint instead records where their data lives,
+  and `async_deserialize` reads them from there. References always point at
+  the checkpoint holding the data, so earlier checkpoints in a chain must be
+  kept as long as later ones reference them.
+  """
   if (isinstance(arr_inp, array.ArrayImpl) and jax.process_count() > 1 and
       arr_inp.is_fully_addressable):
     raise ValueError('Passing fully addressable Arrays to a multiprocess '
@@ -177,8 +273,37 @@ async def async_serialize(
       context=context,
   )
 
+  if isinstance(arr_inp, array.ArrayImpl):
+    local_shards = arr_inp.addressable_shards
+  else:
+    local_shards = arr_inp.addressable_shards
+
+  # Maps the region of each shard written by this process to its sidecar
+  # record, if in incremental mode.
+  records: dict[tuple[tuple[int, int], ...], dict[str, Any]] = {}
+  if incremental:
+    previous = {}
+    if previous_tensorstore_spec is not None:
+      for r in await _read_incremental_records(previous_tensorstore_spec,
+                                               context):
+        previous[tuple(map(tuple, r['region']))] = r
+    for shard in local_shards:
+      if shard.replica_id != 0:
+        continue
+      region = _shard_region(shard.index, arr_inp.shape)
+      digest = _shard_hash(shard.data, arr_inp.shape, arr_inp.dtype)
+      record = {'region': region, 'hash': digest, 'source': None}
+      prev = previous.get(region)
+      if prev is not None and prev['hash'] == digest:
+        record['source'] = (prev['source'] or
+                            _source_spec(previous_tensorstore_spec))
+      records[region] = record
+
   async def _write_array(shard):
     if shard.replica_id == 0:
+      record = records.get(_shard_region(shard.index, arr_inp.shape))
+      if record is not None and record['source'] is not None:
+        return  # Unchanged since the previous checkpoint.
       write_future = t[shard.index].write(shard.data)
       if commit_future is not None:
         assert isinstance(commit_future, list)
@@ -187,12 +312,20 @@ async def async_serialize(
       else:
         await write_future.commit
 
-  if isinstance(arr_inp, array.ArrayImpl):
-    local_shards = arr_inp.addressable_shards
-  else:
-    local_shards = arr_inp.addressable_shards
   future_write_state = jax.tree_util.tree_map(_write_array, local_shards)
-  return await asyncio.gather(*future_write_state)
+  result = await asyncio.gather(*future_write_state)
+
+  if incremental:
+    kv = await ts.KvStore.open(_incremental_kvstore(tensorstore_spec),
+                               context=context)
+    sidecar_future = kv.write(
+        _INCREMENTAL_KEY_FORMAT.format(jax.process_index()),
+        json.dumps({'shards': list(records.values())}).encode('utf-8'))
+    if commit_future is not None:
+      commit_future.append(sidecar_future)
+    else:
+      await sidecar_future
+  return result
 
 
 def run_serialization(arrays, tensorstore_specs):
@@ -235,6 +368,77 @@ def estimate_read_memory_footprint(t: ts.TensorStore,
   return num_bytes
 
 
+def _index_origin(index: array.Index) -> tuple[int, ...]:
+  return tuple(0 if s.start is None else s.start for s in index)
+
+
+def _overlap(domain: ts.IndexDomain,
+             region: Sequence[Sequence[int]]) -> Optional[ts.IndexDomain]:
+  lo = [max(a, r[0]) for a, r in zip(domain.inclusive_min, region)]
+  hi = [min(b, r[1]) for b, r in zip(domain.exclusive_max, region)]
+  if any(l >= h for l, h in zip(lo, hi)):
+    return None
+  return ts.IndexDomain(inclusive_min=lo, exclusive_max=hi)
+
+
+def _local_zarr_array(tensorstore_spec) -> Optional[tuple[str, dict[str, Any],
+                                                          np.dtype]]:
+  """Returns the directory, metadata and dtype of an uncompressed local array.
+
+  Returns None unless `tensorstore_spec` is a zarr array on the local
+  filesystem whose chunks are stored as raw, native-endian, C-order bytes.
+  """
+  if isinstance(tensorstore_spec, ts.Spec):
+    tensorstore_spec = tensorstore_spec.to_json()
+  kvstore = tensorstore_spec.get('kvstore')
+  if (tensorstore_spec.get('driver') != 'zarr' or
+      not isinstance(kvstore, dict) or kvstore.get('driver') != 'file'):
+    return None
+  path = os.path.join(kvstore['path'], tensorstore_spec.get('path', ''))
+  try:
+    with open(os.path.join(path, '.zarray')) as f:
+      metadata = json.load(f)
+  except (OSError, ValueError):
+    return None
+  if (metadata.get('compressor') is not None or metadata.get('filters') or
+      metadata.get('order', 'C') != 'C'):
+    return None
+  if metadata['dtype'] == 'bfloat16':
+    dtype = np.dtype(jnp.bfloat16)
+  else:
+    try:
+      dtype = np.dtype(metadata['dtype'])
+    except TypeError:
+      return None
+  if not dtype.isnative or dtype.hasobject:
+    return None
+  return path, metadata, dtype
+
+
+def _mmap_chunk(path: str, metadata: dict[str, Any], dtype: np.dtype,
+                domain: ts.IndexDomain) -> Optional[np.ndarray]:
+  """Maps the stored chunk that exactly covers `domain`, if there is one.
+
+  The mapping is copy-on-write, so writes to the returned array, e.g. through
+  a donated buffer, never reach the file.
+  """
+  chunks = metadata['chunks']
+  if any(o % c or s != c
+         for o, s, c in zip(domain.origin, domain.shape, chunks)):
+    return None
+  separator = metadata.get('dimension_separator', '.')
+  key = separator.join(str(o // c) for o, c in zip(domain.origin, chunks))
+  chunk_path = os.path.join(path, key or '0')
+  try:
+    # Chunks equal to the fill value may not be stored at all.
+    if os.path.getsize(chunk_path) != dtype.itemsize * math.prod(chunks):
+      return None
+    return np.asarray(np.memmap(chunk_path, dtype=dtype, mode='c',
+                                shape=tuple(chunks)))
+  except OSError:
+    return None
+
+
 async def async_deserialize(
     in_sharding: sharding_impls.XLACompatibleSharding,
     tensorstore_spec: Union[ts.Spec, dict[str, Any]],
@@ -243,7 +447,30 @@ async def async_deserialize(
     byte_limiter: Optional[_LimitInFlightBytes] = None,
     context=TS_CONTEXT,
     assume_metadata: bool = False,
+    priority: int = 0,
+    use_mmap: bool = False,
 ):
+  """Reads an array from TensorStore.
+
+  Shards are admitted by `byte_limiter` in order of (`priority`, shard
+  origin), so that with a shared limiter arrays with a lower `priority` are
+  read first and shards of each array are read in storage order.
+
+  If `use_mmap` is True, shards placed on CPU devices that exactly match a
+  stored chunk of an uncompressed zarr array on the local filesystem are
+  memory-mapped instead of read, and handed to the CPU client without an
+  intermediate host copy where it can alias them. Such shards do not count
+  against `byte_limiter`. The returned array then reads the checkpoint files
+  for as long as it is alive: they may be deleted, or replaced by renaming a
+  new file over them as TensorStore does when it writes a chunk, but must not
+  be modified in place or truncated. Use `use_mmap` only for checkpoints that
+  are not rewritten in place while the restored arrays are in use.
+
+  Checkpoints written by `async_serialize(..., incremental=True)` are
+  resolved transparently: shards recorded in their sidecar files are read from
+  the earlier checkpoint that holds their data.
+  """
+  start_time = time.time()
   t = await ts.open(
       tensorstore_spec,
       open=True,
@@ -252,20 +479,55 @@ async def async_deserialize(
   )
   shape = t.shape if global_shape is None else global_shape
   new_shard_shape = in_sharding.shard_shape(tuple(shape))
+  bytes_read = 0
+  # Regions of an incremental checkpoint whose data lives in an earlier one.
+  references = [(r['region'], r['source'])
+                for r in await _read_incremental_records(tensorstore_spec,
+                                                         context)
+                if r['source'] is not None]
+  sources: dict[str, Awaitable[ts.TensorStore]] = {}
+  local_array = _local_zarr_array(tensorstore_spec) if use_mmap else None
+
+  def open_source(source_spec):
+    key = json.dumps(source_spec, sort_keys=True)
+    if key not in sources:
+      sources[key] = asyncio.ensure_future(ts.open(
+          source_spec, open=True, context=context))
+    return sources[key]
 
   async def cb(index: array.Index, device: jax.Device):
+    nonlocal bytes_read
     requested_domain = ts.IndexTransform(input_shape=shape)[index].domain
     restricted_domain = t.domain.intersect(requested_domain)
     requested_bytes = estimate_read_memory_footprint(t, restricted_domain)
+    bytes_read += requested_bytes
+    if (local_array is not None and device.platform == 'cpu' and
+        tuple(restricted_domain.origin) == tuple(requested_domain.origin) and
+        tuple(restricted_domain.shape) == tuple(requested_domain.shape) and
+        (dtype is None or np.dtype(dtype) == local_array[2]) and
+        all(_overlap(restricted_domain, region) is None
+            for region, _ in references)):
+      mapped = _mmap_chunk(*local_array, restricted_domain)
+      if mapped is not None:
+        return jax.device_put(mapped, device)
     # Limit the bytes read for every shard.
     if byte_limiter is not None:
-      await byte_limiter.wait_for_bytes(requested_bytes)
+      await byte_limiter.wait_for_bytes(
+          requested_bytes, priority=(priority, _index_origin(index)))
     # This maybe needed because the shape the array was saved with is smaller
     # than the requested shape of the array in which it will be reloaded. So
     # the extra values will be filled with 0s.
     out = np.zeros(new_shard_shape, dtype=t.dtype.numpy_dtype)
     await ts.array(out)[ts.d[:].translate_to[requested_domain.origin]][
         restricted_domain].write(t[restricted_domain])
+    for region, source_spec in references:
+      overlap = _overlap(restricted_domain, region)
+      if overlap is None:
+        continue
+      source = await open_source(source_spec)
+      bytes_read += estimate_read_memory_footprint(source, overlap)
+      await ts.array(out)[ts.d[:].translate_to[requested_domain.origin]][
+          overlap].write(source[overlap])
     if dtype is not None:
       # Cast while reloading on process to avoid 2 copies on device if the
       # casting is done on device.
@@ -285,25 +547,42 @@ async def async_deserialize(
       await byte_limiter.release_bytes(requested_bytes)
     return result
 
-  return await create_async_array_from_callback(tuple(shape), in_sharding, cb)
+  result = await create_async_array_from_callback(tuple(shape), in_sharding, cb)
+  duration = time.time() - start_time
+  jax.monitoring.record_event_duration_secs(
+      '/jax/checkpoint/read/array_duration_sec', duration)
+  jax.monitoring.record_scalar('/jax/checkpoint/read/array_bytes', bytes_read)
+  if duration > 0:
+    throughput = bytes_read / duration
+    jax.monitoring.record_scalar(
+        '/jax/checkpoint/read/array_throughput_bytes_per_sec', throughput)
+    logger.debug('Read %d bytes of %s in %.3f sec (%.3f GB/s)', bytes_read,
+                 tensorstore_spec, duration, throughput / 10**9)
+  return result
 
 
 def run_deserialization(shardings: Sequence[sharding.Sharding],
                         tensorstore_specs: Sequence[dict[str, Any]],
                         global_shapes: Optional[Sequence[array.Shape]] = None,
                         dtypes: Optional[Sequence[typing.DTypeLike]] = None,
-                        concurrent_gb: int = 32):
+                        concurrent_gb: int = 32,
+                        use_mmap: bool = False):
   concurrent_bytes = concurrent_gb * 10**9
 
   async def _run_deserializer():
     # Object should be created once per process.
     byte_limiter = _LimitInFlightBytes(concurrent_bytes)
 
-    future_arrays = jax.tree_util.tree_map(
-        partial(async_deserialize, byte_limiter=byte_limiter),
-        shardings, tensorstore_specs,
-        [None] * len(tensorstore_specs) if global_shapes is None else global_shapes,
-        [None] * len(tensorstore_specs) if dtypes is None else dtypes)
+    # Arrays are read in the order they are given, so that the first arrays
+    # become available while the rest are still being read.
+    future_arrays = [
+        async_deserialize(s, spec, shape, dtype, byte_limiter=byte_limiter,
+                          priority=i, use_mmap=use_mmap)
+        for i, (s, spec, shape, dtype) in enumerate(zip(
+            shardings, tensorstore_specs,
+            [None] * len(tensorstore_specs) if global_shapes is None else global_shapes,
+            [None] * len(tensorstore_specs) if dtypes is None else dtypes))
+    ]
     return await asyncio.gather(*future_arrays)
   return asyncio.run(_run_deserializer())
 
@@ -373,7 +652,8 @@ class GlobalAsyncCheckpointManagerBase(metaclass=abc.ABCMeta):
   def deserialize(self, shardings: Sequence[sharding.Sharding],
                   tensorstore_specs: Sequence[dict[str, Any]],
                   global_shapes: Optional[Sequence[array.Shape]] = None,
-                  dtypes: Optional[Sequence[typing.DTypeLike]] = None):
+                  dtypes: Optional[Sequence[typing.DTypeLike]] = None,
+                  use_mmap: bool = False):
     """Deserializes GDAs from TensorStore."""
 
 
@@ -477,7 +757,9 @@ class AsyncManager:
 class GlobalAsyncCheckpointManager(AsyncManager, GlobalAsyncCheckpointManagerBase):
   """Responsible for serializing GDAs via TensorStore."""
 
-  def serialize(self, arrays, tensorstore_specs, *, on_commit_callback):
+  def serialize(self, arrays, tensorstore_specs, *, on_commit_callback,
+                incremental: bool = False,
+                previous_tensorstore_specs: Optional[Sequence[Any]] = None):
     """Serializes GlobalDeviceArrays or Arrays via TensorStore asynchronously.
 
     TensorStore writes to a storage layer in 2 steps:
@@ -500,15 +782,32 @@ class GlobalAsyncCheckpointManager(AsyncManager, GlobalAsyncCheckpointManagerBas
         final directory directly and in `on_commit_callback` you write a
         success file indicating that the serialization was successful because
         GCS does not support atomic rename operations.
+      incremental: If True, records a content hash for every shard so that
+        later checkpoints can skip shards that did not change. See
+        `async_serialize`.
+      previous_tensorstore_specs: Optional TensorStore specs, at their final
+        location, of an earlier checkpoint of the same arrays written with
+        `incremental=True`. Shards unchanged since that checkpoint are not
+        written again. Entries may be None for arrays without a previous
+        checkpoint. Requires `incremental=True`.
     """
+    if previous_tensorstore_specs is not None and not incremental:
+      raise ValueError('previous_tensorstore_specs requires incremental=True.')
     logger.info('Waiting for previous serialization to finish.')
     self.wait_until_finished()
 
     commit_futures = [[] for _ in range(len(tensorstore_specs))]
+    if previous_tensorstore_specs is None:
+      previous_tensorstore_specs = [None] * len(tensorstore_specs)
 
     async def _run_serializer():
-      future_writer = jax.tree_util.tree_map(
-          async_serialize, arrays, tensorstore_specs, commit_futures)
+      future_writer = [
+          async_serialize(arr, spec, commit_future, incremental=incremental,
+                          previous_tensorstore_spec=previous_spec)
+          for arr, spec, commit_future, previous_spec in zip(
+              arrays, tensorstore_specs, commit_futures,
+              previous_tensorstore_specs)
+      ]
       return await asyncio.gather(*future_writer)
 
     asyncio.run(_run_serializer())
@@ -523,7 +822,9 @@ class GlobalAsyncCheckpointManager(AsyncManager, GlobalAsyncCheckpointManagerBas
                   tensorstore_specs: Sequence[dict[str, Any]],
                   global_shapes: Optional[Sequence[array.Shape]] = None,
                   dtypes: Optional[Sequence[typing.DTypeLike]] = None,
-                  concurrent_gb: int = 32):
+                  concurrent_gb: int = 32,
+                  use_mmap: bool = False):
     self.wait_until_finished()
     return run_deserialization(shardings, tensorstore_specs,
-                               global_shapes, dtypes, concurrent_gb)
+                               global_shapes, dtypes, concurrent_gb,
+                               use_mmap)
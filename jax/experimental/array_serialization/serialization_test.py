@@ -19,6 +19,7 @@ from functools import partial
 import os
 import pathlib
 import tracemalloc as tm
+from unittest import mock
 
 from absl.testing import absltest
 from absl.testing import parameterized
@@ -26,6 +27,7 @@ import jax
 from jax._src import test_util as jtu
 from jax import config
 from jax._src import array
+from jax._src import monitoring
 from jax.sharding import NamedSharding, GSPMDSharding
 from jax.sharding import PartitionSpec as P
 from jax.experimental.array_serialization import serialization
@@ -312,6 +314,176 @@ class CheckpointTest(jtu.JaxTestCase):
                                 "Checkpoint path should be absolute"):
       serialization.get_tensorstore_spec(path, ocdbt=True)
 
+  def test_incremental_checkpointing(self):
+    global_mesh = jtu.create_global_mesh((4, 2), ('x', 'y'))
+    inp_shape = (8, 2)
+    sharding = NamedSharding(global_mesh, P('x', 'y'))
+    num = math.prod(inp_shape)
+    data1 = np.arange(num, dtype=np.int32).reshape(inp_shape)
+    data2 = data1.copy()
+    data2[0, 0] = -1
+    make = lambda data: array.make_array_from_callback(
+        inp_shape, sharding, lambda idx: data[idx])
+
+    ckpt_dir = pathlib.Path(self.create_tempdir('ckpt').full_path)
+    tspecs = [[serialization.get_tensorstore_spec(str(ckpt_dir / f'{i}_{j}'))
+               for j in range(2)] for i in range(3)]
+    manager = serialization.GlobalAsyncCheckpointManager()
+    on_commit = lambda: None
+
+    # The first array never changes. The second changes in one shard after the
+    # first checkpoint.
+    manager.serialize([make(data1), make(data1)], tspecs[0],
+                      on_commit_callback=on_commit, incremental=True)
+    manager.wait_until_finished()
+    manager.serialize([make(data1), make(data2)], tspecs[1],
+                      on_commit_callback=on_commit, incremental=True,
+                      previous_tensorstore_specs=tspecs[0])
+    manager.wait_until_finished()
+    manager.serialize([make(data1), make(data2)], tspecs[2],
+                      on_commit_callback=on_commit, incremental=True,
+                      previous_tensorstore_specs=tspecs[1])
+    manager.wait_until_finished()
+
+    chunks = lambda path: [f for f in os.listdir(path)
+                           if not f.startswith(('.', 'jax_incremental'))]
+    self.assertLen(chunks(ckpt_dir / '0_0'), 8)
+    self.assertEmpty(chunks(ckpt_dir / '1_0'))
+    self.assertLen(chunks(ckpt_dir / '1_1'), 1)
+    self.assertEmpty(chunks(ckpt_dir / '2_0'))
+    self.assertEmpty(chunks(ckpt_dir / '2_1'))
+
+    bytes_read = []
+    def record_bytes_read(event, value):
+      if event == '/jax/checkpoint/read/array_bytes':
+        bytes_read.append(value)
+    jax.monitoring.register_scalar_listener(record_bytes_read)
+    try:
+      m1, m2 = manager.deserialize([sharding, sharding], tspecs[2])
+    finally:
+      monitoring._scalar_listeners.remove(record_bytes_read)
+    self.assertArraysEqual(np.asarray(m1), data1)
+    self.assertArraysEqual(np.asarray(m2), data2)
+    # Every shard is read from the new checkpoint, where it is missing, and
+    # from the checkpoint holding its data.
+    self.assertEqual(bytes_read, [2 * data1.nbytes] * 2)
+
+  def test_limit_in_flight_bytes_admits_in_priority_order(self):
+    admitted = []
+
+    async def read(limiter, priority):
+      await limiter.wait_for_bytes(6, priority=priority)
+      admitted.append(priority)
+      await asyncio.sleep(0)
+      await limiter.release_bytes(6)
+
+    async def run():
+      limiter = serialization._LimitInFlightBytes(10)
+      # Only one read fits at a time, so reads are admitted one by one.
+      await asyncio.gather(*[read(limiter, p) for p in
+                             [(1, (0,)), (0, (8,)), (1, (4,)), (0, (0,))]])
+
+    asyncio.run(run())
+    self.assertEqual(admitted, [(1, (0,)), (0, (0,)), (0, (8,)), (1, (4,))])
+
+  def test_deserialize_in_priority_order(self):
+    global_mesh = jtu.create_global_mesh((4, 2), ('x', 'y'))
+    inp_shape = (8, 2)
+    sharding = NamedSharding(global_mesh, P('x', 'y'))
+    num = math.prod(inp_shape)
+    data = np.arange(num, dtype=np.int32).reshape(inp_shape)
+    arrays = [array.make_array_from_callback(inp_shape, sharding,
+                                             lambda idx: data[idx] + i)
+              for i in range(3)]
+    ckpt_dirs = [str(self.create_tempdir(f'ckpt{i}').full_path)
+                 for i in range(3)]
+    tspecs = [serialization.get_tensorstore_spec(d) for d in ckpt_dirs]
+    serialization.run_serialization(arrays, tspecs)
+
+    restored = serialization.run_deserialization([sharding] * 3, tspecs,
+                                                 concurrent_gb=1)
+    for i, r in enumerate(restored):
+      self.assertArraysEqual(np.asarray(r), data + i)
+
+  @jtu.skip_on_devices('gpu', 'tpu')
+  def test_deserialize_with_mmap(self):
+    global_mesh = jtu.create_global_mesh((4, 2), ('x', 'y'))
+    inp_shape = (8, 2)
+    sharding = NamedSharding(global_mesh, P('x', 'y'))
+    data = np.arange(math.prod(inp_shape), dtype=np.float32).reshape(inp_shape)
+    arr = array.make_array_from_callback(inp_shape, sharding,
+                                         lambda idx: data[idx])
+    raw_spec = serialization.get_tensorstore_spec(
+        str(self.create_tempdir('raw').full_path))
+    raw_spec['metadata'] = {'compressor': None, 'shape': inp_shape,
+                            'chunks': (2, 1), 'dtype': '<f4'}
+    zstd_spec = serialization.get_tensorstore_spec(
+        str(self.create_tempdir('zstd').full_path))
+    serialization.run_serialization([arr, arr], [raw_spec, zstd_spec])
+
+    mapped = []
+    mmap_chunk = serialization._mmap_chunk
+    def counting_mmap_chunk(*args):
+      result = mmap_chunk(*args)
+      mapped.append(result is not None)
+      return result
+
+    with mock.patch.object(serialization, '_mmap_chunk', counting_mmap_chunk):
+      raw, zstd = serialization.run_deserialization(
+          [sharding, sharding], [raw_spec, zstd_spec], use_mmap=True)
+    self.assertArraysEqual(np.asarray(raw), data)
+    self.assertArraysEqual(np.asarray(zstd), data)
+    # Only the uncompressed checkpoint can be mapped.
+    self.assertEqual(mapped, [True] * 8)
+
+    # Shards that do not match a stored chunk are read as usual.
+    mapped.clear()
+    with mock.patch.object(serialization, '_mmap_chunk', counting_mmap_chunk):
+      out, = serialization.run_deserialization(
+          [NamedSharding(global_mesh, P('x'))], [raw_spec], use_mmap=True)
+    self.assertArraysEqual(np.asarray(out), data)
+    self.assertNotIn(True, mapped)
+
+  @jtu.skip_on_devices('gpu', 'tpu')
+  def test_deserialize_with_mmap_aliases_private_mapping(self):
+    sharding = jax.sharding.SingleDeviceSharding(jax.devices()[0])
+    data = np.arange(16, dtype=np.float32).reshape((8, 2))
+    spec = serialization.get_tensorstore_spec(
+        str(self.create_tempdir('ckpt').full_path))
+    spec['metadata'] = {'compressor': None, 'shape': data.shape,
+                        'chunks': data.shape, 'dtype': '<f4'}
+    serialization.run_serialization([jax.device_put(data, sharding)], [spec])
+
+    mapped = []
+    mmap_chunk = serialization._mmap_chunk
+    def recording_mmap_chunk(*args):
+      mapped.append(mmap_chunk(*args))
+      return mapped[-1]
+
+    with mock.patch.object(serialization, '_mmap_chunk', recording_mmap_chunk):
+      out, = serialization.run_deserialization([sharding], [spec],
+                                               use_mmap=True)
+    self.assertLen(mapped, 1)
+    # The restored array is backed by the mapping, without a copy.
+    self.assertEqual(out.addressable_data(0).unsafe_buffer_pointer(),
+                     mapped[0].ctypes.data)
+
+    # Writes to the mapping are private to this process.
+    mapped[0][0, 0] = -1
+    expected = data.copy()
+    expected[0, 0] = -1
+    self.assertArraysEqual(np.asarray(out), expected)
+    restored, = serialization.run_deserialization([sharding], [spec])
+    self.assertArraysEqual(np.asarray(restored), data)
+
+    # Writing the checkpoint again replaces the chunk file instead of
+    # modifying it in place, so the restored array does not change.
+    serialization.run_serialization([jax.device_put(data + 1, sharding)],
+                                    [spec])
+    self.assertArraysEqual(np.asarray(out), expected)
+    restored, = serialization.run_deserialization([sharding], [spec])
+    self.assertArraysEqual(np.asarray(restored), data + 1)
+
 
 if __name__ == '__main__':
   absltest.main(testLoader=jtu.JaxTestLoader())
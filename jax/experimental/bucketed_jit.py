@@ -0,0 +1,247 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Shape-bucketed :func:`jax.jit`, which pads inputs to a few fixed sizes.
+
+A jitted function is traced and compiled again for every new input shape. When
+some dimensions vary from call to call, e.g. the sequence length of serving
+requests, :func:`bucketed_jit` pads those dimensions up to a bucket size
+chosen by a policy, so that the number of executables is bounded by the number
+of buckets. The true lengths are passed to the function as runtime values, and
+outputs can be sliced back to them::
+
+  def score(tokens, *, lengths):
+    mask = jnp.arange(tokens.shape[1]) < lengths["seq"]
+    return model(tokens, mask)
+
+  f = bucketed_jit(score, in_axes=({1: "seq"},), out_axes={1: "seq"},
+                   buckets=powers_of_two(min_size=16))
+  f(np.zeros((8, 37), np.int32))  # Runs the executable for length 64.
+"""
+
+import dataclasses
+import functools
+import threading
+from typing import Any, Callable, Optional, Sequence, Union
+
+import numpy as np
+
+import jax
+import jax.numpy as jnp
+from jax import lax
+from jax._src.api_util import resolve_argnums, shaped_abstractify
+from jax._src.util import safe_map, safe_zip
+from jax.tree_util import tree_flatten, tree_leaves, tree_map
+
+map = safe_map
+zip = safe_zip
+
+BucketPolicy = Callable[[int], int]
+Axes = Optional[dict[int, str]]
+
+
+def powers_of_two(min_size: int = 1,
+                  max_size: Optional[int] = None) -> BucketPolicy:
+  """Returns a policy that rounds sizes up to a power of two.
+
+  Args:
+    min_size: the smallest bucket size; smaller sizes are padded up to it.
+    max_size: if given, sizes larger than this raise an error.
+  """
+  def policy(size: int) -> int:
+    if max_size is not None and size > max_size:
+      raise ValueError(f"Size {size} exceeds the largest bucket {max_size}.")
+    bucket = max(min_size, 1 << max(size - 1, 0).bit_length())
+    return bucket if max_size is None else min(bucket, max_size)
+  return policy
+
+
+def bucket_sizes(sizes: Sequence[int]) -> BucketPolicy:
+  """Returns a policy that rounds sizes up to the next of `sizes`."""
+  sorted_sizes = sorted(sizes)
+  if not sorted_sizes:
+    raise ValueError("bucket_sizes requires at least one size.")
+
+  def policy(size: int) -> int:
+    for bucket in sorted_sizes:
+      if size <= bucket:
+        return bucket
+    raise ValueError(
+        f"Size {size} exceeds the largest bucket {sorted_sizes[-1]}.")
+  return policy
+
+
+@dataclasses.dataclass
+class BucketStats:
+  """Usage of a bucket of a :func:`bucketed_jit` function.
+
+  Attributes:
+    calls: the number of calls padded to this bucket.
+    executables: the number of distinct signatures, i.e. padded shapes, dtypes
+      and static arguments, with which the function was called in this bucket.
+      Each needs its own executable, so more than one means that something
+      other than the bucketed dimensions, e.g. another dimension or a dtype,
+      also varied between calls.
+  """
+  calls: int = 0
+  executables: int = 0
+
+
+def bucketed_jit(fun: Callable,
+                 in_axes: Sequence[Axes],
+                 *,
+                 buckets: Union[BucketPolicy, dict[str, BucketPolicy]] = powers_of_two(),
+                 out_axes: Union[Axes, Sequence[Axes]] = None,
+                 pad_value: Any = 0,
+                 lengths_argname: Optional[str] = "lengths",
+                 **jit_kwargs) -> Callable:
+  """Jits `fun`, padding chosen dimensions of its inputs to bucket sizes.
+
+  Args:
+    fun: the function to jit.
+    in_axes: one entry per positional argument of `fun`: either None, or a
+      dict mapping axes to the names of the dimensions to bucket. The axes
+      apply to every array in the argument's pytree. Dimensions with the same
+      name must have the same size in every call.
+    buckets: the bucketing policy, or a dict mapping dimension names to
+      policies. A policy maps a size to the size it is padded to; see
+      :func:`powers_of_two` and :func:`bucket_sizes`.
+    out_axes: either None, a dict mapping axes to dimension names that applies
+      to every output, or a sequence with one such entry per element of the
+      output tuple. Outputs are sliced back to the true size of the named
+      dimensions. By default, outputs are returned padded.
+    pad_value: the value inputs are padded with.
+    lengths_argname: the keyword argument through which `fun` receives a dict
+      mapping dimension names to their true sizes, as int32 scalars. None to
+      not pass them.
+    **jit_kwargs: passed to :func:`jax.jit`.
+
+  Returns:
+    The bucketed function. Its ``bucket_stats()`` method returns a dict mapping
+    each bucket used so far, as a tuple of ``(name, size)`` pairs, to its
+    :class:`BucketStats`.
+
+  NumPy inputs are padded on the host. Inputs that are already
+  :class:`jax.Array` s are padded on device, and outputs are sliced on device,
+  which compiles a small computation per distinct shape.
+  """
+  in_axes = tuple(in_axes)
+  jitted = jax.jit(fun, **jit_kwargs)
+  _, static_argnums, static_argnames = resolve_argnums(
+      fun, (), jit_kwargs.get("static_argnums"),
+      jit_kwargs.get("static_argnames"))
+  stats: dict[tuple[tuple[str, int], ...], BucketStats] = {}
+  signatures: dict[tuple[tuple[str, int], ...], set[Any]] = {}
+  stats_lock = threading.Lock()
+
+  def policy_for(name: str) -> BucketPolicy:
+    if isinstance(buckets, dict):
+      if name not in buckets:
+        raise ValueError(f"No bucketing policy for dimension {name!r}.")
+      return buckets[name]
+    return buckets
+
+  def signature(args, kwargs):
+    static_nums = {i % len(args) for i in static_argnums
+                   if -len(args) <= i < len(args)}
+    parts = []
+    for i, arg in enumerate(args):
+      parts.append(("static", arg) if i in static_nums else _abstractify(arg))
+    for name, arg in sorted(kwargs.items()):
+      parts.append((name, arg) if name in static_argnames
+                   else (name, _abstractify(arg)))
+    return tuple(parts)
+
+  @functools.wraps(fun)
+  def bucketed_fun(*args, **kwargs):
+    if len(args) != len(in_axes):
+      raise ValueError(
+          f"bucketed_jit in_axes has {len(in_axes)} entries, but the function "
+          f"was called with {len(args)} positional arguments.")
+    lengths: dict[str, int] = {}
+    for arg, axes in zip(args, in_axes):
+      for x in tree_leaves(arg) if axes else ():
+        for axis, name in axes.items():
+          size = np.shape(x)[axis]
+          if lengths.setdefault(name, size) != size:
+            raise ValueError(
+                f"Inconsistent sizes for bucketed dimension {name!r}: "
+                f"{lengths[name]} and {size}.")
+    sizes = {name: policy_for(name)(size) for name, size in lengths.items()}
+    padded_args = [
+        arg if not axes else
+        tree_map(lambda x, axes=axes: _pad(x, axes, sizes, pad_value), arg)
+        for arg, axes in zip(args, in_axes)]
+    if lengths_argname is not None:
+      kwargs[lengths_argname] = {name: np.int32(size)
+                                 for name, size in lengths.items()}
+
+    out = jitted(*padded_args, **kwargs)
+    bucket = tuple(sorted(sizes.items()))
+    sig = signature(padded_args, kwargs)
+    with stats_lock:
+      bucket_stats = stats.setdefault(bucket, BucketStats())
+      bucket_signatures = signatures.setdefault(bucket, set())
+      bucket_stats.calls += 1
+      if sig not in bucket_signatures:
+        bucket_signatures.add(sig)
+        bucket_stats.executables += 1
+
+    if out_axes is None:
+      return out
+    if isinstance(out_axes, dict):
+      return tree_map(lambda x: _slice(x, out_axes, lengths), out)
+    if not isinstance(out, (tuple, list)) or len(out) != len(out_axes):
+      raise ValueError(
+          "bucketed_jit out_axes must be a dict, or have one entry per "
+          f"element of the output tuple, got {out_axes}.")
+    return type(out)(
+        out_x if not axes else
+        tree_map(lambda x, axes=axes: _slice(x, axes, lengths), out_x)
+        for out_x, axes in zip(out, out_axes))
+
+  def bucket_stats() -> dict[tuple[tuple[str, int], ...], BucketStats]:
+    with stats_lock:
+      return {k: dataclasses.replace(v) for k, v in stats.items()}
+
+  bucketed_fun.bucket_stats = bucket_stats  # type: ignore
+  return bucketed_fun
+
+
+def _abstractify(tree):
+  leaves, treedef = tree_flatten(tree)
+  return treedef, tuple(shaped_abstractify(x) for x in leaves)
+
+
+def _pad(x, axes: dict[int, str], sizes: dict[str, int], pad_value):
+  ndim = np.ndim(x)
+  pad_width = [(0, 0)] * ndim
+  for axis, name in axes.items():
+    axis = axis % ndim
+    pad_width[axis] = (0, sizes[name] - np.shape(x)[axis])
+  if not any(high for _, high in pad_width):
+    return x
+  if isinstance(x, jax.Array):
+    return jnp.pad(x, pad_width, constant_values=pad_value)
+  return np.pad(np.asarray(x), pad_width, constant_values=pad_value)
+
+
+def _slice(x, axes: dict[int, str], lengths: dict[str, int]):
+  for axis, name in axes.items():
+    if name not in lengths:
+      raise ValueError(f"Output dimension {name!r} is not bucketed.")
+    axis = axis % np.ndim(x)
+    if np.shape(x)[axis] != lengths[name]:
+      x = lax.slice_in_dim(x, 0, lengths[name], axis=axis)
+  return x
@@ -0,0 +1,177 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Lists, inspects and prunes entries of a persistent compilation cache.
+
+For example::
+
+  python -m jax.experimental.compilation_cache.cache_tool \\
+      --cache_dir=/mnt/jax_cache list --module='jit_train_step.*'
+  python -m jax.experimental.compilation_cache.cache_tool \\
+      --cache_dir=/mnt/jax_cache prune --older_than=7d
+
+Only caches on the local filesystem are supported.
+"""
+
+import argparse
+import dataclasses
+import os
+import re
+import time
+from typing import Optional, Sequence
+
+from jax._src import compilation_cache as cc
+from jax._src.gfile_cache import _TEMP_PREFIX
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheEntry:
+  """A persistent compilation cache entry.
+
+  Attributes:
+    key: the cache key, which is also the file name.
+    module_name: the name of the compiled module, e.g. ``jit_f``.
+    size_bytes: the size of the entry on disk.
+    last_access: the time the entry was last written or read, in seconds since
+      the epoch.
+    compile_time_secs: the time the executable originally took to compile.
+  """
+  key: str
+  module_name: str
+  size_bytes: int
+  last_access: float
+  compile_time_secs: float
+
+
+def _read_entry(cache_dir: str, key: str) -> Optional[CacheEntry]:
+  path = os.path.join(cache_dir, key)
+  try:
+    st = os.stat(path)
+    with open(path, "rb") as f:
+      header = f.read(cc._ENTRY_HEADER.size)
+  except FileNotFoundError:
+    return None
+  compile_time_secs = (cc.read_entry_compile_time(header)
+                       if len(header) == cc._ENTRY_HEADER.size else 0.0)
+  return CacheEntry(key, cc.module_name_from_key(key), st.st_size,
+                    st.st_mtime, compile_time_secs)
+
+
+def list_entries(cache_dir: str,
+                 module_regex: Optional[str] = None,
+                 older_than_secs: Optional[float] = None) -> list[CacheEntry]:
+  """Returns the entries in `cache_dir`, least recently used first.
+
+  Args:
+    cache_dir: the persistent compilation cache directory.
+    module_regex: if given, only entries whose module name fully matches this
+      regular expression are returned.
+    older_than_secs: if given, only entries last used at least this many
+      seconds ago are returned.
+  """
+  now = time.time()
+  entries = []
+  for key in os.listdir(cache_dir):
+    if key.startswith(_TEMP_PREFIX):
+      continue
+    entry = _read_entry(cache_dir, key)
+    if entry is None:
+      continue
+    if module_regex is not None and not re.fullmatch(module_regex,
+                                                     entry.module_name):
+      continue
+    if older_than_secs is not None and now - entry.last_access < older_than_secs:
+      continue
+    entries.append(entry)
+  entries.sort(key=lambda e: e.last_access)
+  return entries
+
+
+def prune_entries(cache_dir: str,
+                  module_regex: Optional[str] = None,
+                  older_than_secs: Optional[float] = None,
+                  dry_run: bool = False) -> list[CacheEntry]:
+  """Removes the entries selected as in `list_entries` and returns them."""
+  entries = list_entries(cache_dir, module_regex, older_than_secs)
+  if not dry_run:
+    for entry in entries:
+      try:
+        os.remove(os.path.join(cache_dir, entry.key))
+      except FileNotFoundError:
+        pass
+  return entries
+
+
+_AGE_UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def _parse_age(age: str) -> float:
+  m = re.fullmatch(r"(\d+(?:\.\d*)?)([smhd]?)", age)
+  if m is None:
+    raise argparse.ArgumentTypeError(
+        f"Invalid age {age!r}, expected e.g. '90s', '30m', '12h' or '7d'.")
+  return float(m.group(1)) * _AGE_UNITS[m.group(2) or "s"]
+
+
+def _format_entry(entry: CacheEntry) -> str:
+  last_access = time.strftime("%Y-%m-%d %H:%M:%S",
+                              time.localtime(entry.last_access))
+  return (f"{entry.key}  {entry.size_bytes:>12,d}B  {last_access}  "
+          f"compile={entry.compile_time_secs:.2f}s")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--cache_dir", required=True, type=str,
+                      help="Persistent compilation cache directory.")
+  subparsers = parser.add_subparsers(dest="command", required=True)
+  for name in ["list", "prune"]:
+    subparser = subparsers.add_parser(name)
+    subparser.add_argument("--module", default=None, type=str,
+                           help="Regular expression matching module names.")
+    subparser.add_argument("--older_than", default=None, type=_parse_age,
+                           help="Only entries last used at least this long "
+                                "ago, e.g. '12h' or '7d'.")
+    if name == "prune":
+      subparser.add_argument("--dry_run", action="store_true",
+                             help="Print the entries without removing them.")
+  inspect_parser = subparsers.add_parser("inspect")
+  inspect_parser.add_argument("key", type=str, help="Cache key to inspect.")
+  args = parser.parse_args(argv)
+
+  if args.command == "inspect":
+    entry = _read_entry(args.cache_dir, args.key)
+    if entry is None:
+      print(f"No entry {args.key} in {args.cache_dir}")
+      return 1
+    for field in dataclasses.fields(entry):
+      print(f"{field.name}: {getattr(entry, field.name)}")
+    return 0
+
+  if args.command == "list":
+    entries = list_entries(args.cache_dir, args.module, args.older_than)
+    verb = "Found"
+  else:
+    entries = prune_entries(args.cache_dir, args.module, args.older_than,
+                            args.dry_run)
+    verb = "Would remove" if args.dry_run else "Removed"
+  for entry in entries:
+    print(_format_entry(entry))
+  total = sum(e.size_bytes for e in entries)
+  print(f"{verb} {len(entries)} entries, {total:,d} bytes.")
+  return 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
@@ -13,7 +13,11 @@
 # limitations under the License.
 
 from jax._src.compilation_cache import (
+  CacheStats as CacheStats,
+  flush_pending_writes as flush_pending_writes,
+  get_stats as get_stats,
   is_initialized as is_initialized,
   initialize_cache as initialize_cache,
   reset_cache as reset_cache,
+  reset_stats as reset_stats,
 )
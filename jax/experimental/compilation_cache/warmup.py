@@ -0,0 +1,227 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Populates the persistent compilation cache ahead of time.
+
+Given a manifest of jitted entry points and the shapes, dtypes and shardings
+they will be called with, ``warm_cache`` lowers and compiles each entry so that
+processes started later with the same cache directory hit the cache instead of
+compiling. For example::
+
+  python -m jax.experimental.compilation_cache.warmup \\
+      --cache_dir=/mnt/jax_cache manifest.json
+
+where ``manifest.json`` looks like::
+
+  {
+    "mesh": {"shape": [4, 2], "axis_names": ["data", "model"]},
+    "entries": [
+      {
+        "function": "my_project.model:predict",
+        "args": [
+          {"params": {"w": {"shape": [512, 512], "dtype": "float32",
+                            "spec": [null, "model"]}}},
+          {"shape": [64, 512], "dtype": "float32", "spec": ["data", null]}
+        ]
+      }
+    ]
+  }
+
+Leaves of ``args`` and ``kwargs`` are objects with ``shape`` and ``dtype``
+keys, and optionally a ``spec``, which is turned into a
+:class:`jax.sharding.NamedSharding` over ``mesh``. ``function`` is a
+``module:attribute`` path to either a jitted function or a plain function,
+which is wrapped in :func:`jax.jit`.
+"""
+
+import argparse
+import concurrent.futures
+import dataclasses
+import importlib
+import json
+import logging
+import time
+from typing import Any, Callable, Optional, Sequence, Union
+
+import jax
+from jax._src import compilation_cache as cc
+from jax.experimental import mesh_utils
+from jax._src.config import persistent_cache_min_compile_time_secs
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class WarmupEntry:
+  """An entry point to compile.
+
+  Attributes:
+    fun: a jitted or plain function, or a ``module:attribute`` path to one.
+    args: pytree of :class:`jax.ShapeDtypeStruct` describing the positional
+      arguments. Shardings are taken from the ``sharding`` attribute.
+    kwargs: pytree of :class:`jax.ShapeDtypeStruct` describing the keyword
+      arguments.
+  """
+  fun: Union[str, Callable]
+  args: Sequence[Any] = ()
+  kwargs: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+  @property
+  def name(self) -> str:
+    if isinstance(self.fun, str):
+      return self.fun
+    return getattr(self.fun, "__name__", repr(self.fun))
+
+
+@dataclasses.dataclass(frozen=True)
+class WarmupResult:
+  name: str
+  elapsed_secs: float
+  error: Optional[Exception] = None
+
+
+def _import_function(path: str) -> Callable:
+  module_name, sep, attr_path = path.partition(":")
+  if not sep:
+    module_name, _, attr_path = path.rpartition(".")
+  if not module_name or not attr_path:
+    raise ValueError(
+        f"Expected a function path of the form 'module:attribute', got {path}")
+  obj = importlib.import_module(module_name)
+  for attr in attr_path.split("."):
+    obj = getattr(obj, attr)
+  return obj
+
+
+def _compile_entry(entry: WarmupEntry) -> WarmupResult:
+  start = time.monotonic()
+  try:
+    fun = _import_function(entry.fun) if isinstance(entry.fun, str) else entry.fun
+    if not hasattr(fun, "lower"):
+      fun = jax.jit(fun)
+    # Configuration is thread-local, so this has to be set in the worker.
+    with persistent_cache_min_compile_time_secs(0):
+      fun.lower(*entry.args, **entry.kwargs).compile()
+  except Exception as ex:
+    logger.warning("Failed to compile %s: %s: %s", entry.name,
+                   type(ex).__name__, ex)
+    return WarmupResult(entry.name, time.monotonic() - start, ex)
+  elapsed = time.monotonic() - start
+  logger.info("Compiled %s in %.2f sec", entry.name, elapsed)
+  return WarmupResult(entry.name, elapsed)
+
+
+def warm_cache(entries: Sequence[WarmupEntry],
+               cache_dir: Optional[str] = None,
+               num_threads: int = 4) -> list[WarmupResult]:
+  """Compiles `entries`, writing the executables to the compilation cache.
+
+  Compilations run concurrently on `num_threads` threads. XLA compilation
+  releases the GIL, and threads, unlike processes, can share the accelerators
+  attached to this host.
+
+  Args:
+    entries: the entry points to compile.
+    cache_dir: the persistent compilation cache directory. If None, the cache
+      must already have been initialized.
+    num_threads: the number of entries compiled concurrently.
+
+  Returns:
+    A result per entry, in the same order as `entries`. Entries that failed to
+    compile have their exception in `error`.
+  """
+  if cache_dir is not None:
+    cc.initialize_cache(cache_dir)
+  if not cc.is_initialized():
+    raise ValueError("warm_cache requires a cache_dir or an initialized "
+                     "persistent compilation cache.")
+  with concurrent.futures.ThreadPoolExecutor(
+      max_workers=num_threads,
+      thread_name_prefix="jax_compilation_cache_warmup") as executor:
+    results = list(executor.map(_compile_entry, entries))
+  cc.flush_pending_writes()
+  return results
+
+
+def _parse_args(tree, mesh: Optional[jax.sharding.Mesh]):
+  if isinstance(tree, dict) and "shape" in tree and "dtype" in tree:
+    sharding = None
+    if "spec" in tree:
+      if mesh is None:
+        raise ValueError("Manifest leaves with a 'spec' require a 'mesh'.")
+      sharding = jax.sharding.NamedSharding(
+          mesh, jax.sharding.PartitionSpec(*tree["spec"]))
+    return jax.ShapeDtypeStruct(tuple(tree["shape"]), np.dtype(tree["dtype"]),
+                                sharding=sharding)
+  if isinstance(tree, dict):
+    return {k: _parse_args(v, mesh) for k, v in tree.items()}
+  if isinstance(tree, list):
+    return [_parse_args(v, mesh) for v in tree]
+  raise ValueError(f"Unexpected value in warmup manifest: {tree!r}")
+
+
+def load_manifest(manifest: Union[str, dict[str, Any]]) -> list[WarmupEntry]:
+  """Returns the entries of a JSON manifest, given as a path or parsed dict.
+
+  See the module docstring for the manifest format.
+  """
+  if isinstance(manifest, str):
+    with open(manifest) as f:
+      manifest = json.load(f)
+  assert isinstance(manifest, dict)
+  mesh = None
+  if "mesh" in manifest:
+    mesh = _make_mesh(manifest["mesh"])
+  return [
+      WarmupEntry(fun=e["function"],
+                  args=tuple(_parse_args(list(e.get("args", [])), mesh)),
+                  kwargs=_parse_args(dict(e.get("kwargs", {})), mesh))
+      for e in manifest["entries"]
+  ]
+
+
+def _make_mesh(mesh_spec: dict[str, Any]) -> jax.sharding.Mesh:
+  devices = mesh_utils.create_device_mesh(mesh_spec["shape"])
+  return jax.sharding.Mesh(devices, tuple(mesh_spec["axis_names"]))
+
+
+_DESCRIPTION = """
+Compiles the jitted entry points listed in a JSON manifest and writes them to
+the persistent compilation cache, so that processes started later with the
+same cache directory do not need to compile them.
+"""
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+  parser = argparse.ArgumentParser(description=_DESCRIPTION)
+  parser.add_argument("manifest", help="Path to the JSON manifest.", type=str)
+  parser.add_argument("--cache_dir", required=True, type=str,
+                      help="Persistent compilation cache directory.")
+  parser.add_argument("--num_threads", default=4, type=int,
+                      help="Number of entries compiled concurrently.")
+  args = parser.parse_args(argv)
+  logging.basicConfig(level=logging.INFO)
+  results = warm_cache(load_manifest(args.manifest), args.cache_dir,
+                       args.num_threads)
+  num_failed = sum(r.error is not None for r in results)
+  for r in results:
+    status = "FAILED" if r.error is not None else "ok"
+    print(f"{r.name}: {status} ({r.elapsed_secs:.2f}s)")
+  print(f"Compiled {len(results) - num_failed}/{len(results)} entries.")
+  return 1 if num_failed else 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
@@ -13,8 +13,11 @@
 # limitations under the License.
 """Utilities for synchronizing and communication across multiple hosts."""
 
+import base64
 from functools import partial, lru_cache
-from typing import Optional
+import itertools
+import math
+from typing import Optional, Sequence
 import zlib
 
 from typing import Any
@@ -22,6 +25,9 @@ import jax
 import jax.numpy as jnp
 from jax.tree_util import tree_flatten, tree_map, tree_unflatten
 from jax._src import core
+from jax._src import dtypes
+from jax._src.config import config
+from jax._src.config import multihost_kv_store_max_bytes
 from jax._src.interpreters import ad
 from jax._src.interpreters import batching
 from jax._src.interpreters import mlir
@@ -41,9 +47,133 @@ def _psum(x: Any) -> Any:
   return jax.tree_map(partial(jnp.sum, axis=0), x)
 
 
+# Small pytrees are exchanged through the key-value store of the distributed
+# runtime client: each process writes its data under a key unique to the
+# collective, reads the keys of the others, and the keys are deleted once every
+# process has passed a barrier. Every value goes through the coordination
+# service, so the bytes moved grow with the number of processes; larger pytrees
+# use device collectives, which XLA runs as ring or tree algorithms.
+
+_KV_TIMEOUT_MS = 5 * 60 * 1000
+_kv_collective_ids = itertools.count()
+
+
+def _kv_client():
+  """Returns the distributed runtime client if it supports the host path.
+
+  The host path identifies processes by their `jax.distributed.initialize`
+  process ids, so that it also works when the backend does not span processes,
+  e.g. when several CPU processes run on one machine.
+  """
+  client = distributed.global_state.client
+  if client is None or distributed.global_state.num_processes == 1:
+    return None
+  if not all(hasattr(client, name) for name in (
+      "key_value_set", "blocking_key_value_get", "wait_at_barrier")):
+    return None
+  return client
+
+
+def _kv_host_arrays(leaves) -> Optional[list[np.ndarray]]:
+  """Returns `leaves` as host arrays if they are small enough for the host path.
+
+  The arrays have the dtypes a device computation would give them. The size
+  is computed before any leaf is copied to the host, so that large device
+  arrays, which take the device path, are not copied for nothing.
+  """
+  max_bytes = config.jax_multihost_kv_store_max_bytes
+  if max_bytes <= 0:
+    return None
+  if any(isinstance(x, array.ArrayImpl) and not x.is_fully_addressable
+         for x in leaves):
+    return None
+  # Leaves without a shape and dtype, e.g. Python scalars, are cheap to
+  # convert.
+  leaves = [x if hasattr(x, "shape") and hasattr(x, "dtype") else np.asarray(x)
+            for x in leaves]
+  num_bytes = sum(
+      math.prod(x.shape) * dtypes.canonicalize_dtype(x.dtype).itemsize
+      for x in leaves)
+  if num_bytes > max_bytes:
+    return None
+  arrays = [np.asarray(x) for x in leaves]
+  return [x.astype(dtypes.canonicalize_dtype(x.dtype), copy=False)
+          for x in arrays]
+
+
+def _kv_encode(arrays: Sequence[np.ndarray]) -> str:
+  return base64.b64encode(
+      b"".join(np.ascontiguousarray(x).tobytes() for x in arrays)
+  ).decode("ascii")
+
+
+def _kv_decode(value: str, like: Sequence[np.ndarray]) -> list[np.ndarray]:
+  """Decodes arrays with the shapes and dtypes of `like`."""
+  data = base64.b64decode(value)
+  expected_bytes = sum(x.nbytes for x in like)
+  if len(data) != expected_bytes:
+    raise ValueError(
+        "Received data of a different size than expected; the inputs of "
+        "multihost_utils collectives must have the same shapes and dtypes on "
+        f"all processes. Expected {expected_bytes} bytes, got {len(data)}.")
+  out, offset = [], 0
+  for x in like:
+    out.append(np.frombuffer(data, x.dtype, x.size, offset).reshape(x.shape))
+    offset += x.nbytes
+  return out
+
+
+def _kv_release(client, key_prefix: str, owned_keys: Sequence[str]) -> None:
+  # Once every process has passed the barrier, all reads of this collective
+  # are done and its keys can be deleted.
+  client.wait_at_barrier(f"{key_prefix}/done", _KV_TIMEOUT_MS)
+  if hasattr(client, "key_value_delete"):
+    for key in owned_keys:
+      client.key_value_delete(key)
+
+
+def _kv_broadcast(client, key_prefix: str, is_source: bool,
+                  arrays: Sequence[np.ndarray]) -> list[np.ndarray]:
+  """Broadcasts `arrays` from the single source process to all the others."""
+  key = f"{key_prefix}/value"
+  if is_source:
+    client.key_value_set(key, _kv_encode(arrays))
+    out = list(arrays)
+  else:
+    out = _kv_decode(client.blocking_key_value_get(key, _KV_TIMEOUT_MS), arrays)
+  _kv_release(client, key_prefix, [key] if is_source else [])
+  return out
+
+
+def _kv_allgather(client, key_prefix: str, process_id: int,
+                  num_processes: int,
+                  arrays: Sequence[np.ndarray]) -> list[list[np.ndarray]]:
+  """Returns the `arrays` of every process, indexed by process id."""
+  key = f"{key_prefix}/{process_id}"
+  client.key_value_set(key, _kv_encode(arrays))
+  gathered = []
+  for i in range(num_processes):
+    if i == process_id:
+      gathered.append(list(arrays))
+    else:
+      gathered.append(_kv_decode(client.blocking_key_value_get(
+          f"{key_prefix}/{i}", _KV_TIMEOUT_MS), arrays))
+  _kv_release(client, key_prefix, [key])
+  return gathered
+
+
+def _kv_key_prefix(name: str) -> str:
+  return f"jax_multihost_utils/{name}/{next(_kv_collective_ids)}"
+
+
 def broadcast_one_to_all(in_tree: Any, is_source: Optional[bool] = None) -> Any:
   """Broadcast data from a source host (host 0 by default) to all other hosts.
 
+  If the distributed system is initialized, ``is_source`` is not given and the
+  pytree is at most ``jax_multihost_kv_store_max_bytes`` large, the data is
+  broadcast through the key-value store of the distributed runtime instead of
+  a device computation.
+
   Args:
     in_tree: pytree of arrays - each array *must* have the same shape across the
       hosts.
@@ -55,6 +185,16 @@ def broadcast_one_to_all(in_tree: Any, is_source: Optional[bool] = None) -> Any:
     A pytree matching in_tree where the leaves now all contain the data from the
     first host.
   """
+  client = _kv_client()
+  if client is not None and is_source is None:
+    leaves, treedef = tree_flatten(in_tree)
+    arrays = _kv_host_arrays(leaves)
+    if arrays is not None:
+      return tree_unflatten(treedef, _kv_broadcast(
+          client, _kv_key_prefix("broadcast"),
+          distributed.global_state.process_id == 0,
+          arrays))
+
   if is_source is None:
     is_source = jax.process_index() == 0
 
@@ -80,10 +220,80 @@ def broadcast_one_to_all(in_tree: Any, is_source: Optional[bool] = None) -> Any:
   return jax.tree_map(post_jit, out_tree)
 
 
-def sync_global_devices(name: str):
-  """Creates a barrier across all hosts/devices."""
+# Calls to sync_global_devices, numbered in the order they are made. All
+# processes make the same calls in the same order, so the numbers match.
+_sync_ids = itertools.count()
+
+
+def _host_barrier(client, barrier_id: str, name: str,
+                  timeout_secs: float) -> None:
+  try:
+    client.wait_at_barrier(barrier_id, int(timeout_secs * 1000))
+  except RuntimeError as e:
+    raise RuntimeError(
+        f"sync_global_devices('{name}') failed: not all processes reached the "
+        f"barrier within {timeout_secs} seconds. All processes must call "
+        "sync_global_devices with the same names in the same order.") from e
+
+
+def _host_sync(client, sync_id: int, process_id: int, num_processes: int,
+               name: str, timeout_secs: float) -> None:
+  """Waits for all processes at a barrier, then checks they used `name`.
+
+  The barrier id depends only on `sync_id`, a count of the calls so far shared
+  by all names, since a barrier of the coordination service can only be passed
+  once, and so that processes called with different names still meet at the
+  barrier and fail fast. Every process publishes the CRC32 of its name before
+  reaching the barrier. Process 0 then compares the hashes of all the others
+  with its own, and the others compare theirs with that of process 0, so that
+  a mismatch raises on every process. Each process also deletes its key of
+  the previous call, which has been read by the time all processes reach this
+  barrier.
+  """
+  prefix = f"jax_sync_global_devices/{sync_id}"
+  name_hash = str(zlib.crc32(name.encode()))
+  client.key_value_set(f"{prefix}/name/{process_id}", name_hash)
+  _host_barrier(client, prefix, name, timeout_secs)
+  if sync_id > 0 and hasattr(client, "key_value_delete"):
+    client.key_value_delete(
+        f"jax_sync_global_devices/{sync_id - 1}/name/{process_id}")
+  peers = range(1, num_processes) if process_id == 0 else [0]
+  for peer in peers:
+    if client.blocking_key_value_get(
+        f"{prefix}/name/{peer}", int(timeout_secs * 1000)) != name_hash:
+      raise AssertionError(
+          f"sync_global_devices name mismatch ('{name}'): process {peer} "
+          "called sync_global_devices with a different name.")
+
+
+def sync_global_devices(name: str, *, timeout_secs: float = 300.,
+                        use_device_path: bool = False):
+  """Creates a barrier across all hosts/devices.
+
+  If the distributed system is initialized, the barrier is a barrier of its
+  coordination service, which needs no device computation. Otherwise, or if
+  ``use_device_path`` is set, the barrier is a device computation. Either way,
+  all processes check that they were called with the same ``name``.
+
+  Args:
+    name: the name of the barrier. All processes must call
+      ``sync_global_devices`` with the same names in the same order; a name may
+      be used any number of times.
+    timeout_secs: how long to wait for the other processes at a barrier of the
+      coordination service before raising a ``RuntimeError``.
+    use_device_path: whether to synchronize through a device computation even
+      if the distributed system is initialized.
+  """
+  client = _kv_client()
+  if client is not None and not use_device_path:
+    _host_sync(client, next(_sync_ids), distributed.global_state.process_id,
+               distributed.global_state.num_processes, name, timeout_secs)
+    return
+  if jax.process_count() == 1:
+    return
   h = np.uint32(zlib.crc32(name.encode()))
-  assert_equal(h, f"sync_global_devices name mismatch ('{name}')")
+  with multihost_kv_store_max_bytes(0):
+    assert_equal(h, f"sync_global_devices name mismatch ('{name}')")
 
 
 # Identity function is at the top level so that `process_allgather` doesn't
@@ -125,9 +335,20 @@ def _handle_array_process_allgather(inp, tiled):
   return np.asarray(out.addressable_data(0))
 
 
+def _concat_or_stack(parts: list[np.ndarray], tiled: bool) -> np.ndarray:
+  if tiled and parts[0].ndim > 0:
+    return np.concatenate(parts)
+  return np.stack(parts)
+
+
 def process_allgather(in_tree: Any, tiled: bool = False) -> Any:
   """Gather data from across processes.
 
+  If the distributed system is initialized and the leaves are fully
+  addressable and at most ``jax_multihost_kv_store_max_bytes`` large in total,
+  the data is gathered through the key-value store of the distributed runtime
+  instead of a device computation.
+
   Args:
     in_tree: pytree of arrays - each array _must_ have the same shape across the
       hosts.
@@ -145,6 +366,16 @@ def process_allgather(in_tree: Any, tiled: bool = False) -> Any:
         concatenated.
       * If the input is non-GDA and scalar, then the output will be stacked.
   """
+  client = _kv_client()
+  if client is not None:
+    leaves, treedef = tree_flatten(in_tree)
+    arrays = _kv_host_arrays(leaves)
+    if arrays is not None:
+      gathered = _kv_allgather(client, _kv_key_prefix("allgather"),
+                               distributed.global_state.process_id,
+                               distributed.global_state.num_processes, arrays)
+      return tree_unflatten(treedef, [
+          _concat_or_stack(list(parts), tiled) for parts in zip(*gathered)])
 
   def _pjit(inp):
     return _handle_array_process_allgather(inp, tiled)
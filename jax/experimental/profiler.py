@@ -12,6 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from jax._src.compile_profiler import (
+    CompileProfile as CompileProfile,
+    FunctionProfile as FunctionProfile,
+    profile_compiles as profile_compiles,
+)
 from jax._src.lib import xla_client
 
 
@@ -12,4 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from jax._src.flatten_util import ravel_pytree as ravel_pytree
+from jax._src.flatten_util import (
+  PackedTree as PackedTree,
+  ravel_pytree as ravel_pytree,
+)
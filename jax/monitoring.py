@@ -24,6 +24,8 @@ aggregation/exporting.
 from jax._src.monitoring import (
   record_event as record_event,
   record_event_duration_secs as record_event_duration_secs,
+  record_scalar as record_scalar,
   register_event_listener as register_event_listener,
   register_event_duration_secs_listener as register_event_duration_secs_listener,
+  register_scalar_listener as register_scalar_listener,
 )
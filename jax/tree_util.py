@@ -39,6 +39,7 @@ for examples.
 # See PEP 484 & https://github.com/google/jax/issues/7570
 
 from jax._src.tree_util import (
+  FlatTree as FlatTree,
   Partial as Partial,
   PyTreeDef as PyTreeDef,
   all_leaves as all_leaves,
@@ -1068,6 +1068,51 @@ class CPPJitTest(jtu.BufferDonationTestCase):
       _ = jitted_f(1, 2)
     self.assertEqual(count[0], 1)
 
+  def test_jit_lower_compile_async(self):
+    def f(x):
+      return jnp.sqrt(x ** 2) + 1.
+
+    future = self.jit(f).lower(1.).compile_async()
+    self.assertIsInstance(future, concurrent.futures.Future)
+    self.assertAllClose(future.result()(1.), 2.)
+
+  def test_jit_precompile(self):
+    f_jit = self.jit(lambda x, y: x @ y)
+    x = jax.ShapeDtypeStruct((4, 3), jnp.float32)
+    y = jax.ShapeDtypeStruct((3,), jnp.float32)
+    compiled = f_jit.precompile(x, y).result()
+    self.assertAllClose(compiled(jnp.ones((4, 3)), jnp.ones(3)), jnp.full(4, 3.))
+
+    with jtu.count_jit_and_pmap_compiles() as count:
+      out = f_jit(jnp.ones((4, 3)), jnp.ones(3))
+    self.assertAllClose(out, jnp.full(4, 3.))
+    self.assertEqual(count[0], 0)
+
+  def test_jit_shared_executables(self):
+    def make_fun(scale, name="f"):
+      def f(x):
+        return x * scale + 1
+      f.__name__ = name
+      return f
+
+    with config_internal.shared_executables_max_entries(16):
+      try:
+        c1 = self.jit(make_fun(3.)).lower(jnp.ones(4)).compile()
+        c2 = self.jit(make_fun(3.)).lower(jnp.ones(4)).compile()
+        c3 = self.jit(make_fun(5.)).lower(jnp.ones(4)).compile()
+        # Functions with different names share too, along with the argument
+        # handler, which is built on first use.
+        c4 = self.jit(make_fun(3., "g")).lower(jnp.ones(4)).compile()
+        self.assertIs(c1._executable.unsafe_call.in_handler,
+                      c4._executable.unsafe_call.in_handler)
+      finally:
+        jax.clear_caches()
+    self.assertIs(c1.runtime_executable(), c2.runtime_executable())
+    self.assertIs(c1.runtime_executable(), c4.runtime_executable())
+    self.assertIsNot(c1.runtime_executable(), c3.runtime_executable())
+    self.assertAllClose(c2(jnp.ones(4)), jnp.full(4, 4.))
+    self.assertAllClose(c3(jnp.ones(4)), jnp.full(4, 6.))
+
   @jtu.ignore_warning(category=DeprecationWarning)
   def test_jit_lower_compile_compiler_ir(self):
     # TODO(frostig): remove (deprecated)
@@ -0,0 +1,115 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from absl.testing import absltest
+import numpy as np
+
+from jax import config
+import jax.numpy as jnp
+from jax._src import test_util as jtu
+from jax.experimental.bucketed_jit import (
+    BucketStats, bucket_sizes, bucketed_jit, powers_of_two)
+
+config.parse_flags_with_absl()
+
+
+class BucketedJitTest(jtu.JaxTestCase):
+
+  def test_policies(self):
+    policy = powers_of_two(min_size=4, max_size=100)
+    self.assertEqual([policy(n) for n in [1, 4, 5, 64, 65, 100]],
+                     [4, 4, 8, 64, 100, 100])
+    with self.assertRaisesRegex(ValueError, "exceeds the largest bucket"):
+      policy(101)
+    policy = bucket_sizes([128, 16, 512])
+    self.assertEqual([policy(n) for n in [1, 16, 17, 512]], [16, 16, 128, 512])
+    with self.assertRaisesRegex(ValueError, "exceeds the largest bucket"):
+      policy(513)
+
+  def test_pads_and_slices(self):
+    seen_shapes = []
+
+    def f(x, y, *, lengths):
+      seen_shapes.append((x.shape, y.shape))
+      mask = jnp.arange(x.shape[1]) < lengths["seq"]
+      return x * 2, jnp.sum(jnp.where(mask, x, 0), axis=1) + y
+
+    g = bucketed_jit(f, in_axes=({1: "seq"}, None), out_axes=({1: "seq"}, None),
+                     buckets=powers_of_two(min_size=4))
+    for n in [3, 4, 5, 7, 8]:
+      x = np.arange(2 * n, dtype=np.float32).reshape(2, n)
+      doubled, total = g(x, np.float32(1))
+      self.assertArraysEqual(doubled, x * 2)
+      self.assertAllClose(total, x.sum(axis=1) + 1)
+    self.assertEqual(seen_shapes, [((2, 4), ()), ((2, 8), ())])
+    self.assertEqual(g.bucket_stats(),
+                     {(("seq", 4),): BucketStats(calls=2, executables=1),
+                      (("seq", 8),): BucketStats(calls=3, executables=1)})
+
+  def test_dimensions_share_sizes(self):
+    g = bucketed_jit(lambda a, b: a[:, None] * b[None, :],
+                     in_axes=({0: "n"}, {0: "n"}), lengths_argname=None,
+                     buckets={"n": bucket_sizes([8])})
+    out = g(jnp.ones(5), np.ones(5))
+    self.assertEqual(out.shape, (8, 8))
+    with self.assertRaisesRegex(ValueError, "Inconsistent sizes"):
+      g(np.ones(5), np.ones(6))
+
+  def test_missing_policy(self):
+    g = bucketed_jit(lambda x: x, in_axes=({0: "n"},), lengths_argname=None,
+                     buckets={"m": powers_of_two()})
+    with self.assertRaisesRegex(ValueError, "No bucketing policy"):
+      g(np.ones(3))
+
+  def test_executables_count_signatures(self):
+    def f(x, scale, *, lengths):
+      """Scales x."""
+      del lengths
+      return x * scale
+
+    g = bucketed_jit(f, in_axes=({0: "n"}, None), static_argnums=1)
+    self.assertEqual(g.__name__, "f")
+    self.assertEqual(g.__doc__, "Scales x.")
+    g(np.ones(3, np.float32), 2)
+    g(np.ones(4, np.float32), 2)
+    g(np.ones(4, np.int32), 2)
+    g(np.ones(4, np.float32), 3)
+    self.assertEqual(g.bucket_stats(),
+                     {(("n", 4),): BucketStats(calls=4, executables=3)})
+
+  def test_executables_counted_per_bucket_across_threads(self):
+    g = bucketed_jit(lambda x: x + 1, in_axes=({0: "n"},),
+                     lengths_argname=None)
+    barrier = threading.Barrier(4)
+
+    def call(n):
+      barrier.wait()
+      for _ in range(5):
+        g(np.ones(n, np.float32))
+
+    threads = [threading.Thread(target=call, args=(n,)) for n in [1, 2, 3, 4]]
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join()
+    self.assertEqual(g.bucket_stats(),
+                     {(("n", 1),): BucketStats(calls=5, executables=1),
+                      (("n", 2),): BucketStats(calls=5, executables=1),
+                      (("n", 4),): BucketStats(calls=10, executables=1)})
+
+
+if __name__ == "__main__":
+  absltest.main(testLoader=jtu.JaxTestLoader())
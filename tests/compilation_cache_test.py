@@ -28,14 +28,21 @@ from absl.testing import parameterized
 
 import jax
 from jax import jit, lax, pmap
+from jax.experimental.compilation_cache import cache_tool
+from jax.experimental.compilation_cache import warmup
 from jax.experimental.maps import xmap
 from jax.experimental.pjit import pjit
 from jax.sharding import PartitionSpec as P
 from jax._src import compilation_cache as cc
+from jax._src import monitoring
 from jax._src import test_util as jtu
 from jax._src import xla_bridge
 from jax._src.config import (
     compilation_cache_include_metadata_in_key,
+    compilation_cache_local_dir,
+    compilation_cache_memory_max_entries,
+    persistent_cache_async_max_pending_writes,
+    persistent_cache_async_write_threads,
     persistent_cache_min_compile_time_secs,
     raise_persistent_cache_errors,
 )
@@ -57,14 +64,9 @@ class CompilationCacheTest(jtu.JaxTestCase):
 
   def setUp(self):
     super().setUp()
-    supported_platforms = ["tpu", "gpu"]
-
-    if "--xla_cpu_use_xla_runtime=true" in os.environ.get("XLA_FLAGS", ""):
-      supported_platforms.append("cpu")
-
-    if jtu.device_under_test() not in supported_platforms:
+    if not cc.is_cache_supported(xla_bridge.get_backend()):
       raise SkipTest(
-          "serialize executable only works on " + ",".join(supported_platforms)
+          f"serialize executable doesn't work on {jtu.device_under_test()}"
       )
 
     # Reset cache if already initialized by JaxTestCase
@@ -220,6 +222,19 @@ class CompilationCacheTest(jtu.JaxTestCase):
       key2 = cc.get_cache_key(computation2, devices, compile_options, backend)
     self.assertEqual(include_metadata, key1 != key2)
 
+  def test_cache_key_is_memoized_per_module(self):
+    computation = jax.jit(lambda x, y: x + y).lower(1, 1).compiler_ir()
+    devices = np.array([[jax.local_devices()[0]]])
+    compile_options = xla_bridge.get_compile_options(
+        num_replicas=1, num_partitions=1
+    )
+    backend = xla_bridge.get_backend()
+    key1 = cc.get_cache_key(computation, devices, compile_options, backend)
+    with mock.patch.object(cc, "_canonicalize_ir") as mock_canonicalize:
+      key2 = cc.get_cache_key(computation, devices, compile_options, backend)
+      mock_canonicalize.assert_not_called()
+    self.assertEqual(key1, key2)
+
   def test_xla_flags(self):
     if jtu.is_device_tpu_v4():
       raise unittest.SkipTest("TODO(b/240151176)")
@@ -453,6 +468,167 @@ class CompilationCacheTest(jtu.JaxTestCase):
         files_in_cache = len(os.listdir(tmpdir))
         self.assertEqual(files_in_cache, 1)
 
+  def test_memory_cache(self):
+    with tempfile.TemporaryDirectory() as tmpdir, \
+        compilation_cache_memory_max_entries(1):
+      cc.initialize_cache(tmpdir)
+      events = []
+      monitoring.register_event_listener(events.append)
+      try:
+        computation1 = str(jax.jit(lambda x, y: x + y).lower(1, 1).compiler_ir())
+        computation2 = str(jax.jit(lambda x, y: x * y).lower(2, 2).compiler_ir())
+        compile_options = xla_bridge.get_compile_options(
+            num_replicas=1, num_partitions=1
+        )
+        backend = xla_bridge.get_backend()
+        executable1 = backend.compile(computation1, compile_options)
+        executable2 = backend.compile(computation2, compile_options)
+        cc.put_executable("key1", "computation1", executable1, backend)
+        self.assertIs(cc.get_executable("key1", compile_options, backend),
+                      executable1)
+        self.assertIn(cc.MEMORY_CACHE_HIT_EVENT, events)
+        self.assertNotIn(cc.PERSISTENT_CACHE_HIT_EVENT, events)
+
+        # Adding a second entry evicts the first one from the memory tier, so
+        # it is read back from the persistent cache.
+        cc.put_executable("key2", "computation2", executable2, backend)
+        self.assertIsNotNone(cc.get_executable("key1", compile_options,
+                                               backend))
+        self.assertIn(cc.MEMORY_CACHE_MISS_EVENT, events)
+        self.assertIn(cc.PERSISTENT_CACHE_HIT_EVENT, events)
+      finally:
+        monitoring._event_listeners.remove(events.append)
+
+  def test_local_cache(self):
+    with tempfile.TemporaryDirectory() as tmpdir, \
+        tempfile.TemporaryDirectory() as local_dir, \
+        compilation_cache_local_dir(local_dir):
+      cc.initialize_cache(tmpdir)
+      events = []
+      monitoring.register_event_listener(events.append)
+      try:
+        computation = str(jax.jit(lambda x, y: x + y).lower(1, 1).compiler_ir())
+        compile_options = xla_bridge.get_compile_options(
+            num_replicas=1, num_partitions=1
+        )
+        backend = xla_bridge.get_backend()
+        executable = backend.compile(computation, compile_options)
+        cc.put_executable("key", "computation", executable, backend)
+        self.assertEqual(os.listdir(local_dir), ["key"])
+        os.remove(os.path.join(tmpdir, "key"))
+        self.assertIsNotNone(cc.get_executable("key", compile_options,
+                                               backend))
+        self.assertIn(cc.LOCAL_CACHE_HIT_EVENT, events)
+      finally:
+        monitoring._event_listeners.remove(events.append)
+
+  def test_is_cache_supported_is_memoized(self):
+    backend = xla_bridge.get_backend()
+    self.assertTrue(cc.is_cache_supported(backend))
+    with mock.patch.object(backend, "serialize_executable") as mock_serialize:
+      self.assertTrue(cc.is_cache_supported(backend))
+      mock_serialize.assert_not_called()
+
+  def test_async_write(self):
+    with tempfile.TemporaryDirectory() as tmpdir, \
+        persistent_cache_async_write_threads(2):
+      cc.initialize_cache(tmpdir)
+      jit(lambda x: x * x)(1)
+      jit(lambda x: x + x)(1)
+      cc.flush_pending_writes()
+      self.assertLen(os.listdir(tmpdir), 2)
+
+  def test_async_write_dropped(self):
+    with tempfile.TemporaryDirectory() as tmpdir, \
+        persistent_cache_async_write_threads(1), \
+        persistent_cache_async_max_pending_writes(0):
+      cc.initialize_cache(tmpdir)
+      # The writer may have been created by an earlier test with another
+      # limit; the current limit must still apply.
+      events = []
+      monitoring.register_event_listener(events.append)
+      try:
+        jit(lambda x: x * x)(1)
+        cc.flush_pending_writes()
+      finally:
+        monitoring._event_listeners.remove(events.append)
+      self.assertEmpty(os.listdir(tmpdir))
+      self.assertIn(cc.ASYNC_WRITE_DROPPED_EVENT, events)
+
+  def test_async_write_flush_registered_at_exit_once(self):
+    with mock.patch.object(cc, "_writer", None), \
+        mock.patch.object(cc, "_flush_registered_at_exit", False), \
+        mock.patch.object(cc.atexit, "register") as mock_register:
+      cc._get_writer()
+      cc._writer = None
+      cc._get_writer()
+      mock_register.assert_called_once_with(cc.flush_pending_writes)
+
+  def test_async_write_error(self):
+    with tempfile.TemporaryDirectory() as tmpdir, \
+        persistent_cache_async_write_threads(1):
+      cc.initialize_cache(tmpdir)
+      with mock.patch.object(cc._cache.__class__, "put") as mock_put:
+        mock_put.side_effect = RuntimeError("test error")
+        jit(lambda x: x * x)(1)
+        with self.assertRaisesRegex(RuntimeError, "test error"):
+          cc.flush_pending_writes()
+
+  def test_warm_cache(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      entries = warmup.load_manifest({
+          "entries": [
+              {"function": "jax.numpy:tanh",
+               "args": [{"shape": [8], "dtype": "float32"}]},
+              {"function": "jax.numpy:tanh",
+               "args": [{"shape": [16], "dtype": "float32"}]},
+              {"function": "jax.numpy:does_not_exist"},
+          ]
+      })
+      entries.append(warmup.WarmupEntry(
+          lambda x, y: x + y,
+          args=(jax.ShapeDtypeStruct((4,), np.int32),) * 2))
+      results = warmup.warm_cache(entries, cache_dir=tmpdir, num_threads=2)
+      self.assertEqual([r.error is None for r in results],
+                       [True, True, False, True])
+      self.assertLen(os.listdir(tmpdir), 3)
+
+  def test_stats(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      cc.initialize_cache(tmpdir)
+      cc.reset_stats()
+      f = lambda x: x * x
+      jit(f)(1)
+      jax.clear_caches()
+      jit(f)(1)
+      with persistent_cache_min_compile_time_secs(1e6):
+        jit(lambda x: x + 1)(1)
+      stats = cc.get_stats()
+      self.assertEqual(stats.hits, 1)
+      self.assertEqual(stats.misses, 2)
+      self.assertEqual(stats.hits_by_module["jit__lambda_"], 1)
+      self.assertGreater(stats.bytes_written, 0)
+      self.assertGreater(stats.bytes_read, 0)
+      self.assertEqual(stats.writes_skipped_min_compile_time, 1)
+
+  def test_cache_tool(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      cc.initialize_cache(tmpdir)
+      jit(lambda x: x * x)(1)
+
+      @jit
+      def g(x):
+        return x + 1
+      g(1)
+
+      entries = cache_tool.list_entries(tmpdir)
+      self.assertEqual(sorted(e.module_name for e in entries),
+                       ["jit__lambda_", "jit_g"])
+      self.assertEmpty(cache_tool.list_entries(tmpdir, older_than_secs=3600))
+      pruned = cache_tool.prune_entries(tmpdir, module_regex="jit_g")
+      self.assertEqual([e.module_name for e in pruned], ["jit_g"])
+      self.assertLen(os.listdir(tmpdir), 1)
+
   def create_new_debug_options(self, debug_options_obj):
     debug_options_obj.xla_cpu_enable_fast_math = False
     debug_options_obj.xla_cpu_fast_math_honor_infs = False
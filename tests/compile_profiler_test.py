@@ -0,0 +1,102 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from absl.testing import absltest
+
+import jax
+import jax.numpy as jnp
+from jax._src import config as config_internal
+from jax._src import dispatch
+from jax._src import monitoring
+from jax._src import test_util as jtu
+from jax._src.config import config
+from jax.experimental.profiler import profile_compiles
+
+config.parse_flags_with_absl()
+
+
+class CompileProfilerTest(jtu.JaxTestCase):
+
+  def tearDown(self):
+    monitoring._clear_event_listeners()
+    super().tearDown()
+
+  def test_profile_compiles(self):
+    def my_fun(x):
+      return jnp.sin(x) * 2
+
+    with profile_compiles() as profile:
+      jax.jit(my_fun)(jnp.arange(4.))
+      jax.jit(my_fun)(jnp.arange(8.))
+
+    functions = {f.name: f for f in profile.functions()}
+    self.assertIn("my_fun", functions)
+    f = functions["my_fun"]
+    self.assertEqual(f.num_compiles, 2)
+    for phase in ("trace", "simplify", "lower", "xla_compile", "compile"):
+      self.assertGreater(f.durations_secs[phase], 0, msg=phase)
+    self.assertGreater(f.module_ops, 0)
+    self.assertGreater(f.module_bytes, 0)
+    self.assertEqual(sum(f.cache_outcomes.values()), 2)
+    self.assertIn("my_fun", profile.table())
+
+  def test_shared_executables_outcome(self):
+    def make_fun():
+      def shared_fun(x):
+        return jnp.cos(x) + 3
+      return shared_fun
+
+    with config_internal.shared_executables_max_entries(16):
+      try:
+        with profile_compiles() as profile:
+          jax.jit(make_fun())(jnp.arange(4.))
+          jax.jit(make_fun())(jnp.arange(4.))
+      finally:
+        jax.clear_caches()
+
+    outcomes = [m.cache for m in profile.modules
+                if "shared_fun" in m.fun_name]
+    self.assertLen(outcomes, 2)
+    self.assertNotEqual(outcomes[0], "shared")
+    self.assertEqual(outcomes[1], "shared")
+
+  def test_no_records_outside_context(self):
+    with profile_compiles() as profile:
+      pass
+    jax.jit(lambda x: x + 1)(1.)
+    self.assertEmpty(profile.phases)
+    self.assertEmpty(profile.modules)
+    self.assertEmpty(profile.functions())
+
+  def test_monitoring_events(self):
+    durations = {}
+    scalars = {}
+    monitoring.register_event_duration_secs_listener(
+        lambda event, secs: durations.setdefault(event, secs))
+    monitoring.register_scalar_listener(
+        lambda event, value: scalars.setdefault(event, value))
+
+    with profile_compiles():
+      jax.jit(lambda x: x * 3)(2.)
+
+    for event in (dispatch.JAXPR_TRACE_EVENT, dispatch.JAXPR_SIMPLIFY_EVENT,
+                  dispatch.JAXPR_TO_MLIR_MODULE_EVENT,
+                  dispatch.XLA_COMPILE_EVENT, dispatch.BACKEND_COMPILE_EVENT):
+      self.assertIn(event, durations)
+    self.assertGreater(scalars[dispatch.MODULE_NUM_OPS_EVENT], 0)
+    self.assertGreater(scalars[dispatch.MODULE_NUM_BYTES_EVENT], 0)
+
+
+if __name__ == "__main__":
+  absltest.main(testLoader=jtu.JaxTestLoader())
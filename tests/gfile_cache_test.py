@@ -12,12 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
+import os
 import tempfile
 import threading
+from unittest import mock
 
 from absl.testing import absltest
 
-from jax._src.gfile_cache import GFileCache
+from jax._src.gfile_cache import GFileCache, MmapFileCache
 import jax._src.test_util as jtu
 
 
@@ -85,6 +88,78 @@ class FileSystemCacheTest(jtu.JaxTestCase):
 
       self.assertEqual(cache.get("foo"), file_contents2.encode("utf-8").strip())
 
+  def test_eviction(self):
+    with tempfile.TemporaryDirectory() as tmpdir, mock.patch(
+        "time.time", side_effect=itertools.count(1)):
+      cache = GFileCache(tmpdir, max_size=6)
+      cache.put("a", b"aa")
+      cache.put("b", b"bb")
+      cache.put("c", b"cc")
+      self.assertEqual(sorted(os.listdir(tmpdir)), ["a", "b", "c"])
+      cache.put("d", b"dd")
+      self.assertEqual(sorted(os.listdir(tmpdir)), ["b", "c", "d"])
+      self.assertIsNone(cache.get("a"))
+
+  def test_eviction_is_lru(self):
+    with tempfile.TemporaryDirectory() as tmpdir, mock.patch(
+        "time.time", side_effect=itertools.count(1)):
+      cache = GFileCache(tmpdir, max_size=6)
+      cache.put("a", b"aa")
+      cache.put("b", b"bb")
+      cache.put("c", b"cc")
+      self.assertEqual(cache.get("a"), b"aa")
+      cache.put("d", b"dd")
+      self.assertEqual(sorted(os.listdir(tmpdir)), ["a", "c", "d"])
+
+  def test_eviction_sees_other_processes_accesses(self):
+    with tempfile.TemporaryDirectory() as tmpdir, mock.patch(
+        "time.time", side_effect=itertools.count(1)):
+      cache1 = GFileCache(tmpdir, max_size=6)
+      cache1.put("a", b"aa")
+      cache1.put("b", b"bb")
+      cache2 = GFileCache(tmpdir, max_size=6)
+      cache2.get("a")
+      cache1.put("c", b"cc")
+      cache1.put("d", b"dd")
+      self.assertEqual(sorted(os.listdir(tmpdir)), ["a", "c", "d"])
+
+  def test_eviction_counts_other_processes_entries(self):
+    with tempfile.TemporaryDirectory() as tmpdir, mock.patch(
+        "time.time", side_effect=itertools.count(1)):
+      cache1 = GFileCache(tmpdir, max_size=6)
+      cache2 = GFileCache(tmpdir, max_size=6)
+      for i in range(4):
+        cache1.put(f"a{i}", b"xx")
+        cache2.put(f"b{i}", b"xx")
+        total_size = sum(os.path.getsize(os.path.join(tmpdir, name))
+                         for name in os.listdir(tmpdir))
+        self.assertLessEqual(total_size, 6)
+      self.assertEqual(sorted(os.listdir(tmpdir)), ["a3", "b2", "b3"])
+
+  def test_existing_entries_are_evicted(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      cache1 = GFileCache(tmpdir)
+      for key in ["a", "b", "c", "d"]:
+        cache1.put(key, b"xx")
+      GFileCache(tmpdir, max_size=4)
+      self.assertLen(os.listdir(tmpdir), 2)
+
+  def test_no_eviction_by_default(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      cache = GFileCache(tmpdir)
+      for i in range(10):
+        cache.put(f"key{i}", b"x" * 1000)
+      self.assertLen(os.listdir(tmpdir), 10)
+
+  def test_mmap_put_and_get_key(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      cache = MmapFileCache(tmpdir)
+      self.assertIsNone(cache.get("foo"))
+      cache.put("foo", b"bar")
+      self.assertEqual(cache.get("foo")[:], b"bar")
+      cache.put("empty", b"")
+      self.assertEqual(cache.get("empty"), b"")
+
 
 if __name__ == "__main__":
   absltest.main(testLoader=jtu.JaxTestLoader())
@@ -0,0 +1,110 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from absl.testing import absltest
+import numpy as np
+
+import jax
+from jax import config
+from jax import lax
+import jax.numpy as jnp
+from jax._src import lazy_eager as lazy_eager_lib
+from jax._src import test_util as jtu
+from jax.experimental.lazy_eager import lazy_eager
+
+config.parse_flags_with_absl()
+
+
+class LazyEagerTest(jtu.JaxTestCase):
+
+  def setUp(self):
+    super().setUp()
+    lazy_eager_lib._fused_callable.cache_clear()
+
+  def test_matches_eager(self):
+    def f(x, scale):
+      y = jnp.sin(x) * scale + 1
+      if y.sum() > 0:
+        y = y - 1
+      y = jax.jit(jnp.cos)(y)
+      return {"y": y, "total": y.sum(), "scale": scale}
+
+    x = jnp.arange(8.)
+    self.assertAllClose(lazy_eager(f)(x, 2.), f(x, 2.))
+    self.assertIsInstance(lazy_eager(f)(x, 2.)["y"], jax.Array)
+
+  def test_fragments_are_reused(self):
+    two, one = jnp.float32(2), jnp.float32(1)
+    def f(x):
+      for _ in range(10):
+        x = lax.add(lax.mul(x, two), one)
+      return x
+
+    lazy_f = lazy_eager(f)
+    x = jnp.ones(3)
+    self.assertAllClose(lazy_f(x), f(x))
+    self.assertAllClose(lazy_f(x + 1), f(x + 1))
+    info = lazy_eager_lib._fused_callable.cache_info()
+    self.assertEqual((info.hits, info.misses), (1, 1))
+
+  def test_max_pending_ops(self):
+    two, one = jnp.float32(2), jnp.float32(1)
+    def f(x):
+      for _ in range(10):
+        x = lax.add(lax.mul(x, two), one)
+      return x
+
+    x = jnp.ones(3)
+    self.assertAllClose(lazy_eager(f, max_pending_ops=4)(x), f(x))
+    # The 20 ops run in 5 identical fragments of 4 ops.
+    info = lazy_eager_lib._fused_callable.cache_info()
+    self.assertEqual((info.hits, info.misses), (4, 1))
+
+  def test_observing_values(self):
+    @lazy_eager
+    def f(x):
+      y = x * 2
+      self.assertEqual(y.block_until_ready().shape, (3,))
+      np.testing.assert_array_equal(np.asarray(y), [0, 2, 4])
+      self.assertEqual(int(y[1]), 2)
+      self.assertEqual(y.tolist(), [0, 2, 4])
+      return jnp.zeros(int(y.sum()))
+
+    self.assertEqual(f(jnp.arange(3)).shape, (6,))
+
+  def test_effects_run_in_order(self):
+    log = []
+
+    @lazy_eager
+    def f(x):
+      y = x + 1
+      jax.debug.callback(lambda v: log.append(int(v)), y)
+      z = y * 2
+      jax.debug.callback(lambda v: log.append(int(v)), z)
+      return z
+
+    self.assertEqual(int(f(jnp.int32(1))), 4)
+    self.assertEqual(log, [2, 4])
+
+  def test_grad(self):
+    f = lambda x: jnp.sin(x) * x
+    self.assertAllClose(lazy_eager(jax.grad(f))(1.), jax.grad(f)(1.))
+
+  def test_invalid_max_pending_ops(self):
+    with self.assertRaisesRegex(ValueError, "max_pending_ops must be positive"):
+      lazy_eager(lambda x: x, max_pending_ops=0)
+
+
+if __name__ == "__main__":
+  absltest.main(testLoader=jtu.JaxTestLoader())
@@ -55,6 +55,17 @@ class MonitoringTest(absltest.TestCase):
     self.assertDictEqual(durations, {"test_short_event": 3,
                                      "test_long_event": 10})
 
+  def test_record_scalar(self):
+    values = []
+    monitoring.register_scalar_listener(
+        lambda event, value: values.append((event, value)))
+
+    monitoring.record_scalar("test_queue_depth", 3)
+    monitoring.record_scalar("test_queue_depth", 0)
+
+    self.assertListEqual(values, [("test_queue_depth", 3),
+                                  ("test_queue_depth", 0)])
+
 
 if __name__ == "__main__":
   absltest.main()
@@ -0,0 +1,297 @@
+# Copyright 2023 The JAX Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import itertools
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import unittest
+from unittest import mock
+
+from absl.testing import absltest
+import numpy as np
+
+import jax
+from jax._src import array
+from jax._src import config as config_internal
+from jax._src import distributed
+from jax._src import test_util as jtu
+from jax._src.config import config
+from jax.experimental import multihost_utils
+
+try:
+  import portpicker
+except ImportError:
+  portpicker = None
+
+config.parse_flags_with_absl()
+
+
+class FakeKeyValueClient:
+  """An in-memory stand-in for the distributed runtime client.
+
+  One instance is shared by the threads that simulate the processes.
+  """
+
+  def __init__(self, num_processes):
+    self.num_processes = num_processes
+    self.store = {}
+    self.barriers = {}
+    self.cv = threading.Condition()
+
+  def key_value_set(self, key, value):
+    with self.cv:
+      if key in self.store:
+        raise RuntimeError(f"Key {key} already exists")
+      self.store[key] = value
+      self.cv.notify_all()
+
+  def blocking_key_value_get(self, key, timeout_in_ms):
+    with self.cv:
+      if not self.cv.wait_for(lambda: key in self.store,
+                              timeout=timeout_in_ms / 1000):
+        raise RuntimeError(f"Timed out waiting for key {key}")
+      return self.store[key]
+
+  def key_value_delete(self, key):
+    with self.cv:
+      del self.store[key]
+
+  def wait_at_barrier(self, barrier_id, timeout_in_ms):
+    with self.cv:
+      self.barriers[barrier_id] = self.barriers.get(barrier_id, 0) + 1
+      self.cv.notify_all()
+      if not self.cv.wait_for(
+          lambda: self.barriers[barrier_id] >= self.num_processes,
+          timeout=timeout_in_ms / 1000):
+        raise RuntimeError(f"Timed out at barrier {barrier_id}")
+
+
+def run_processes(num_processes, fn):
+  """Runs `fn(process_id)` on one thread per simulated process."""
+  results = [None] * num_processes
+  errors = []
+  def task(i):
+    try:
+      results[i] = fn(i)
+    except Exception as e:  # pylint: disable=broad-except
+      errors.append(e)
+  threads = [threading.Thread(target=task, args=(i,))
+             for i in range(num_processes)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  if errors:
+    raise errors[0]
+  return results
+
+
+@contextlib.contextmanager
+def simulated_processes():
+  """Gives each thread its own view of the distributed runtime.
+
+  Yields a thread-local stand-in for `distributed.global_state`, whose
+  `client`, `process_id` and `num_processes` each thread sets. Each thread
+  also numbers its collectives on its own, like separate processes would.
+  """
+  state = threading.local()
+  def key_prefix(name):
+    if not hasattr(state, "collective_ids"):
+      state.collective_ids = itertools.count()
+    return f"test/{name}/{next(state.collective_ids)}"
+  with mock.patch.object(distributed, "global_state", state), \
+      mock.patch.object(multihost_utils, "_kv_key_prefix", key_prefix):
+    yield state
+
+
+class MultihostUtilsKeyValueTest(jtu.JaxTestCase):
+
+  def test_broadcast(self):
+    n = 4
+    client = FakeKeyValueClient(n)
+    def fn(i):
+      arrays = [np.full((2, 3), i, np.float32), np.array(i, np.int32)]
+      return multihost_utils._kv_broadcast(client, "test", i == 0, arrays)
+
+    for out in run_processes(n, fn):
+      self.assertArraysEqual(out[0], np.zeros((2, 3), np.float32))
+      self.assertArraysEqual(out[1], np.array(0, np.int32))
+    # Keys are deleted once every process has read them.
+    self.assertEmpty(client.store)
+
+  def test_allgather(self):
+    n = 3
+    client = FakeKeyValueClient(n)
+    def fn(i):
+      arrays = [np.full((2,), i, np.float32), np.array(i * 10, np.int32)]
+      return multihost_utils._kv_allgather(client, "test", i, n, arrays)
+
+    for gathered in run_processes(n, fn):
+      self.assertLen(gathered, n)
+      for i, arrays in enumerate(gathered):
+        self.assertArraysEqual(arrays[0], np.full((2,), i, np.float32))
+        self.assertArraysEqual(arrays[1], np.array(i * 10, np.int32))
+    self.assertEmpty(client.store)
+
+  def test_concat_or_stack(self):
+    parts = [np.arange(2), np.arange(2, 4)]
+    self.assertArraysEqual(multihost_utils._concat_or_stack(parts, True),
+                           np.arange(4))
+    self.assertArraysEqual(multihost_utils._concat_or_stack(parts, False),
+                           np.arange(4).reshape((2, 2)))
+    scalars = [np.array(1), np.array(2)]
+    self.assertArraysEqual(multihost_utils._concat_or_stack(scalars, True),
+                           np.array([1, 2]))
+
+  def test_decode_rejects_mismatched_shapes(self):
+    value = multihost_utils._kv_encode([np.zeros((3,), np.float32)])
+    with self.assertRaisesRegex(ValueError, "same shapes and dtypes"):
+      multihost_utils._kv_decode(value, [np.zeros((4,), np.float32)])
+
+  def test_public_collectives_use_key_value_store(self):
+    n = 3
+    client = FakeKeyValueClient(n)
+    with simulated_processes() as state:
+      def fn(i):
+        state.client, state.process_id, state.num_processes = client, i, n
+        x = {"a": np.full((2,), i, np.float32), "b": np.int32(i)}
+        return (multihost_utils.broadcast_one_to_all(x),
+                multihost_utils.process_allgather(x),
+                multihost_utils.process_allgather(x, tiled=True))
+      results = run_processes(n, fn)
+    for broadcast, stacked, tiled in results:
+      self.assertArraysEqual(broadcast["a"], np.zeros((2,), np.float32))
+      self.assertArraysEqual(broadcast["b"], np.int32(0))
+      ids = np.arange(n, dtype=np.float32)
+      self.assertArraysEqual(stacked["a"], np.repeat(ids[:, None], 2, 1))
+      self.assertArraysEqual(tiled["a"], np.repeat(ids, 2))
+      self.assertArraysEqual(stacked["b"], np.arange(n, dtype=np.int32))
+    self.assertEmpty(client.store)
+    self.assertLen(client.barriers, 3)
+
+  def test_public_collectives_fall_back_to_device_path(self):
+    # A single process, so that the device path runs without the others.
+    client = FakeKeyValueClient(2)
+    x = np.ones((8,), np.float32)
+    with simulated_processes() as state:
+      state.client, state.process_id, state.num_processes = client, 0, 2
+      # Larger than the threshold.
+      with config_internal.multihost_kv_store_max_bytes(16):
+        self.assertArraysEqual(multihost_utils.broadcast_one_to_all(x), x)
+        self.assertArraysEqual(multihost_utils.process_allgather(x), x)
+      # An explicit source.
+      self.assertArraysEqual(
+          multihost_utils.broadcast_one_to_all(x, is_source=True), x)
+    self.assertEmpty(client.store)
+    self.assertEmpty(client.barriers)
+
+  def test_host_arrays_checks_size_before_copying(self):
+    x = jax.device_put(np.ones((8,), np.float32))
+    with config_internal.multihost_kv_store_max_bytes(16), \
+        mock.patch.object(array.ArrayImpl, "__array__",
+                          side_effect=AssertionError("copied to host")):
+      self.assertIsNone(multihost_utils._kv_host_arrays([x]))
+    with config_internal.multihost_kv_store_max_bytes(32):
+      self.assertArraysEqual(multihost_utils._kv_host_arrays([x])[0],
+                             np.ones((8,), np.float32))
+
+  def test_host_arrays_rejects_arrays_that_are_not_fully_addressable(self):
+    x = jax.device_put(np.ones((8,), np.float32))
+    with mock.patch.object(array.ArrayImpl, "is_fully_addressable",
+                           new_callable=mock.PropertyMock,
+                           return_value=False):
+      self.assertIsNone(multihost_utils._kv_host_arrays([x]))
+
+  def test_barrier_names_can_be_reused(self):
+    n = 3
+    client = FakeKeyValueClient(n)
+    def fn(i):
+      for sync_id in range(3):
+        multihost_utils._host_sync(client, sync_id, i, n, "checkpoint", 10)
+    run_processes(n, fn)
+    self.assertEqual(client.barriers,
+                     {f"jax_sync_global_devices/{i}": n for i in range(3)})
+    # The names of each call are deleted by the next one.
+    self.assertCountEqual(
+        client.store, [f"jax_sync_global_devices/2/name/{i}" for i in range(n)])
+
+  def test_barrier_name_mismatch_fails_fast(self):
+    n = 3
+    client = FakeKeyValueClient(n)
+    names = ["train", "train", "eval"]
+    def fn(i):
+      # Process 0 raises too, not only the process whose name differs.
+      if i == 1:
+        multihost_utils._host_sync(client, 0, i, n, names[i], 10)
+        return
+      with self.assertRaisesRegex(
+          AssertionError, f"name mismatch \\('{names[i]}'\\): process "
+          f"{2 if i == 0 else 0}"):
+        multihost_utils._host_sync(client, 0, i, n, names[i], 10)
+    run_processes(n, fn)
+
+  def test_barrier_timeout(self):
+    client = FakeKeyValueClient(2)
+    with self.assertRaisesRegex(RuntimeError, "same names in the same order"):
+      multihost_utils._host_barrier(client, "b", "eval", 0.01)
+
+
+# Runs in each process started by MultiProcessTest, on CPU. The processes are
+# connected only through the distributed runtime, so the collectives take the
+# key-value store path.
+_WORKER = textwrap.dedent("""
+    import sys
+    import jax
+    import numpy as np
+    from jax.experimental import multihost_utils
+
+    port, n, i = map(int, sys.argv[1:])
+    jax.distributed.initialize(f"localhost:{port}", n, i)
+    for _ in range(3):
+      multihost_utils.sync_global_devices("step")
+    x = np.full((2,), i, np.float32)
+    gathered = multihost_utils.process_allgather(x)
+    np.testing.assert_array_equal(
+        gathered, np.repeat(np.arange(n, dtype=np.float32)[:, None], 2, 1))
+    np.testing.assert_array_equal(
+        multihost_utils.broadcast_one_to_all(x), np.zeros((2,), np.float32))
+    multihost_utils.sync_global_devices("done")
+    jax.distributed.shutdown()
+""")
+
+
+@unittest.skipIf(not portpicker, "Test requires portpicker")
+class MultiProcessTest(jtu.JaxTestCase):
+
+  def test_collectives_across_processes(self):
+    n = 4
+    port = portpicker.pick_unused_port()
+    env = dict(os.environ, JAX_PLATFORMS="cpu")
+    procs = [subprocess.Popen([sys.executable, "-c", _WORKER, str(port),
+                               str(n), str(i)],
+                              env=env, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT)
+             for i in range(n)]
+    for i, proc in enumerate(procs):
+      out, _ = proc.communicate(timeout=120)
+      self.assertEqual(proc.returncode, 0,
+                       msg=f"process {i} failed:\n{out.decode()}")
+
+
+if __name__ == "__main__":
+  absltest.main(testLoader=jtu.JaxTestLoader())
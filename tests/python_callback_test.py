@@ -13,6 +13,7 @@
 # limitations under the License.
 import functools
 import textwrap
+import threading
 import unittest
 
 from typing import Any, Callable, Sequence
@@ -21,6 +22,8 @@ from absl.testing import absltest
 import jax
 from jax import lax
 from jax import tree_util
+from jax._src import callback_executor
+from jax._src import config as config_internal
 from jax._src import core
 from jax._src import debugging
 from jax._src import dispatch
@@ -655,6 +658,87 @@ class PurePythonCallbackTest(jtu.JaxTestCase):
       f(jnp.arange(4.))
       jax.effects_barrier()
 
+  def test_vmap_chunked_callback(self):
+    if xla_bridge.get_backend().runtime_type == 'stream_executor':
+      raise unittest.SkipTest('Host callback not supported for runtime type: stream_executor.')
+
+    chunk_shapes = []
+
+    def cb(x, y):
+      chunk_shapes.append(x.shape)
+      return np.sin(x) + y
+
+    @jax.jit
+    @functools.partial(jax.vmap, in_axes=(0, None))
+    def f(x, y):
+      return jax.pure_callback(cb, x, x, y, vectorized=True, chunk_size=4)
+
+    out = f(jnp.arange(10.), 4.)
+    np.testing.assert_allclose(out, np.sin(np.arange(10.)) + 4., rtol=1E-6)
+    self.assertCountEqual(chunk_shapes, [(4,), (4,), (2,)])
+
+    def cb2(x):
+      self.assertTupleEqual(x.shape, (3,))
+      return np.sin(x)
+
+    @jax.jit
+    @jax.vmap
+    def g(x):
+      return jax.pure_callback(cb2, x, x, chunk_size=4)
+
+    x = jnp.arange(30.).reshape((10, 3))
+    np.testing.assert_allclose(g(x), np.sin(x), rtol=1E-6)
+
+  def test_vmap_of_vmap_chunked_callback(self):
+    if xla_bridge.get_backend().runtime_type == 'stream_executor':
+      raise unittest.SkipTest('Host callback not supported for runtime type: stream_executor.')
+
+    @jax.jit
+    @jax.vmap
+    @jax.vmap
+    def f(x):
+      return jax.pure_callback(np.sin, x, x, chunk_size=2)
+
+    x = jnp.arange(15.).reshape((5, 3))
+    np.testing.assert_allclose(f(x), np.sin(x), rtol=1E-6)
+
+  def test_chunked_callback_rejects_bad_chunk_size(self):
+    with self.assertRaisesRegex(ValueError, "positive integer"):
+      jax.pure_callback(np.sin, 1., 1., chunk_size=0)
+
+  def test_callback_can_reuse_result_buffer(self):
+    if xla_bridge.get_backend().runtime_type == 'stream_executor':
+      raise unittest.SkipTest('Host callback not supported for runtime type: stream_executor.')
+
+    buf = np.empty((4,), np.float32)
+
+    def add_one(x):
+      return np.add(x, np.float32(1), out=buf)
+
+    @jax.jit
+    def f(x):
+      y = jax.pure_callback(add_one, x, x)
+      z = jax.pure_callback(add_one, y, y)
+      return y, z
+
+    y, z = f(jnp.arange(4.))
+    np.testing.assert_allclose(y, np.arange(4.) + 1)
+    np.testing.assert_allclose(z, np.arange(4.) + 2)
+
+  def test_callback_can_return_buffer_protocol_objects(self):
+    if xla_bridge.get_backend().runtime_type == 'stream_executor':
+      raise unittest.SkipTest('Host callback not supported for runtime type: stream_executor.')
+
+    def cb(x):
+      return memoryview(np.sin(x))
+
+    @jax.jit
+    def f(x):
+      return jax.pure_callback(cb, x, x)
+
+    np.testing.assert_allclose(f(jnp.arange(4.)), np.sin(np.arange(4.)),
+                               rtol=1E-6)
+
   def test_can_pmap_pure_callback(self):
     if xla_bridge.get_backend().runtime_type == 'stream_executor':
       raise unittest.SkipTest('Host callback not supported for runtime type: stream_executor.')
@@ -1066,5 +1150,114 @@ class IOPythonCallbackTest(jtu.JaxTestCase):
       jax.effects_barrier()
     self.assertEqual(_mut, jnp.arange(mesh.size).sum())
 
+  def test_unordered_io_callback_without_results_is_queued(self):
+    release = threading.Event()
+    ran = threading.Event()
+
+    def log_value(x):
+      release.wait(timeout=10)
+      ran.set()
+
+    @jax.jit
+    def f(x):
+      io_callback(log_value, None, x)
+      return x + 1
+
+    callback_executor.reset_stats()
+    with config_internal.callback_executor_threads(2):
+      out = f(1.)
+      out.block_until_ready()
+      # The computation finished without waiting for the callback.
+      self.assertFalse(ran.is_set())
+      release.set()
+      jax.effects_barrier()
+    self.assertTrue(ran.is_set())
+    self.assertEqual(out, 2.)
+    stats = callback_executor.get_stats()
+    self.assertEqual(stats.num_queued, 1)
+    self.assertEqual(stats.latency_by_callback["log_value"].count, 1)
+
+  def test_ordered_io_callback_runs_on_runtime_thread(self):
+    thread_names = []
+
+    def log_value(x):
+      thread_names.append(threading.current_thread().name)
+
+    @jax.jit
+    def f(x):
+      io_callback(log_value, None, x, ordered=True)
+      return x + 1
+
+    callback_executor.reset_stats()
+    with config_internal.callback_executor_threads(2):
+      f(1.)
+      f(2.)
+      jax.effects_barrier()
+    self.assertLen(thread_names, 2)
+    for name in thread_names:
+      self.assertFalse(name.startswith("jax_callback"))
+    self.assertEqual(callback_executor.get_stats().num_queued, 0)
+
+  def test_queued_callback_arguments_are_copied(self):
+    release = threading.Event()
+    seen = []
+
+    def record(x):
+      release.wait(timeout=10)
+      seen.append(x.copy())
+
+    buf = np.arange(4, dtype=np.float32)
+    # A view, like the arguments the runtime passes, which does not own its
+    # memory; the buffer is reused while the callback is still queued.
+    callback_executor._get_executor().submit(2, "record", record, (buf[:],))
+    buf[:] = -1
+    release.set()
+    callback_executor.wait_for_pending_callbacks()
+    self.assertLen(seen, 1)
+    self.assertArraysEqual(seen[0], np.arange(4, dtype=np.float32))
+
+  def test_callbacks_lowered_with_different_thread_counts(self):
+    release = threading.Event()
+    ran = []
+
+    def log_value(x):
+      release.wait(timeout=10)
+      ran.append(float(x))
+
+    def make_fun():
+      @jax.jit
+      def f(x):
+        io_callback(log_value, None, x)
+        return x + 1
+      return f
+
+    with config_internal.callback_executor_threads(1):
+      f1 = make_fun()
+      f1(1.).block_until_ready()
+    with config_internal.callback_executor_threads(4):
+      f4 = make_fun()
+      f4(2.).block_until_ready()
+    f1(3.).block_until_ready()
+    # No call waited for the blocked callbacks of another pool.
+    self.assertEmpty(ran)
+    release.set()
+    jax.effects_barrier()
+    self.assertCountEqual(ran, [1., 2., 3.])
+
+  def test_queued_callback_error_is_raised_by_effects_barrier(self):
+
+    def fail(x):
+      raise ValueError("callback failed")
+
+    @jax.jit
+    def f(x):
+      io_callback(fail, None, x)
+      return x
+
+    with config_internal.callback_executor_threads(2):
+      f(1.)
+      with self.assertRaisesRegex(ValueError, "callback failed"):
+        jax.effects_barrier()
+
 if __name__ == "__main__":
   absltest.main(testLoader=jtu.JaxTestLoader())
@@ -589,6 +589,39 @@ class TreeTest(jtu.JaxTestCase):
     leaves, _ = tree_util.tree_flatten_with_path(ATuple2(1, 'hi'))
     self.assertLen(leaves, 1)
 
+  def testFlatTreeRoundtrip(self):
+    tree = {"b": [1, (2, 3)], "a": {"x": 4, "y": None}}
+    flat = tree_util.FlatTree.from_tree(tree)
+    self.assertEqual(flat.leaves, (4, 1, 2, 3))
+    self.assertEqual(flat.to_tree(), tree)
+    leaves, treedef = tree_util.tree_flatten(flat)
+    self.assertEqual(leaves, [4, 1, 2, 3])
+    self.assertEqual(treedef.num_nodes, 5)
+    self.assertEqual(tree_util.tree_unflatten(treedef, leaves).to_tree(), tree)
+    self.assertEqual(pickle.loads(pickle.dumps(flat)).to_tree(), tree)
+
+  def testFlatTreeMap(self):
+    x = tree_util.FlatTree.from_tree({"a": 1, "b": [2, 3]})
+    y = tree_util.FlatTree.from_tree({"a": 10, "b": [20, 30]})
+    self.assertEqual(x.map(lambda a, b: a + b, y).to_tree(),
+                     {"a": 11, "b": [22, 33]})
+    self.assertEqual(tree_util.tree_map(lambda a: a * 2, x).to_tree(),
+                     {"a": 2, "b": [4, 6]})
+    z = tree_util.FlatTree.from_tree({"a": 1, "b": (2, 3)})
+    with self.assertRaisesRegex(ValueError, "same structure"):
+      x.map(lambda a, b: a + b, z)
+    with self.assertRaisesRegex(ValueError, "leaves"):
+      x.replace_leaves([1, 2])
+
+  def testFlatTreeJit(self):
+    params = {f"layer_{i}": {"w": jnp.full(3, i, jnp.float32)}
+              for i in range(10)}
+    flat = tree_util.FlatTree.from_tree(params)
+    out = jax.jit(lambda t: t.map(lambda x: x + 1))(flat)
+    self.assertIsInstance(out, tree_util.FlatTree)
+    self.assertEqual(out.treedef, flat.treedef)
+    self.assertAllClose(out.to_tree()["layer_3"]["w"], jnp.full(3, 4.))
+
 
 class RavelUtilTest(jtu.JaxTestCase):
 
@@ -681,6 +714,42 @@ class RavelUtilTest(jtu.JaxTestCase):
     run(x_flat2, unravel2)
     self.assertEqual(num_traces, 1)
 
+  def testPackedTreeRoundtrip(self):
+    tree = {"a": jnp.arange(6.).reshape(2, 3), "b": [jnp.array([1, 2]),
+                                                     jnp.float32(7.)]}
+    packed = flatten_util.PackedTree.pack(tree)
+    self.assertEqual(packed.dtypes, (jnp.dtype("float32"), jnp.dtype("int32")))
+    self.assertEqual([b.shape for b in packed.buffers], [(7,), (2,)])
+    self.assertAllClose(packed.unpack(), tree, atol=0., rtol=0.)
+
+  def testPackedTreeArithmetic(self):
+    x = flatten_util.PackedTree.pack([jnp.ones(3), jnp.full((2, 2), 2.)])
+    y = 2. * x - x / 2. + (-x)
+    self.assertAllClose(y.unpack(), [jnp.full(3, .5), jnp.full((2, 2), 1.)])
+    self.assertAllClose(x.vdot(x), 19.)
+    z = tree_util.tree_map(jnp.sqrt, x)
+    self.assertIsInstance(z, flatten_util.PackedTree)
+    self.assertLen(tree_util.tree_leaves(z), 1)
+    other = flatten_util.PackedTree.pack([jnp.ones(3), jnp.ones(4)])
+    with self.assertRaisesRegex(ValueError, "same structure"):
+      x + other
+
+  def testPackedTreeJit(self):
+    num_traces = 0
+
+    @jax.jit
+    def step(params, grads):
+      nonlocal num_traces
+      num_traces += 1
+      return params - 0.1 * grads
+
+    params = flatten_util.PackedTree.pack({"w": jnp.ones((4, 4)),
+                                           "b": jnp.zeros(4)})
+    for _ in range(3):
+      params = step(params, params)
+    self.assertEqual(num_traces, 1)
+    self.assertAllClose(params.unpack()["w"], jnp.full((4, 4), .9 ** 3))
+
 
 class TreePrefixErrorsTest(jtu.JaxTestCase):
 
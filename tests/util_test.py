@@ -13,10 +13,12 @@
 # limitations under the License.
 
 import operator
+import threading
 import unittest
 
 from absl.testing import absltest
 
+from jax._src import config as jax_config
 from jax._src import linear_util as lu
 from jax._src import test_util as jtu
 from jax._src import util
@@ -96,6 +98,93 @@ class UtilTest(jtu.JaxTestCase):
     for _ in range(4097):
       reference_loop_generator(lambda x: x)
 
+  def test_lu_cache_per_function_bound(self):
+    @lu.cache
+    def traced(fun, x):
+      return [x]
+
+    def f(): pass
+    def g(): pass
+    with jax_config.tracing_cache_max_entries_per_function(2):
+      for x in [1, 2, 1, 3]:
+        traced(lu.wrap_init(f), x)
+      traced(lu.wrap_init(g), 1)
+    # 2 was least recently used, so it was evicted.
+    self.assertEqual(traced.cache_info(),
+                     lu.CacheInfo(hits=1, misses=4, currsize=3, evictions=1))
+    ans = traced(lu.wrap_init(f), 1)
+    self.assertIs(ans, traced(lu.wrap_init(f), 1))
+    self.assertEqual(traced.cache_info().misses, 4)
+    traced(lu.wrap_init(f), 2)
+    self.assertEqual(traced.cache_info().misses, 5)
+
+  def test_lu_cache_global_bound(self):
+    @lu.cache
+    def traced(fun, x):
+      return [x]
+
+    funs = [lambda: None for _ in range(4)]
+    with jax_config.tracing_cache_max_entries(3):
+      for f in funs:
+        traced(lu.wrap_init(f), 0)
+      traced(lu.wrap_init(funs[0]), 1)
+    self.assertEqual(traced.cache_info().currsize, 3)
+    self.assertEqual(traced.cache_info().evictions, 2)
+    # The entries of funs[0] and funs[1] were the least recently used.
+    entries = [c.entries for c in traced.cache_consumers()]
+    self.assertEqual(sorted(entries), [0, 1, 1, 1])
+
+    # Entries are dropped along with their functions.
+    del funs, f
+    self.assertEqual(traced.cache_info().currsize, 0)
+
+  def test_lu_cache_concurrent_eviction(self):
+    @lu.cache
+    def traced(fun, x):
+      return [x]
+
+    funs = [lambda: None for _ in range(4)]
+    errors = []
+    def task(i):
+      try:
+        # Config contexts are thread-local, so each thread sets the bounds.
+        with jax_config.tracing_cache_max_entries(5), \
+            jax_config.tracing_cache_max_entries_per_function(3):
+          for x in range(500):
+            traced(lu.wrap_init(funs[(i + x) % len(funs)]), x % 7)
+      except Exception as e:  # pylint: disable=broad-except
+        errors.append(e)
+    threads = [threading.Thread(target=task, args=(i,)) for i in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEmpty(errors)
+    info = traced.cache_info()
+    self.assertLessEqual(info.currsize, 5)
+    self.assertEqual(info.hits + info.misses, 8 * 500)
+    self.assertEqual(info.currsize,
+                     sum(c.entries for c in traced.cache_consumers()))
+
+  def test_largest_cache_consumers(self):
+    @lu.cache
+    def traced(fun, x):
+      return [x]
+
+    def many_shapes(): pass
+    def few_shapes(): pass
+    for x in range(5):
+      traced(lu.wrap_init(many_shapes), x)
+    traced(lu.wrap_init(few_shapes), 0)
+    consumers = [c for c in lu.largest_cache_consumers(n=None)
+                 if c.cache == 'traced']
+    self.assertEqual(
+        consumers,
+        [lu.CacheConsumer('traced', 'many_shapes', 5, hits=0, misses=5),
+         lu.CacheConsumer('traced', 'few_shapes', 1, hits=0, misses=1)])
+    traced.cache_clear()
+    self.assertEqual(traced.cache_info().currsize, 0)
+
 
 class SafeMapTest(jtu.JaxTestCase):
 